@@ -0,0 +1,483 @@
+import heapq
+import json
+import logging
+import math
+import os
+import shutil
+from collections import Counter
+from functools import cached_property
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from dutch_politics.corpus_columnar import ColumnarCorpus, DateLike
+from dutch_politics.text_dutch import tokenize_dutch
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = 128
+K1 = 1.2
+B = 0.75
+# score bounds are widened by this factor, so float rounding never prunes a document that ties
+_BOUND_SLACK = 1 + 1e-9
+
+
+def encode_varints(values: np.ndarray) -> bytes:
+    """LEB128 encode non negative integers, seven bits per byte, vectorised."""
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    for shift in (7, 14, 21, 28, 35, 42, 49, 56, 63):
+        lengths += values >= (np.uint64(1) << np.uint64(shift))
+    starts = np.cumsum(lengths) - lengths
+    out = np.zeros(int(lengths.sum()), dtype=np.uint8)
+    for k in range(int(lengths.max()) if len(values) else 0):
+        has_byte = lengths > k
+        byte = (values[has_byte] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        byte |= np.where(lengths[has_byte] > k + 1, np.uint64(0x80), np.uint64(0))
+        out[starts[has_byte] + k] = byte.astype(np.uint8)
+    return out.tobytes()
+
+
+def decode_varints(data: np.ndarray) -> np.ndarray:
+    """Decode LEB128 bytes (a uint8 array) into uint64 values, vectorised."""
+    if len(data) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    is_last = (data & 0x80) == 0
+    ends = np.flatnonzero(is_last)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    # position of every byte within its value
+    positions = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    parts = (data & 0x7F).astype(np.uint64) << (np.uint64(7) * positions.astype(np.uint64))
+    return np.add.reduceat(parts, starts)
+
+
+class SegmentInfo(BaseModel):
+    name: str
+    # rows of the columnar corpus covered by the segment, [row_start, row_end)
+    row_start: int
+    row_end: int
+    count_documents: int
+    total_length: int
+
+
+class BM25Manifest(BaseModel):
+    segments: List[SegmentInfo] = []
+    next_segment_number: int = 1
+
+    @property
+    def row_end(self) -> int:
+        return self.segments[-1].row_end if self.segments else 0
+
+
+class TermPostings:
+    """Postings of a term in one segment: its blocks and the per-block bounds."""
+
+    def __init__(self, segment: "BM25Segment", term_index: int) -> None:
+        self.segment = segment
+        block_start = int(segment.term_block_start[term_index])
+        block_end = block_start + int(segment.term_block_count[term_index])
+        self.blocks = np.arange(block_start, block_end)
+        self.document_frequency = int(segment.term_document_frequency[term_index])
+
+    def block_last_rows(self) -> np.ndarray:
+        return self.segment.block_last_row[self.blocks]
+
+    def block_upper_bounds(self, average_length: float) -> np.ndarray:
+        """BM25 term frequency part at most reachable in every block, without the idf."""
+        max_tf = self.segment.block_max_tf[self.blocks].astype(np.float64)
+        min_length = self.segment.block_min_length[self.blocks].astype(np.float64)
+        return max_tf * (K1 + 1) / (max_tf + K1 * (1 - B + B * min_length / average_length))
+
+    def decode(self, block_positions: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows and term frequencies of the selected blocks (positions within this term)."""
+        blocks = self.blocks if block_positions is None else self.blocks[block_positions]
+        return self.segment.decode_blocks(blocks)
+
+
+class BM25Segment:
+    """One immutable segment, postings in blocks of delta and varint encoded rows.
+
+    Every block stores its rows as the first row relative to the segment start followed by
+    gaps, then the term frequencies, all as varints. The blocks of a term are decoded with
+    one vectorised pass over their bytes. Per block the last row, the maximum
+    term frequency and the minimum document length are kept, which bound the BM25 score of
+    any document in the block and let queries skip blocks.
+    """
+
+    def __init__(self, path_dir: str, info: SegmentInfo) -> None:
+        self.path_dir = path_dir
+        self.info = info
+
+        def load(name: str, dtype: str) -> np.ndarray:
+            path_file = os.path.join(path_dir, name + ".bin")
+            if os.path.getsize(path_file) == 0:
+                return np.zeros(0, dtype=dtype)
+            return np.memmap(path_file, dtype=dtype, mode="r")
+
+        self.term_document_frequency = load("term_document_frequency", "<i4")
+        self.term_block_start = load("term_block_start", "<i4")
+        self.term_block_count = load("term_block_count", "<i4")
+        self.block_offset = load("block_offset", "<i8")
+        self.block_size = load("block_size", "<i4")
+        self.block_last_row = load("block_last_row", "<i4")
+        self.block_max_tf = load("block_max_tf", "<i4")
+        self.block_min_length = load("block_min_length", "<i4")
+        self.document_length = load("document_length", "<i4")
+        self.postings = load("postings", "u1")
+
+    @cached_property
+    def term_ids(self) -> Dict[str, int]:
+        with open(os.path.join(self.path_dir, "terms.json"), "r", encoding="utf-8") as f:
+            return {term: i for i, term in enumerate(json.load(f))}
+
+    def postings_of(self, term: str) -> Optional[TermPostings]:
+        term_index = self.term_ids.get(term)
+        if term_index is None:
+            return None
+        return TermPostings(self, term_index)
+
+    def decode_blocks(self, blocks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Decode several blocks at once: gather their bytes, decode all varints, split per block."""
+        if len(blocks) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        offsets = np.append(self.block_offset, len(self.postings))
+        starts = offsets[blocks]
+        lengths = offsets[blocks + 1] - starts
+        # byte positions of every selected block, one gather from the memory-mapped postings
+        positions = np.arange(int(lengths.sum())) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        values = decode_varints(self.postings[positions]).astype(np.int64)
+        sizes = self.block_size[blocks].astype(np.int64)
+        # a block holds its size gaps followed by its size term frequencies
+        value_starts = np.cumsum(2 * sizes) - 2 * sizes
+        position_in_block = np.arange(len(values)) - np.repeat(value_starts, 2 * sizes)
+        is_gap = position_in_block < np.repeat(sizes, 2 * sizes)
+        gaps, tfs = values[is_gap], values[~is_gap]
+        # the gaps restart at every block, subtract the running sum before the block
+        sums = np.cumsum(gaps)
+        gap_starts = np.cumsum(sizes) - sizes
+        rows = sums - np.repeat(sums[gap_starts] - gaps[gap_starts], sizes) + self.info.row_start
+        return rows, tfs
+
+    def yield_postings(self) -> Iterable[Tuple[str, np.ndarray, np.ndarray]]:
+        """Every term with its full rows and term frequencies, used by merges."""
+        with open(os.path.join(self.path_dir, "terms.json"), "r", encoding="utf-8") as f:
+            terms = json.load(f)
+        for term_index, term in enumerate(terms):
+            rows, tfs = TermPostings(self, term_index).decode()
+            yield term, rows, tfs
+
+
+def write_segment(
+    path_dir: str,
+    row_start: int,
+    document_length: np.ndarray,
+    postings: Dict[str, Tuple[np.ndarray, np.ndarray]],
+) -> None:
+    """Write a segment from term -> (sorted absolute rows, term frequencies)."""
+    os.makedirs(path_dir, exist_ok=True)
+    terms = sorted(postings)
+    columns: Dict[str, List[int]] = {
+        name: []
+        for name in [
+            "term_document_frequency",
+            "term_block_start",
+            "term_block_count",
+            "block_offset",
+            "block_size",
+            "block_last_row",
+            "block_max_tf",
+            "block_min_length",
+        ]
+    }
+    offset = 0
+    with open(os.path.join(path_dir, "postings.bin"), "wb") as f:
+        for term in terms:
+            rows, tfs = postings[term]
+            rows_relative = rows - row_start
+            columns["term_document_frequency"].append(len(rows))
+            columns["term_block_start"].append(len(columns["block_offset"]))
+            columns["term_block_count"].append(math.ceil(len(rows) / BLOCK_SIZE))
+            for i in range(0, len(rows), BLOCK_SIZE):
+                block_rows = rows_relative[i : i + BLOCK_SIZE]
+                block_tfs = tfs[i : i + BLOCK_SIZE]
+                gaps = np.diff(block_rows, prepend=0)
+                data = encode_varints(np.concatenate([gaps, block_tfs]))
+                f.write(data)
+                columns["block_offset"].append(offset)
+                columns["block_size"].append(len(block_rows))
+                columns["block_last_row"].append(int(rows[i : i + BLOCK_SIZE][-1]))
+                columns["block_max_tf"].append(int(block_tfs.max()))
+                columns["block_min_length"].append(int(document_length[block_rows].min()))
+                offset += len(data)
+    for name, values in columns.items():
+        dtype = "<i8" if name == "block_offset" else "<i4"
+        np.asarray(values, dtype=dtype).tofile(os.path.join(path_dir, name + ".bin"))
+    np.asarray(document_length, dtype="<i4").tofile(os.path.join(path_dir, "document_length.bin"))
+    with open(os.path.join(path_dir, "terms.json"), "w", encoding="utf-8") as f:
+        json.dump(terms, f, ensure_ascii=False)
+
+
+def postings_from_texts(row_start: int, texts: Sequence[str]) -> Tuple[np.ndarray, Dict[str, Tuple[np.ndarray, np.ndarray]]]:
+    rows_by_term: Dict[str, List[int]] = {}
+    tfs_by_term: Dict[str, List[int]] = {}
+    document_length = np.zeros(len(texts), dtype=np.int64)
+    for i, text in enumerate(texts):
+        tokens = tokenize_dutch(text)
+        document_length[i] = len(tokens)
+        for term, tf in Counter(tokens).items():
+            rows_by_term.setdefault(term, []).append(row_start + i)
+            tfs_by_term.setdefault(term, []).append(tf)
+    postings = {
+        term: (np.asarray(rows, dtype=np.int64), np.asarray(tfs_by_term[term], dtype=np.int64))
+        for term, rows in rows_by_term.items()
+    }
+    return document_length, postings
+
+
+class BM25Index:
+    """BM25 full text index over the speaker turns (rows) of a columnar corpus.
+
+    The index is a list of immutable segments that each cover a contiguous range of corpus
+    rows, so `update` only tokenises the rows added to the corpus since the last update and
+    `merge` combines small segments by merging their postings. Queries rank with BM25 and
+    MaxScore style pruning: terms are visited from the highest score bound down, once the
+    current k-th best score can not be reached by documents that only contain the remaining
+    terms, those terms only score the existing candidates and skip every block that holds
+    none of them. Speaker and date filters come from the corpus and restrict the candidates
+    before any posting is decoded.
+    """
+
+    def __init__(self, path_dir: str, corpus: ColumnarCorpus) -> None:
+        self.path_dir = path_dir
+        self.corpus = corpus
+        os.makedirs(path_dir, exist_ok=True)
+        path_file_manifest = os.path.join(path_dir, "manifest.json")
+        self.manifest = BM25Manifest()
+        if os.path.exists(path_file_manifest):
+            with open(path_file_manifest, "r") as f:
+                self.manifest = BM25Manifest(**json.load(f))
+        self.segments = [BM25Segment(os.path.join(path_dir, info.name), info) for info in self.manifest.segments]
+
+    def _save_manifest(self) -> None:
+        path_file_temporary = os.path.join(self.path_dir, "manifest.json.tmp")
+        with open(path_file_temporary, "w") as f:
+            json.dump(self.manifest.model_dump(), f)
+        os.replace(path_file_temporary, os.path.join(self.path_dir, "manifest.json"))
+        self.segments = [BM25Segment(os.path.join(self.path_dir, info.name), info) for info in self.manifest.segments]
+
+    def _new_segment_name(self) -> str:
+        name = f"segment-{self.manifest.next_segment_number:06d}"
+        self.manifest.next_segment_number += 1
+        return name
+
+    @property
+    def count_documents(self) -> int:
+        return sum(info.count_documents for info in self.manifest.segments)
+
+    @property
+    def average_length(self) -> float:
+        total_length = sum(info.total_length for info in self.manifest.segments)
+        return max(1.0, total_length / max(1, self.count_documents))
+
+    def update(self, rows_per_segment: int = 200_000) -> int:
+        """Index the corpus rows added since the last update, returns the number of rows added."""
+        row_start = self.manifest.row_end
+        row_end = len(self.corpus)
+        for segment_start in range(row_start, row_end, rows_per_segment):
+            segment_end = min(row_end, segment_start + rows_per_segment)
+            texts = [self.corpus.text(row) for row in range(segment_start, segment_end)]
+            document_length, postings = postings_from_texts(segment_start, texts)
+            name = self._new_segment_name()
+            write_segment(os.path.join(self.path_dir, name), segment_start, document_length, postings)
+            self.manifest.segments.append(
+                SegmentInfo(
+                    name=name,
+                    row_start=segment_start,
+                    row_end=segment_end,
+                    count_documents=int((document_length > 0).sum()),
+                    total_length=int(document_length.sum()),
+                )
+            )
+            self._save_manifest()
+            logger.info(f"Indexed rows {segment_start} to {segment_end} into {name}")
+        return row_end - row_start
+
+    def merge(self, max_segments: int = 4) -> None:
+        """Merge adjacent segments, smallest pairs first, until at most `max_segments` remain."""
+        while len(self.manifest.segments) > max_segments:
+            infos = self.manifest.segments
+            sizes = [infos[i].row_end - infos[i].row_start + infos[i + 1].row_end - infos[i + 1].row_start for i in range(len(infos) - 1)]
+            i = int(np.argmin(sizes))
+            self._merge_pair(i)
+
+    def _merge_pair(self, i: int) -> None:
+        segment_first, segment_second = self.segments[i], self.segments[i + 1]
+        postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for segment in (segment_first, segment_second):
+            for term, rows, tfs in segment.yield_postings():
+                if term in postings:
+                    rows_before, tfs_before = postings[term]
+                    postings[term] = (np.concatenate([rows_before, rows]), np.concatenate([tfs_before, tfs]))
+                else:
+                    postings[term] = (rows, tfs)
+        document_length = np.concatenate(
+            [np.asarray(segment_first.document_length), np.asarray(segment_second.document_length)]
+        )
+        name = self._new_segment_name()
+        write_segment(os.path.join(self.path_dir, name), segment_first.info.row_start, document_length, postings)
+        info = SegmentInfo(
+            name=name,
+            row_start=segment_first.info.row_start,
+            row_end=segment_second.info.row_end,
+            count_documents=segment_first.info.count_documents + segment_second.info.count_documents,
+            total_length=segment_first.info.total_length + segment_second.info.total_length,
+        )
+        names_old = [segment_first.info.name, segment_second.info.name]
+        self.manifest.segments[i : i + 2] = [info]
+        self._save_manifest()
+        for name_old in names_old:
+            shutil.rmtree(os.path.join(self.path_dir, name_old))
+        logger.info(f"Merged {names_old} into {name}")
+
+    def _idf(self, term: str) -> float:
+        document_frequency = 0
+        for segment in self.segments:
+            postings = segment.postings_of(term)
+            if postings is not None:
+                document_frequency += postings.document_frequency
+        count_documents = self.count_documents
+        return math.log(1 + (count_documents - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        speaker_ids: Optional[Sequence[int]] = None,
+        date_from: Optional[DateLike] = None,
+        date_to: Optional[DateLike] = None,
+        rows_allowed: Optional[np.ndarray] = None,
+    ) -> List[Tuple[int, float]]:
+        """Return the k best (row, score) pairs for the query, best first."""
+        terms = sorted(set(tokenize_dutch(query)))
+        if len(terms) == 0 or k <= 0:
+            return []
+        if speaker_ids is not None or date_from is not None or date_to is not None:
+            rows_filter = self.corpus.select(speaker_ids=speaker_ids, date_from=date_from, date_to=date_to)
+            rows_allowed = rows_filter if rows_allowed is None else np.intersect1d(rows_allowed, rows_filter)
+        if rows_allowed is not None and len(rows_allowed) == 0:
+            return []
+        idfs = {term: self._idf(term) for term in terms}
+        average_length = self.average_length
+        top: List[Tuple[float, int]] = []
+        threshold = 0.0
+        for segment in self.segments:
+            rows_segment = None
+            if rows_allowed is not None:
+                rows_segment = rows_allowed[
+                    np.searchsorted(rows_allowed, segment.info.row_start) : np.searchsorted(rows_allowed, segment.info.row_end)
+                ]
+                if len(rows_segment) == 0:
+                    continue
+            rows, scores = self._search_segment(segment, terms, idfs, average_length, k, threshold, rows_segment)
+            for row, score in zip(rows.tolist(), scores.tolist()):
+                if len(top) < k:
+                    heapq.heappush(top, (score, row))
+                elif score > top[0][0]:
+                    heapq.heapreplace(top, (score, row))
+            if len(top) >= k:
+                threshold = top[0][0]
+        return [(row, score) for score, row in sorted(top, reverse=True)]
+
+    def _search_segment(
+        self,
+        segment: BM25Segment,
+        terms: List[str],
+        idfs: Dict[str, float],
+        average_length: float,
+        k: int,
+        threshold: float,
+        rows_allowed: Optional[np.ndarray],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        term_postings = []
+        for term in terms:
+            postings = segment.postings_of(term)
+            if postings is None:
+                continue
+            bound = float(postings.block_upper_bounds(average_length).max()) * idfs[term] * _BOUND_SLACK
+            term_postings.append((postings, idfs[term], bound))
+        # highest score bound first, the terms left at the end are the non-essential ones
+        term_postings.sort(key=lambda item: -item[2])
+        # bounds_suffix[i] is the bound of the terms after term i, summed from the end so the
+        # last one is exactly 0 and a finished candidate is compared by its score alone
+        bounds_suffix = [0.0] * len(term_postings)
+        for i in range(len(term_postings) - 2, -1, -1):
+            bounds_suffix[i] = bounds_suffix[i + 1] + term_postings[i + 1][2]
+        candidates = np.zeros(0, dtype=np.int64)
+        scores = np.zeros(0, dtype=np.float64)
+        document_length = np.asarray(segment.document_length)
+        for (postings, idf, bound), bounds_remaining in zip(term_postings, bounds_suffix):
+            # documents not seen yet can only score the bounds of this and the remaining terms
+            is_essential = bound + bounds_remaining >= threshold
+            if is_essential:
+                rows_needed = rows_allowed
+            elif len(candidates) == 0:
+                break
+            else:
+                rows_needed = candidates
+            if rows_needed is None:
+                blocks = None
+            else:
+                # the blocks whose row range can hold one of the needed rows
+                blocks = np.unique(np.searchsorted(postings.block_last_rows(), rows_needed))
+                blocks = blocks[blocks < len(postings.blocks)]
+                if len(blocks) == 0:
+                    continue
+            rows, tfs = postings.decode(blocks)
+            if rows_needed is not None:
+                keep = np.isin(rows, rows_needed, assume_unique=True)
+                rows, tfs = rows[keep], tfs[keep]
+            lengths = document_length[rows - segment.info.row_start]
+            term_scores = idf * bm25_term_frequency_part(tfs, lengths, average_length)
+            candidates, scores = _add_scores(candidates, scores, rows, term_scores)
+            if len(scores) >= k:
+                threshold = max(threshold, float(np.partition(scores, len(scores) - k)[len(scores) - k]))
+                # candidates that can not reach the threshold with the remaining terms are dropped
+                keep = scores + bounds_remaining >= threshold
+                candidates, scores = candidates[keep], scores[keep]
+        return candidates, scores
+
+
+def bm25_term_frequency_part(tfs: np.ndarray, lengths: np.ndarray, average_length: float) -> np.ndarray:
+    tfs = tfs.astype(np.float64)
+    return tfs * (K1 + 1) / (tfs + K1 * (1 - B + B * lengths / average_length))
+
+
+def _add_scores(
+    candidates: np.ndarray, scores: np.ndarray, rows: np.ndarray, term_scores: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Add term scores to the sorted candidates, rows that are not candidates yet are inserted."""
+    candidates_new = np.union1d(candidates, rows)
+    scores_new = np.zeros(len(candidates_new), dtype=np.float64)
+    scores_new[np.searchsorted(candidates_new, candidates)] = scores
+    scores_new[np.searchsorted(candidates_new, rows)] += term_scores
+    return candidates_new, scores_new
+
+
+if __name__ == "__main__":
+    import time
+
+    logging.basicConfig(level=logging.INFO)
+    corpus = ColumnarCorpus("data/entry_content_columnar")
+    index = BM25Index("data/entry_content_bm25", corpus)
+    index.update()
+    index.merge()
+    for query in ["stikstof boeren", "woningbouw huurprijzen", "asielzoekers opvang gemeenten"]:
+        time_start = time.perf_counter()
+        results = index.search(query, k=10)
+        seconds = time.perf_counter() - time_start
+        logger.info(f"{query}: {len(results)} results in {seconds * 1000:.1f} ms")
+        for row, score in results[:3]:
+            logger.info(f"  {score:.2f} {corpus.speakers[corpus.columns['element_speaker'][row]]}: {corpus.text(row)[:100]}")
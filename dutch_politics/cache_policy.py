@@ -0,0 +1,60 @@
+import time
+from typing import Dict, Literal, Optional
+
+from dutch_politics.http_fetch_client import PageCacheMeta
+
+UrlClass = Literal["listing", "document", "pdf", "other"]
+
+HOURS = 3600.0
+
+
+def classify_url(url: str) -> UrlClass:
+    """Tell search result listings apart from the (immutable) publications they point to."""
+    path = url.split("?")[0]
+    if "/resultaten" in path:
+        return "listing"
+    if path.endswith(".pdf"):
+        return "pdf"
+    if path.endswith(".html"):
+        return "document"
+    return "other"
+
+
+class CachePolicy:
+    """Decides per url class how long a cached page stays fresh.
+
+    A time to live of None means the page never expires. Listing pages change whenever
+    something is published, so they expire after a few hours, published documents do not
+    change and are kept forever.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds_by_url_class: Optional[Dict[str, Optional[float]]] = None,
+    ) -> None:
+        self.ttl_seconds_by_url_class: Dict[str, Optional[float]] = {
+            "listing": 6 * HOURS,
+            "document": None,
+            "pdf": None,
+            "other": 24 * HOURS,
+        }
+        if ttl_seconds_by_url_class is not None:
+            self.ttl_seconds_by_url_class.update(ttl_seconds_by_url_class)
+
+    def get_ttl_seconds(self, url: str) -> Optional[float]:
+        return self.ttl_seconds_by_url_class.get(classify_url(url))
+
+    def is_stale(self, url: str, meta: Optional[PageCacheMeta], now: Optional[float] = None) -> bool:
+        """Whether a cached copy of the url has to be revalidated.
+
+        Pages cached before metadata was kept have unknown age, they are stale unless their
+        class never expires.
+        """
+        ttl_seconds = self.get_ttl_seconds(url)
+        if ttl_seconds is None:
+            return False
+        if meta is None:
+            return True
+        if now is None:
+            now = time.time()
+        return now - meta.fetched_at > ttl_seconds
@@ -0,0 +1,347 @@
+import datetime
+import json
+import logging
+import mmap
+import os
+import re
+from functools import cached_property
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+from pydantic import BaseModel
+
+from dutch_politics.model import PoliticalEntry, Reference
+from dutch_politics.store.object_store_base import ObjectStoreBase
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime.date(1970, 1, 1)
+# days since the epoch of an element whose publication date could not be parsed
+DATE_UNKNOWN = -1
+# dictionary id of a missing speaker
+SPEAKER_NONE = -1
+ELEMENT_TYPES = ["other", "speaker"]
+
+MONTHS_DUTCH = {
+    "januari": 1,
+    "februari": 2,
+    "maart": 3,
+    "april": 4,
+    "mei": 5,
+    "juni": 6,
+    "juli": 7,
+    "augustus": 8,
+    "september": 9,
+    "oktober": 10,
+    "november": 11,
+    "december": 12,
+}
+_PATTERN_DATE_DUTCH = re.compile(r"(\d{1,2})\s+([a-z]+)\s+(\d{4})")
+_PATTERN_DATE_NUMERIC = re.compile(r"(\d{1,2})-(\d{1,2})-(\d{4})")
+_PATTERN_DATE_ISO = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+
+# element columns, appended as raw little endian arrays
+COLUMN_DTYPES: Dict[str, str] = {
+    "element_document": "<i4",
+    "element_index": "<i4",
+    "element_type": "<i1",
+    "element_speaker": "<i4",
+    "element_speaker_title": "<i4",
+    "element_date": "<i4",
+    "text_offset": "<i8",
+    "text_length": "<i4",
+}
+DateLike = Union[datetime.date, int]
+
+
+def parse_dutch_date(text: str) -> Optional[datetime.date]:
+    """Parse dates such as '12 februari 2025', '12-02-2025' or '2025-02-12'."""
+    text = text.strip().lower()
+    try:
+        match = _PATTERN_DATE_DUTCH.search(text)
+        if match and match.group(2) in MONTHS_DUTCH:
+            return datetime.date(int(match.group(3)), MONTHS_DUTCH[match.group(2)], int(match.group(1)))
+        match = _PATTERN_DATE_ISO.search(text)
+        if match:
+            return datetime.date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        match = _PATTERN_DATE_NUMERIC.search(text)
+        if match:
+            return datetime.date(int(match.group(3)), int(match.group(2)), int(match.group(1)))
+    except ValueError:
+        return None
+    return None
+
+
+def days_from_date(date: DateLike) -> int:
+    if isinstance(date, int):
+        return date
+    return (date - EPOCH).days
+
+
+def date_from_days(days: int) -> Optional[datetime.date]:
+    if days == DATE_UNKNOWN:
+        return None
+    return EPOCH + datetime.timedelta(days=int(days))
+
+
+class ColumnarManifest(BaseModel):
+    """Committed sizes of the files, anything written past them is an interrupted build."""
+
+    version: int = 1
+    count_documents: int = 0
+    count_elements: int = 0
+    bytes_text: int = 0
+    bytes_documents: int = 0
+
+
+class ColumnarCorpusWriter:
+    """Appends entries to a columnar corpus directory.
+
+    Texts go into one utf-8 blob, the element columns into raw arrays and the documents
+    (key and reference) into a jsonl file. Speakers and speaker titles are dictionary
+    encoded. The manifest is written last, so a build that is interrupted is rolled back to
+    the last commit when the writer is opened again.
+    """
+
+    def __init__(self, path_dir: str) -> None:
+        self.path_dir = path_dir
+        os.makedirs(path_dir, exist_ok=True)
+        self.manifest = load_manifest(path_dir)
+        self.speakers: List[str] = _load_json(os.path.join(path_dir, "speakers.json"), [])
+        self.speaker_titles: List[str] = _load_json(os.path.join(path_dir, "speaker_titles.json"), [])
+        self._speaker_ids = {speaker: i for i, speaker in enumerate(self.speakers)}
+        self._speaker_title_ids = {speaker_title: i for i, speaker_title in enumerate(self.speaker_titles)}
+        self._truncate()
+        self.document_keys = set(self._yield_document_keys())
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.path_dir, name)
+
+    def _truncate(self) -> None:
+        sizes = {
+            "text.bin": self.manifest.bytes_text,
+            "documents.jsonl": self.manifest.bytes_documents,
+        }
+        for column, dtype in COLUMN_DTYPES.items():
+            sizes[column + ".bin"] = self.manifest.count_elements * np.dtype(dtype).itemsize
+        for name, size in sizes.items():
+            with open(self._path(name), "ab") as f:
+                f.truncate(size)
+
+    def _yield_document_keys(self) -> Iterable[str]:
+        with open(self._path("documents.jsonl"), "rb") as f:
+            for line in f:
+                yield json.loads(line)["key"]
+
+    def _encode(self, value: Optional[str], ids: Dict[str, int], values: List[str]) -> int:
+        if value is None:
+            return SPEAKER_NONE
+        value = value.strip()
+        if value not in ids:
+            ids[value] = len(values)
+            values.append(value)
+        return ids[value]
+
+    def append(self, entries: Sequence[tuple[str, PoliticalEntry]]) -> int:
+        """Append entries under their store keys and commit, returns the number of elements added."""
+        columns: Dict[str, List[int]] = {column: [] for column in COLUMN_DTYPES}
+        text_parts: List[bytes] = []
+        document_lines: List[bytes] = []
+        offset_text = self.manifest.bytes_text
+        count_documents = self.manifest.count_documents
+        for key, entry in entries:
+            if key in self.document_keys:
+                continue
+            self.document_keys.add(key)
+            date = parse_dutch_date(entry.reference.publication_date)
+            days = days_from_date(date) if date is not None else DATE_UNKNOWN
+            for index, element in enumerate(entry.entry_elements):
+                text_bytes = (element.text or "").encode("utf-8")
+                columns["element_document"].append(count_documents)
+                columns["element_index"].append(index)
+                columns["element_type"].append(ELEMENT_TYPES.index(element.type) if element.type in ELEMENT_TYPES else 0)
+                columns["element_speaker"].append(self._encode(element.speaker_name, self._speaker_ids, self.speakers))
+                columns["element_speaker_title"].append(
+                    self._encode(element.speaker_name_title, self._speaker_title_ids, self.speaker_titles)
+                )
+                columns["element_date"].append(days)
+                columns["text_offset"].append(offset_text)
+                columns["text_length"].append(len(text_bytes))
+                text_parts.append(text_bytes)
+                offset_text += len(text_bytes)
+            document_lines.append(
+                (json.dumps({"key": key, "reference": entry.reference.model_dump()}) + "\n").encode("utf-8")
+            )
+            count_documents += 1
+        if len(document_lines) == 0:
+            return 0
+        for column, dtype in COLUMN_DTYPES.items():
+            with open(self._path(column + ".bin"), "ab") as f:
+                np.asarray(columns[column], dtype=dtype).tofile(f)
+        with open(self._path("text.bin"), "ab") as f:
+            f.writelines(text_parts)
+        with open(self._path("documents.jsonl"), "ab") as f:
+            f.writelines(document_lines)
+        _save_json(self._path("speakers.json"), self.speakers)
+        _save_json(self._path("speaker_titles.json"), self.speaker_titles)
+        count_elements = len(columns["element_document"])
+        self.manifest = ColumnarManifest(
+            count_documents=count_documents,
+            count_elements=self.manifest.count_elements + count_elements,
+            bytes_text=offset_text,
+            bytes_documents=self.manifest.bytes_documents + sum(len(line) for line in document_lines),
+        )
+        _save_json(self._path("manifest.json"), self.manifest.model_dump())
+        return count_elements
+
+
+def _load_json(path_file: str, default):
+    if not os.path.exists(path_file):
+        return default
+    with open(path_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_json(path_file: str, value) -> None:
+    path_file_temporary = path_file + ".tmp"
+    with open(path_file_temporary, "w", encoding="utf-8") as f:
+        json.dump(value, f, ensure_ascii=False)
+    os.replace(path_file_temporary, path_file)
+
+
+def load_manifest(path_dir: str) -> ColumnarManifest:
+    return ColumnarManifest(**_load_json(os.path.join(path_dir, "manifest.json"), {}))
+
+
+def build_columnar_corpus(
+    entry_store: ObjectStoreBase[PoliticalEntry],
+    path_dir: str,
+    batch_size: int = 500,
+) -> int:
+    """Add the entries of the store that are not in the corpus yet, returns the elements added.
+
+    Entries are matched by store key, an entry that changed in the store keeps its old
+    columns until the corpus directory is removed and built again.
+    """
+    writer = ColumnarCorpusWriter(path_dir)
+    keys_new = [key for key in entry_store.yield_keys() if key not in writer.document_keys]
+    count_elements = 0
+    for i in range(0, len(keys_new), batch_size):
+        keys_batch = keys_new[i : i + batch_size]
+        entries = [(key, entry) for key, entry in zip(keys_batch, entry_store.mget(keys_batch)) if entry is not None]
+        count_elements += writer.append(entries)
+    logger.info(f"Added {len(keys_new)} documents with {count_elements} elements to {path_dir}")
+    return count_elements
+
+
+class ColumnarCorpus:
+    """Read-only view of a columnar corpus, every column memory-mapped.
+
+    Loading only maps the files, so it takes milliseconds whatever the corpus size. Rows are
+    entry elements, `select` combines vectorised filters on speaker and date into row ids,
+    `text` decodes the text of a row from the memory-mapped blob.
+    """
+
+    def __init__(self, path_dir: str) -> None:
+        self.path_dir = path_dir
+        self.manifest = load_manifest(path_dir)
+        self.speakers: List[str] = _load_json(os.path.join(path_dir, "speakers.json"), [])
+        self.speaker_titles: List[str] = _load_json(os.path.join(path_dir, "speaker_titles.json"), [])
+        count = self.manifest.count_elements
+        self.columns: Dict[str, np.ndarray] = {}
+        for column, dtype in COLUMN_DTYPES.items():
+            if count == 0:
+                self.columns[column] = np.zeros(0, dtype=dtype)
+            else:
+                self.columns[column] = np.memmap(
+                    os.path.join(path_dir, column + ".bin"), dtype=dtype, mode="r", shape=(count,)
+                )
+        self._text: Optional[mmap.mmap] = None
+        if self.manifest.bytes_text > 0:
+            with open(os.path.join(path_dir, "text.bin"), "rb") as f:
+                self._text = mmap.mmap(f.fileno(), self.manifest.bytes_text, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return self.manifest.count_elements
+
+    @cached_property
+    def speaker_ids(self) -> Dict[str, int]:
+        return {speaker: i for i, speaker in enumerate(self.speakers)}
+
+    @cached_property
+    def _documents(self) -> List[dict]:
+        documents = []
+        with open(os.path.join(self.path_dir, "documents.jsonl"), "rb") as f:
+            for line in f.read(self.manifest.bytes_documents).splitlines():
+                documents.append(json.loads(line))
+        return documents
+
+    def document_key(self, document: int) -> str:
+        return self._documents[document]["key"]
+
+    def reference(self, document: int) -> Reference:
+        return Reference(**self._documents[document]["reference"])
+
+    def text(self, row: int) -> str:
+        if self._text is None:
+            return ""
+        offset = int(self.columns["text_offset"][row])
+        return self._text[offset : offset + int(self.columns["text_length"][row])].decode("utf-8")
+
+    def mask(
+        self,
+        speaker_ids: Optional[Sequence[int]] = None,
+        date_from: Optional[DateLike] = None,
+        date_to: Optional[DateLike] = None,
+        element_type: Optional[str] = None,
+    ) -> np.ndarray:
+        """Boolean mask over the rows, dates are inclusive and rows without a date never match a date filter."""
+        mask = np.ones(len(self), dtype=bool)
+        if speaker_ids is not None:
+            mask &= np.isin(self.columns["element_speaker"], np.asarray(speaker_ids, dtype="<i4"))
+        dates = self.columns["element_date"]
+        if date_from is not None:
+            mask &= (dates >= days_from_date(date_from)) & (dates != DATE_UNKNOWN)
+        if date_to is not None:
+            mask &= (dates <= days_from_date(date_to)) & (dates != DATE_UNKNOWN)
+        if element_type is not None:
+            mask &= self.columns["element_type"] == ELEMENT_TYPES.index(element_type)
+        return mask
+
+    def select(self, **filters) -> np.ndarray:
+        """Row ids matching the filters of `mask`, in corpus order."""
+        return np.flatnonzero(self.mask(**filters))
+
+    def count_by_speaker(self, mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+        speakers = self.columns["element_speaker"] if mask is None else self.columns["element_speaker"][mask]
+        counts = np.bincount(speakers[speakers != SPEAKER_NONE], minlength=len(self.speakers))
+        return {self.speakers[i]: int(count) for i, count in enumerate(counts) if count > 0}
+
+    def text_length_by_speaker(self, mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+        speakers = self.columns["element_speaker"]
+        lengths = self.columns["text_length"]
+        if mask is not None:
+            speakers, lengths = speakers[mask], lengths[mask]
+        has_speaker = speakers != SPEAKER_NONE
+        sums = np.bincount(speakers[has_speaker], weights=lengths[has_speaker], minlength=len(self.speakers))
+        return {self.speakers[i]: int(total) for i, total in enumerate(sums) if total > 0}
+
+    def count_by_date(self, mask: Optional[np.ndarray] = None) -> Dict[datetime.date, int]:
+        dates = self.columns["element_date"] if mask is None else self.columns["element_date"][mask]
+        days, counts = np.unique(dates[dates != DATE_UNKNOWN], return_counts=True)
+        return {date_from_days(int(day)): int(count) for day, count in zip(days, counts)}  # type: ignore
+
+
+if __name__ == "__main__":
+    import time
+
+    from dutch_politics.store.store_provider_zip import StoreProviderZip
+
+    logging.basicConfig(level=logging.INFO)
+    entry_store = StoreProviderZip("database_ob", "data").get_object_store("entry_content", PoliticalEntry)
+    build_columnar_corpus(entry_store, "data/entry_content_columnar")
+    time_start = time.perf_counter()
+    corpus = ColumnarCorpus("data/entry_content_columnar")
+    logger.info(f"Loaded {len(corpus)} elements in {(time.perf_counter() - time_start) * 1000:.1f} ms")
+    for speaker, count in sorted(corpus.count_by_speaker().items(), key=lambda item: -item[1])[:20]:
+        logger.info(f"{speaker}: {count}")
@@ -0,0 +1,161 @@
+import logging
+import tempfile
+import time
+from itertools import islice
+from typing import List, Optional, Sequence
+
+from pydantic import BaseModel
+
+from dutch_politics.crawl_engine import CrawlEngine
+from dutch_politics.http_fetch_client import FetchClient, FetchResult
+from dutch_politics.http_scraper_ob import (
+    VERGADERJAREN,
+    get_page_content_from_url,
+    search_results_url,
+    url_hash_from_url,
+    yield_index_references,
+)
+from dutch_politics.parse_benchmark_ob import parse_fast_path
+from dutch_politics.replay_server import ORIGIN, ReplayConfig, ReplayServer, ReplayStats
+from dutch_politics.store.bytes_store_base import BytesStoreBase
+from dutch_politics.store.store_provider_disk import StoreProviderDisk
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlBenchmarkReport(BaseModel):
+    count_pages: int
+    count_failed: int
+    seconds_elapsed: float
+    pages_per_second: float
+    # latency of a fetch as seen by the crawler, retries and backoff included
+    latency_p50_ms: float
+    latency_p99_ms: float
+    # cpu time of the crawler threads (fetch, store and parse), the replay server excluded
+    cpu_ms_per_page: float
+    count_requests: int
+    count_retries: int
+    server: ReplayStats
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    if len(values) == 0:
+        return 0.0
+    values_sorted = sorted(values)
+    return values_sorted[min(len(values_sorted) - 1, round(fraction * (len(values_sorted) - 1)))]
+
+
+def replayable_urls(
+    html_store: BytesStoreBase,
+    index_store: BytesStoreBase,
+    index_id: str,
+    count_listings: int = 20,
+    count_documents: int = 200,
+) -> List[str]:
+    """Pick listing and document urls whose pages are in the html cache snapshot."""
+    urls_listing = [
+        search_results_url(vergaderjaar, "handeling", page)
+        for vergaderjaar in VERGADERJAREN
+        for page in range(1, count_listings + 1)
+    ]
+    urls_document = [
+        reference.content_url_html
+        for reference in islice(yield_index_references(index_store, index_id), count_documents * 2)
+        if reference.content_url_html
+    ]
+    urls = []
+    for urls_candidate, count in [(urls_listing, count_listings), (urls_document, count_documents)]:
+        exists = html_store.mexists([url_hash_from_url(url) for url in urls_candidate])
+        urls.extend([url for url, is_cached in zip(urls_candidate, exists) if is_cached][:count])
+    return urls
+
+
+def run_crawl_benchmark(
+    html_store: BytesStoreBase,
+    urls: Sequence[str],
+    config: Optional[ReplayConfig] = None,
+    max_workers: int = 8,
+    requests_per_second: float = 1000.0,
+    max_concurrency_per_host: int = 8,
+    parse: bool = True,
+) -> CrawlBenchmarkReport:
+    """Crawl the urls from a replay of the html cache into an empty scratch cache.
+
+    The crawler runs the same path as the scraper: the crawl engine with its rate limits and
+    retries, the page cache and, when `parse` is set, the fast path parsers.
+    """
+    latencies: List[float] = []
+    cpu_seconds: List[float] = []
+    with ReplayServer(html_store, config) as server, tempfile.TemporaryDirectory() as path_dir:
+        scratch_store = StoreProviderDisk("crawl_benchmark", path_dir).get_bytes_store("html_cache")
+        fetch_client = FetchClient(
+            max_retries=0,
+            pool_maxsize=max(max_workers, max_concurrency_per_host),
+            url_rewrites={ORIGIN: server.base_url},
+        )
+        crawl_engine = CrawlEngine(
+            max_workers=max_workers,
+            requests_per_second=requests_per_second,
+            max_concurrency_per_host=max_concurrency_per_host,
+            fetch_client=fetch_client,
+        )
+
+        def fetch_timed(url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> FetchResult:
+            time_start = time.perf_counter()
+            try:
+                return crawl_engine.fetch(url, etag, last_modified)
+            finally:
+                latencies.append(time.perf_counter() - time_start)
+
+        def crawl_url(url: str) -> bool:
+            cpu_start = time.thread_time()
+            try:
+                content_str = get_page_content_from_url(scratch_store, url, fetch_timed)
+                if parse:
+                    parse_fast_path(content_str)
+                return True
+            except Exception as e:
+                logger.warning(f"Failed to crawl {url}: {e!r}")
+                return False
+            finally:
+                cpu_seconds.append(time.thread_time() - cpu_start)
+
+        time_start = time.perf_counter()
+        results = crawl_engine.map(crawl_url, urls)
+        seconds_elapsed = time.perf_counter() - time_start
+
+    count_pages = sum(results)
+    return CrawlBenchmarkReport(
+        count_pages=count_pages,
+        count_failed=len(results) - count_pages,
+        seconds_elapsed=seconds_elapsed,
+        pages_per_second=count_pages / seconds_elapsed if seconds_elapsed > 0 else 0.0,
+        latency_p50_ms=percentile(latencies, 0.5) * 1000,
+        latency_p99_ms=percentile(latencies, 0.99) * 1000,
+        cpu_ms_per_page=sum(cpu_seconds) / max(1, len(cpu_seconds)) * 1000,
+        count_requests=crawl_engine.count_requests,
+        count_retries=crawl_engine.count_retries,
+        server=server.stats,
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    store_provider = StoreProviderDisk("database_ob", "data")
+    html_store = store_provider.get_bytes_store("html_cache")
+    index_store = store_provider.get_bytes_store("index_store")
+    urls = replayable_urls(html_store, index_store, "index_2025-2021")
+    scenarios = {
+        "clean": ReplayConfig(seed=0),
+        "slow": ReplayConfig(latency_seconds=0.3, jitter_seconds=0.2, seed=0),
+        "flaky": ReplayConfig(error_rate=0.05, rate_limit_rate=0.02, seed=0),
+    }
+    for name, config in scenarios.items():
+        for max_workers in [1, 4, 8, 16]:
+            report = run_crawl_benchmark(html_store, urls, config, max_workers=max_workers)
+            logger.info(
+                f"{name} workers={max_workers}: {report.pages_per_second:.1f} pages/s, "
+                f"p50 {report.latency_p50_ms:.0f} ms, p99 {report.latency_p99_ms:.0f} ms, "
+                f"{report.cpu_ms_per_page:.1f} ms cpu/page, {report.count_retries} retries, "
+                f"{report.count_failed} failed"
+            )
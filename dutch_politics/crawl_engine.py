@@ -0,0 +1,173 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, TypeVar
+from urllib.parse import urlparse
+
+import requests
+
+from dutch_politics.http_fetch_client import FetchClient, FetchResult
+
+logger = logging.getLogger(__name__)
+
+S = TypeVar("S")
+R = TypeVar("R")
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Token bucket that allows `requests_per_second` on average with short bursts."""
+
+    def __init__(self, requests_per_second: float, burst: int = 1) -> None:
+        if requests_per_second <= 0:
+            raise ValueError("Requests per second must be positive")
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self._tokens = float(burst)
+        self._time_last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                time_now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (time_now - self._time_last) * self.requests_per_second)
+                self._time_last = time_now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                time_wait = (1 - self._tokens) / self.requests_per_second
+            time.sleep(time_wait)
+
+
+class CrawlEngine:
+    """Runs crawl tasks concurrently while being polite to the remote hosts.
+
+    All requests share one requests-per-second budget, each host gets at most
+    `max_concurrency_per_host` requests in flight, and failed requests (connection errors,
+    429 and 5xx) are retried with exponential backoff and full jitter. Requests go through a
+    shared `FetchClient`, so connections are kept alive between requests; its own retries are
+    turned off because the engine retries within the rate limits.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        requests_per_second: float = 4.0,
+        max_concurrency_per_host: int = 4,
+        max_retries: int = 5,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 30.0,
+        timeout_seconds: float = 30.0,
+        fetch_client: Optional[FetchClient] = None,
+    ) -> None:
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(requests_per_second, burst=max(1, int(requests_per_second)))
+        self.max_concurrency_per_host = max_concurrency_per_host
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.timeout_seconds = timeout_seconds
+        if fetch_client is None:
+            fetch_client = FetchClient(
+                timeout_seconds=timeout_seconds,
+                max_retries=0,
+                pool_maxsize=max(max_workers, max_concurrency_per_host),
+            )
+        self.fetch_client = fetch_client
+        self._host_semaphores: Dict[str, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+        self.count_requests = 0
+        self.count_retries = 0
+
+    def _host_semaphore(self, url: str) -> threading.Semaphore:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.Semaphore(self.max_concurrency_per_host)
+            return self._host_semaphores[host]
+
+    def _backoff_seconds(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after is not None and retry_after.isdigit():
+            return float(retry_after)
+        return random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2**attempt))
+
+    def request(
+        self,
+        url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        stream: bool = False,
+    ) -> requests.Response:
+        """Send a GET request within the rate and concurrency limits, retrying failures.
+
+        With `stream` the body is not downloaded yet, the caller reads it with `iter_content`
+        and closes the response. The host slot is only held until the headers arrived, use
+        `stream_content` to hold it while the body is read.
+        """
+        return self._request(url, etag, last_modified, stream, self._host_semaphore(url))
+
+    def _request(
+        self,
+        url: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        stream: bool,
+        host_slot: ContextManager,
+    ) -> requests.Response:
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            retry_after: Optional[str] = None
+            try:
+                with host_slot:
+                    with self._lock:
+                        self.count_requests += 1
+                    response = self.fetch_client.send(url, etag, last_modified, stream)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response
+                retry_after = response.headers.get("Retry-After")
+                response.close()
+                error: Exception = requests.HTTPError(f"Status {response.status_code} for {url}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if attempt == self.max_retries:
+                raise error
+            with self._lock:
+                self.count_retries += 1
+            time_backoff = self._backoff_seconds(attempt, retry_after)
+            logger.warning(f"Request for {url} failed ({error}), retrying in {time_backoff:.1f}s")
+            time.sleep(time_backoff)
+        raise ValueError("Unreachable")
+
+    @contextmanager
+    def stream_content(self, url: str, chunk_size: int) -> Iterator[Iterator[bytes]]:
+        """Stream the body of a GET request in chunks, holding the host slot until it was read.
+
+        The body counts against `max_concurrency_per_host` like any other request, the slot is
+        released when the block exits and the response is closed. Retries back off with the slot
+        held.
+        """
+        with self._host_semaphore(url):
+            with self._request(url, None, None, True, nullcontext()) as response:
+                yield response.iter_content(chunk_size)
+
+    def fetch(
+        self,
+        url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> FetchResult:
+        return self.fetch_client.to_result(url, self.request(url, etag, last_modified))
+
+    def fetch_text(self, url: str) -> str:
+        return self.request(url).text
+
+    def map(self, function: Callable[[S], R], items: Iterable[S]) -> List[R]:
+        """Apply a function to every item concurrently, results keep the order of the items."""
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            return list(executor.map(function, items))
@@ -0,0 +1,250 @@
+import hashlib
+import logging
+import os
+import socket
+import time
+from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from dutch_politics.store.dict_store_base import DictStoreBase
+
+logger = logging.getLogger(__name__)
+
+FrontierState = Literal["pending", "in_flight", "done", "failed"]
+
+# lower is leased first: fresh listing pages, then the documents they list, then backfill
+PRIORITY_LISTING = 0
+PRIORITY_DOCUMENT = 1000
+PRIORITY_BACKFILL = 2000
+
+# index keys sort by state and priority, the entries themselves are keyed by a sha256 hex digest
+_PREFIX_INDEX = "state-"
+_KEY_INDEX_BUILT = "state-index-built"
+
+
+class FrontierEntry(BaseModel):
+    url: str
+    state: FrontierState = "pending"
+    priority: int = PRIORITY_DOCUMENT
+    attempts: int = 0
+    # unix time before which the url is not leased, used for retry backoff
+    not_before: float = 0.0
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[float] = None
+    last_error: Optional[str] = None
+    updated_at: float = 0.0
+    # free form data for the worker, for example the vergaderjaar and page of a listing
+    data: Dict[str, Any] = {}
+
+
+def frontier_key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def index_key(state: str, priority: int, key: str) -> str:
+    return f"{_PREFIX_INDEX}{state}-{priority:010d}-{key}"
+
+
+class CrawlFrontier:
+    """Crawl state of every url, kept in a dict store so a crawl survives restarts.
+
+    Workers lease urls, fetch them and mark them done or failed. Every state change is a
+    compare-and-set on the stored entry, so several worker processes can share a frontier
+    without fetching a url twice. A lease that is not completed within `lease_seconds`
+    (the worker died) expires and the url is handed out again. Failed urls are retried
+    with exponential backoff until `max_attempts`.
+
+    Next to every entry the store holds an empty index document whose key carries the state
+    and the priority, so leasing lists only the pending and in-flight index keys instead of
+    reading every entry. The entry is the source of truth: the index is updated after the
+    entry, and an index key whose entry is gone or finished is dropped when it is seen.
+    `rebuild_index` builds the index of an existing frontier once, and repairs it after a
+    crash between writing an entry and its index.
+    """
+
+    def __init__(
+        self,
+        store: DictStoreBase,
+        worker_id: Optional[str] = None,
+        lease_seconds: float = 300.0,
+        max_attempts: int = 5,
+        backoff_base_seconds: float = 60.0,
+        candidate_buffer_size: int = 1000,
+    ) -> None:
+        self.store = store
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base_seconds = backoff_base_seconds
+        self.candidate_buffer_size = candidate_buffer_size
+        # leasable entries found by the last scan, best first
+        self._candidates: List[Tuple[str, dict]] = []
+        # pending and in-flight urls seen by the last scan, due or not
+        self.count_unfinished = 0
+        self._index_checked = False
+
+    def _is_leasable(self, entry: FrontierEntry, now: float) -> bool:
+        if entry.state == "pending":
+            return entry.not_before <= now
+        if entry.state == "in_flight":
+            return entry.lease_expires_at is not None and entry.lease_expires_at <= now
+        return False
+
+    def add(self, urls: Sequence[str], priority: int = PRIORITY_DOCUMENT, data: Optional[Dict[str, Any]] = None) -> int:
+        """Add urls that are not in the frontier yet, returns how many were new."""
+        keys_index: List[str] = []
+        now = time.time()
+        for url in urls:
+            entry = FrontierEntry(url=url, priority=priority, updated_at=now, data=data or {})
+            key = frontier_key(url)
+            if self.store.compare_and_set(key, None, entry.model_dump()):
+                keys_index.append(index_key(entry.state, entry.priority, key))
+        self.store.mset([(key_index, {}) for key_index in keys_index])
+        return len(keys_index)
+
+    def reset(self, url: str, priority: Optional[int] = None) -> bool:
+        """Make a done or failed url pending again, for example a listing page that went stale."""
+        key = frontier_key(url)
+        entry_dict = self.store.mget([key])[0]
+        if entry_dict is None:
+            return False
+        entry = FrontierEntry(**entry_dict)
+        if entry.state in ("pending", "in_flight"):
+            return False
+        entry.state = "pending"
+        entry.attempts = 0
+        entry.not_before = 0.0
+        entry.updated_at = time.time()
+        if priority is not None:
+            entry.priority = priority
+        entry_dict_new = entry.model_dump()
+        if not self.store.compare_and_set(key, entry_dict, entry_dict_new):
+            return False
+        self._update_index([(key, entry_dict, entry_dict_new)])
+        return True
+
+    def _update_index(self, changes: Sequence[Tuple[str, dict, dict]]) -> None:
+        """Move the index keys of entries that changed state or priority."""
+        pairs_new: List[Tuple[str, dict]] = []
+        keys_old: List[str] = []
+        for key, entry_dict_old, entry_dict_new in changes:
+            key_index_old = index_key(entry_dict_old["state"], entry_dict_old["priority"], key)
+            key_index_new = index_key(entry_dict_new["state"], entry_dict_new["priority"], key)
+            if key_index_old != key_index_new:
+                pairs_new.append((key_index_new, {}))
+                keys_old.append(key_index_old)
+        if len(pairs_new) > 0:
+            self.store.mset(pairs_new)
+            self.store.mdelete(keys_old)
+
+    def rebuild_index(self) -> int:
+        """Rebuild the index from the entries with one full scan, returns the number of entries."""
+        keys_index_expected = set()
+        keys = [key for key in self.store.yield_keys() if not key.startswith(_PREFIX_INDEX)]
+        for i in range(0, len(keys), 500):
+            keys_batch = keys[i : i + 500]
+            for key, entry_dict in zip(keys_batch, self.store.mget(keys_batch)):
+                if entry_dict is not None:
+                    keys_index_expected.add(index_key(entry_dict["state"], entry_dict["priority"], key))
+        keys_index = set(self.store.yield_keys(prefix=_PREFIX_INDEX))
+        keys_index.discard(_KEY_INDEX_BUILT)
+        self.store.mset([(key_index, {}) for key_index in sorted(keys_index_expected - keys_index)])
+        self.store.mdelete(sorted(keys_index - keys_index_expected))
+        self.store.mset([(_KEY_INDEX_BUILT, {"built_at": time.time()})])
+        logger.info(f"Rebuilt the frontier index of {len(keys)} entries")
+        return len(keys)
+
+    def _ensure_index(self) -> None:
+        if not self._index_checked:
+            if not self.store.mexists([_KEY_INDEX_BUILT])[0]:
+                self.rebuild_index()
+            self._index_checked = True
+
+    def _scan_candidates(self, now: float) -> None:
+        self._ensure_index()
+        # the few in-flight urls first for expired leases, then the pending ones by priority
+        keys_index = sorted(self.store.yield_keys(prefix=_PREFIX_INDEX + "in_flight-"))
+        keys_index.extend(sorted(self.store.yield_keys(prefix=_PREFIX_INDEX + "pending-")))
+        self.count_unfinished = len(keys_index)
+        candidates: Dict[str, Tuple[Tuple[int, float], dict]] = {}
+        keys_index_stale: List[str] = []
+        for i in range(0, len(keys_index), 500):
+            if len(candidates) >= self.candidate_buffer_size:
+                break
+            keys_index_batch = keys_index[i : i + 500]
+            keys = [key_index.rsplit("-", 1)[1] for key_index in keys_index_batch]
+            for key_index, key, entry_dict in zip(keys_index_batch, keys, self.store.mget(keys)):
+                # a key left by an interrupted state change still leads to its entry
+                if entry_dict is None or entry_dict["state"] in ("done", "failed"):
+                    keys_index_stale.append(key_index)
+                elif self._is_leasable(FrontierEntry(**entry_dict), now):
+                    candidates[key] = ((entry_dict["priority"], entry_dict["not_before"]), entry_dict)
+        if len(keys_index_stale) > 0:
+            self.store.mdelete(keys_index_stale)
+        ranked = sorted(candidates.items(), key=lambda item: item[1][0])
+        self._candidates = [(key, entry_dict) for key, (_, entry_dict) in ranked[: self.candidate_buffer_size]]
+
+    def lease(self, count: int = 1) -> List[FrontierEntry]:
+        """Lease up to `count` urls, highest priority first. Returns fewer when none are due."""
+        now = time.time()
+        leased: List[FrontierEntry] = []
+        changes: List[Tuple[str, dict, dict]] = []
+        scanned = False
+        while len(leased) < count:
+            if len(self._candidates) == 0:
+                if scanned:
+                    break
+                self._scan_candidates(now)
+                scanned = True
+                continue
+            key, entry_dict = self._candidates.pop(0)
+            entry = FrontierEntry(**entry_dict)
+            entry.state = "in_flight"
+            entry.attempts += 1
+            entry.lease_owner = self.worker_id
+            entry.lease_expires_at = now + self.lease_seconds
+            entry.updated_at = now
+            entry_dict_new = entry.model_dump()
+            # fails when another worker leased or changed the entry since the scan
+            if self.store.compare_and_set(key, entry_dict, entry_dict_new):
+                leased.append(entry)
+                changes.append((key, entry_dict, entry_dict_new))
+        self._update_index(changes)
+        return leased
+
+    def _finish(self, entry: FrontierEntry, entry_new: FrontierEntry) -> bool:
+        """Store the new state if this worker still holds the lease."""
+        key = frontier_key(entry.url)
+        entry_dict = self.store.mget([key])[0]
+        if entry_dict is None or entry_dict["lease_owner"] != self.worker_id or entry_dict["state"] != "in_flight":
+            logger.warning(f"Lease on {entry.url} was lost")
+            return False
+        entry_dict_new = entry_new.model_dump()
+        if not self.store.compare_and_set(key, entry_dict, entry_dict_new):
+            return False
+        self._update_index([(key, entry_dict, entry_dict_new)])
+        return True
+
+    def complete(self, entry: FrontierEntry) -> bool:
+        entry_new = entry.model_copy(
+            update={"state": "done", "lease_owner": None, "lease_expires_at": None, "updated_at": time.time()}
+        )
+        return self._finish(entry, entry_new)
+
+    def fail(self, entry: FrontierEntry, error: str) -> bool:
+        now = time.time()
+        if entry.attempts >= self.max_attempts:
+            update: Dict[str, Any] = {"state": "failed"}
+        else:
+            update = {"state": "pending", "not_before": now + self.backoff_base_seconds * 2 ** (entry.attempts - 1)}
+        update.update({"lease_owner": None, "lease_expires_at": None, "last_error": error, "updated_at": now})
+        return self._finish(entry, entry.model_copy(update=update))
+
+    def count_by_state(self) -> Dict[str, int]:
+        """Count the urls per state from the index keys, without reading the entries."""
+        self._ensure_index()
+        counts: Dict[str, int] = {"pending": 0, "in_flight": 0, "done": 0, "failed": 0}
+        for state in counts:
+            counts[state] = sum(1 for _ in self.store.yield_keys(prefix=f"{_PREFIX_INDEX}{state}-"))
+        return counts
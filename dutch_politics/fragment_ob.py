@@ -0,0 +1,147 @@
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from dutch_politics.http_scraper_ob import (
+    HTML_PARSER_FEATURES,
+    apply_raw_retention,
+    url_hash_from_url,
+    yield_index_references,
+)
+from dutch_politics.page_fragment import RawRetention, compress_fragment, extract_fragment
+from dutch_politics.store.bytes_store_base import BytesStoreBase
+from dutch_politics.store.key_partition import map_collection
+from dutch_politics.store.store_provider_disk import StoreProviderDisk
+
+logger = logging.getLogger(__name__)
+
+# handelingen urls look like .../h-tk-20232024-12-3.html
+_PATTERN_VERGADERJAAR = re.compile(r"h-tk-(\d{4})(\d{4})")
+
+
+class FragmentSavings(BaseModel):
+    vergaderjaar: str
+    count_pages: int = 0
+    bytes_raw: int = 0
+    bytes_fragment: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_raw - self.bytes_fragment
+
+
+def vergaderjaar_from_url(url: str) -> str:
+    match = _PATTERN_VERGADERJAAR.search(url)
+    if match is None:
+        return "unknown"
+    return f"{match.group(1)}-{match.group(2)}"
+
+
+def extract_compressed_fragment(key: str, content_bytes: bytes) -> Optional[bytes]:
+    """Worker for the backfill, module level so it can run in a process pool."""
+    fragment = extract_fragment(content_bytes.decode("utf-8"), HTML_PARSER_FEATURES)
+    if fragment is None:
+        return None
+    return compress_fragment(fragment)
+
+
+def backfill_fragments(
+    html_store: BytesStoreBase,
+    fragment_store: BytesStoreBase,
+    raw_retention: RawRetention = "keep",
+    cold_store: Optional[BytesStoreBase] = None,
+    n_partitions: int = 8,
+    max_workers: Optional[int] = None,
+    batch_size: int = 500,
+) -> int:
+    """Store the fragment of every cached document page that does not have one yet.
+
+    Listing pages have no broodtekst and are left alone. Returns the number of fragments
+    written.
+    """
+    count_written = 0
+    pending: List[Tuple[str, bytes]] = []
+
+    def flush() -> None:
+        nonlocal count_written
+        if len(pending) == 0:
+            return
+        fragment_store.mset(pending)
+        apply_raw_retention(html_store, [key for key, _ in pending], raw_retention, cold_store)
+        count_written += len(pending)
+        pending.clear()
+
+    # one listing instead of an existence check per key, a HEAD request per page on S3
+    keys_done = set(fragment_store.yield_keys())
+    logger.info(f"Found {len(keys_done)} fragments in {fragment_store.collection_name}")
+
+    def key_filter(key: str) -> bool:
+        return key not in keys_done
+
+    for key, fragment_bytes in map_collection(
+        html_store,
+        extract_compressed_fragment,
+        n_partitions=n_partitions,
+        max_workers=max_workers,
+        key_filter=key_filter,
+    ):
+        if fragment_bytes is not None:
+            pending.append((key, fragment_bytes))
+            if len(pending) >= batch_size:
+                flush()
+    flush()
+    logger.info(f"Wrote {count_written} fragments to {fragment_store.collection_name}")
+    return count_written
+
+
+def report_fragment_savings(
+    index_store: BytesStoreBase,
+    index_id: str,
+    html_store: BytesStoreBase,
+    fragment_store: BytesStoreBase,
+    cold_store: Optional[BytesStoreBase] = None,
+    batch_size: int = 100,
+) -> Dict[str, FragmentSavings]:
+    """Compare the size of the raw pages with the size of their fragments per vergaderjaar.
+
+    Raw pages are looked up in the html cache and then in the cold store.
+    """
+    savings_by_vergaderjaar: Dict[str, FragmentSavings] = {}
+    references = [reference for reference in yield_index_references(index_store, index_id) if reference.content_url_html]
+    for i in range(0, len(references), batch_size):
+        references_batch = references[i : i + batch_size]
+        url_hashes = [url_hash_from_url(reference.content_url_html) for reference in references_batch]
+        list_raw = html_store.mget(url_hashes)
+        if cold_store is not None:
+            url_hashes_cold = [url_hash for url_hash, raw in zip(url_hashes, list_raw) if raw is None]
+            raw_by_url_hash = dict(zip(url_hashes_cold, cold_store.mget(url_hashes_cold)))
+            list_raw = [raw if raw is not None else raw_by_url_hash.get(url_hash) for url_hash, raw in zip(url_hashes, list_raw)]
+        list_fragment = fragment_store.mget(url_hashes)
+        for reference, raw, fragment in zip(references_batch, list_raw, list_fragment):
+            # only pages that have both sides tell how much was saved
+            if raw is None or fragment is None:
+                continue
+            vergaderjaar = vergaderjaar_from_url(reference.content_url_html)
+            savings = savings_by_vergaderjaar.setdefault(vergaderjaar, FragmentSavings(vergaderjaar=vergaderjaar))
+            savings.count_pages += 1
+            savings.bytes_raw += len(raw)
+            savings.bytes_fragment += len(fragment)
+    for vergaderjaar, savings in sorted(savings_by_vergaderjaar.items()):
+        ratio = savings.bytes_raw / max(1, savings.bytes_fragment)
+        logger.info(
+            f"{vergaderjaar}: {savings.count_pages} pages, {savings.bytes_raw / 1e6:.1f} MB raw, "
+            f"{savings.bytes_fragment / 1e6:.1f} MB fragments, {savings.bytes_saved / 1e6:.1f} MB saved ({ratio:.1f}x)"
+        )
+    return savings_by_vergaderjaar
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    store_provider = StoreProviderDisk("database_ob", "data")
+    html_store = store_provider.get_bytes_store("html_cache")
+    fragment_store = store_provider.get_bytes_store("html_fragment")
+    index_store = store_provider.get_bytes_store("index_store")
+    backfill_fragments(html_store, fragment_store)
+    report_fragment_savings(index_store, "index_2025-2021", html_store, fragment_store)
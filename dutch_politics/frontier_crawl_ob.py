@@ -0,0 +1,131 @@
+import logging
+import math
+import multiprocessing
+import os
+import time
+from typing import Optional
+
+from dutch_politics.cache_policy import CachePolicy
+from dutch_politics.crawl_engine import CrawlEngine
+from dutch_politics.crawl_frontier import (
+    PRIORITY_BACKFILL,
+    PRIORITY_DOCUMENT,
+    PRIORITY_LISTING,
+    CrawlFrontier,
+    FrontierEntry,
+)
+from dutch_politics.http_fetch_client import Fetch
+from dutch_politics.http_scraper_ob import (
+    RESULTS_PER_PAGE,
+    VERGADERJAREN,
+    get_page_content_from_url,
+    parse_search_results_html,
+    search_results_url,
+)
+from dutch_politics.store.bytes_store_base import BytesStoreBase
+from dutch_politics.store.dict_store_base import DictStoreBase
+from dutch_politics.store.store_provider_disk import StoreProviderDisk
+from dutch_politics.store.store_provider_s3 import StoreProviderS3
+
+logger = logging.getLogger(__name__)
+
+# documents listed on the first result pages are new publications, deeper pages are backfill
+PAGES_FRESH = 2
+
+
+def seed_frontier(frontier: CrawlFrontier, refresh_listings: bool = True) -> None:
+    """Add the first result page of every vergaderjaar, with `refresh_listings` crawled again."""
+    for vergaderjaar in VERGADERJAREN:
+        url = search_results_url(vergaderjaar, "handeling", 1)
+        data = {"kind": "listing", "vergaderjaar": vergaderjaar, "page": 1}
+        if frontier.add([url], PRIORITY_LISTING, data) == 0 and refresh_listings:
+            frontier.reset(url, PRIORITY_LISTING)
+
+
+def process_entry(
+    frontier: CrawlFrontier,
+    entry: FrontierEntry,
+    html_store: BytesStoreBase,
+    fetch: Optional[Fetch] = None,
+    meta_store: Optional[DictStoreBase] = None,
+    cache_policy: Optional[CachePolicy] = None,
+) -> None:
+    """Fetch a leased url into the html cache and add the urls a listing page points to."""
+    content_str = get_page_content_from_url(html_store, entry.url, fetch, meta_store, cache_policy=cache_policy)
+    if entry.data.get("kind") != "listing":
+        return
+    vergaderjaar = entry.data["vergaderjaar"]
+    page = entry.data["page"]
+    references, total_entries, has_next = parse_search_results_html(content_str)
+    if page == 1 and has_next:
+        for page_next in range(2, math.ceil(total_entries / RESULTS_PER_PAGE) + 1):
+            frontier.add(
+                [search_results_url(vergaderjaar, "handeling", page_next)],
+                PRIORITY_LISTING + page_next,
+                {"kind": "listing", "vergaderjaar": vergaderjaar, "page": page_next},
+            )
+    priority = PRIORITY_DOCUMENT if page <= PAGES_FRESH else PRIORITY_BACKFILL + page
+    urls = [reference.content_url_html for reference in references if reference.content_url_html]
+    frontier.add(urls, priority, {"kind": "document"})
+
+
+def run_worker(
+    frontier: CrawlFrontier,
+    html_store: BytesStoreBase,
+    crawl_engine: Optional[CrawlEngine] = None,
+    meta_store: Optional[DictStoreBase] = None,
+    cache_policy: Optional[CachePolicy] = None,
+    lease_count: int = 8,
+    poll_seconds: float = 5.0,
+) -> int:
+    """Lease and process urls until the frontier has nothing pending, returns the count done."""
+    if crawl_engine is None:
+        crawl_engine = CrawlEngine()
+    fetch = crawl_engine.fetch
+    count_done = 0
+
+    def process(entry: FrontierEntry) -> bool:
+        try:
+            process_entry(frontier, entry, html_store, fetch, meta_store, cache_policy)
+        except Exception as e:
+            logger.warning(f"Failed to crawl {entry.url}: {e!r}")
+            frontier.fail(entry, repr(e))
+            return False
+        return frontier.complete(entry)
+
+    while True:
+        entries = frontier.lease(lease_count)
+        if len(entries) == 0:
+            # a lease that comes back empty just scanned the index
+            if frontier.count_unfinished == 0:
+                break
+            # urls are waiting for a retry or are leased by other workers
+            time.sleep(poll_seconds)
+            continue
+        count_done += sum(crawl_engine.map(process, entries))
+    logger.info(f"Worker {frontier.worker_id} crawled {count_done} urls")
+    return count_done
+
+
+def _run_worker_process(worker_index: int) -> None:
+    logging.basicConfig(level=logging.INFO)
+    database_name = "database_ob"
+    store_provider_cache = StoreProviderS3(database_name, os.getenv("CONNECTION_STRING_OB_CACHE"))
+    html_store = store_provider_cache.get_bytes_store("html_cache")
+    meta_store = store_provider_cache.get_dict_store("html_cache_meta")
+    frontier_store = StoreProviderDisk(database_name, "data").get_dict_store("crawl_frontier")
+    frontier = CrawlFrontier(frontier_store, worker_id=f"worker-{worker_index}-{os.getpid()}")
+    run_worker(frontier, html_store, meta_store=meta_store, cache_policy=CachePolicy())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    count_workers = int(os.getenv("CRAWL_WORKERS", "4"))
+    frontier_store = StoreProviderDisk("database_ob", "data").get_dict_store("crawl_frontier")
+    seed_frontier(CrawlFrontier(frontier_store))
+    processes = [multiprocessing.Process(target=_run_worker_process, args=(i,)) for i in range(count_workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    logger.info(f"Frontier: {CrawlFrontier(frontier_store).count_by_state()}")
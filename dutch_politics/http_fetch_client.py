@@ -0,0 +1,146 @@
+import importlib.util
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+import requests
+from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+
+class FetchResult(BaseModel):
+    url: str
+    status_code: int
+    text: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # the server confirmed the cached copy is still current, no body was downloaded
+    not_modified: bool = False
+
+
+class PageCacheMeta(BaseModel):
+    """Validators of a cached page, stored next to the page so it can be revalidated."""
+
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    # unix time of the last download or successful revalidation
+    fetched_at: float
+    url_class: Optional[str] = None
+
+
+# fetch(url, etag, last_modified), implemented by FetchClient.fetch and CrawlEngine.fetch
+Fetch = Callable[[str, Optional[str], Optional[str]], FetchResult]
+
+
+def _accept_encoding() -> str:
+    # urllib3 only decodes brotli responses when a brotli package is installed
+    if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi"):
+        return "gzip, deflate, br"
+    return "gzip, deflate"
+
+
+class FetchClient:
+    """HTTP client that keeps connections alive and supports conditional requests.
+
+    All requests go through one pooled `requests.Session`, so repeated requests to the same
+    host reuse the TCP/TLS connection. Failed requests (connection errors, 429 and 5xx) are
+    retried with exponential backoff, honouring Retry-After. Passing the ETag and
+    Last-Modified of a cached copy turns the request into a revalidation: a 304 answer has
+    no body and comes back as a result with `not_modified` set.
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: float = 30.0,
+        max_retries: int = 5,
+        backoff_factor: float = 0.5,
+        pool_maxsize: int = 32,
+        user_agent: str = "southriverblog-scraper",
+        url_rewrites: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.timeout_seconds = timeout_seconds
+        # maps url prefixes to other prefixes, for example to point the scraper at a replay server
+        self.url_rewrites = url_rewrites or {}
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=["GET", "HEAD"],
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Accept-Encoding": _accept_encoding(), "User-Agent": user_agent})
+
+    def _rewrite_url(self, url: str) -> str:
+        for prefix, prefix_new in self.url_rewrites.items():
+            if url.startswith(prefix):
+                return prefix_new + url[len(prefix) :]
+        return url
+
+    def send(
+        self,
+        url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        stream: bool = False,
+    ) -> requests.Response:
+        """Send a GET request, with `stream` the body is left unread for `iter_content`."""
+        headers = {}
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        if last_modified is not None:
+            headers["If-Modified-Since"] = last_modified
+        return self.session.get(self._rewrite_url(url), headers=headers, timeout=self.timeout_seconds, stream=stream)
+
+    def to_result(self, url: str, response: requests.Response) -> FetchResult:
+        if response.status_code == 304:
+            return FetchResult(
+                url=url,
+                status_code=304,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                not_modified=True,
+            )
+        response.raise_for_status()
+        return FetchResult(
+            url=url,
+            status_code=response.status_code,
+            text=response.text,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+
+    def fetch(
+        self,
+        url: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> FetchResult:
+        return self.to_result(url, self.send(url, etag, last_modified))
+
+    def fetch_text(self, url: str) -> str:
+        text = self.fetch(url).text
+        return text if text is not None else ""
+
+
+_default_fetch_client: Optional[FetchClient] = None
+_default_fetch_client_lock = threading.Lock()
+
+
+def get_default_fetch_client() -> FetchClient:
+    """The fetch client shared by every caller that does not bring its own."""
+    global _default_fetch_client
+    with _default_fetch_client_lock:
+        if _default_fetch_client is None:
+            _default_fetch_client = FetchClient()
+        return _default_fetch_client
@@ -1,21 +1,59 @@
 import hashlib
+import html
+import importlib.util
 import logging
+import math
 import os
-from typing import List, Literal, Optional, Tuple
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Literal, Optional, Set, Tuple, Union
 
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from bs4.element import Comment, PageElement
 from pydantic import BaseModel
 from tqdm import tqdm
 
+from dutch_politics.cache_policy import CachePolicy, classify_url
+from dutch_politics.crawl_engine import CrawlEngine
+from dutch_politics.http_fetch_client import Fetch, PageCacheMeta, get_default_fetch_client
+from dutch_politics.page_fragment import RawRetention, compress_fragment, decompress_fragment, extract_fragment
+from dutch_politics.stage_pipeline import PipelineStage, StageMetrics, StagePipeline
 from dutch_politics.store.bytes_store_base import BytesStoreBase
+from dutch_politics.store.dict_store_base import DictStoreBase
 from dutch_politics.store.object_store_base import ObjectStoreBase
+from dutch_politics.store.segment_log import SegmentLog
+from dutch_politics.store.single_flight import SingleFlight
 from dutch_politics.store.store_provider_disk import StoreProviderDisk
 from dutch_politics.store.store_provider_s3 import StoreProviderS3
 
 logger = logging.getLogger(__name__)
 
+# lxml builds trees several times faster than the pure python parser when it is installed
+HTML_PARSER_FEATURES = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+# the parsers only need these subtrees, the rest of the page is navigation chrome
+_STRAINER_BROODTEKST = SoupStrainer("div", id="broodtekst")
+_STRAINER_PUBLICATIES = SoupStrainer("div", id="Publicaties")
+# the class attribute of the result count header may be quoted either way
+_PATTERN_H1_SUB = re.compile(
+    r"""<span[^>]*\bclass=(?:"[^"]*\bh1__sub\b[^"]*"|'[^']*\bh1__sub\b[^']*')[^>]*>(.*?)</span>""", re.DOTALL
+)
+_PATTERN_TAG = re.compile(r"<[^>]+>")
+
+# concurrent requests for the same page share one cache lookup and download
+_page_single_flight: SingleFlight[str] = SingleFlight()
+
+VERGADERJAREN = [
+    "%222025-2026%22",
+    "%222024-2025%22",
+    "%222023-2024%22",
+    "%222022-2023%22",
+]
+RESULTS_PER_PAGE = 50
+# references per index segment, every vergaderjaar starts a new segment
+INDEX_SEGMENT_SIZE = 1000
+# bump when the parsers change, recorded parse failures of older versions are retried
+PARSER_VERSION = 1
+
 
 class EntryReference(BaseModel):
     title: str
@@ -41,6 +79,23 @@ class EntryContent(BaseModel):
     entry_elements: List[EntryElement]
 
 
+class ParseFailure(BaseModel):
+    entry_id: str
+    content_url_html: str
+    parser_version: int
+    error: str
+    failed_at: float
+
+
+class FetchFailure(BaseModel):
+    """Record of a page that could not be fetched, it has no parser version so it is retried."""
+
+    entry_id: str
+    content_url_html: str
+    error: str
+    failed_at: float
+
+
 def extract_suppressed_speaker_name(spreekbeurt_div: PageElement) -> Optional[str]:
     for element in spreekbeurt_div.contents:  # type: ignore
         if (
@@ -72,11 +127,12 @@ def parse_page_content_soup(
         speaker_name = extract_suppressed_speaker_name(spreekbeurt_div)
         alineagroep_divs = spreekbeurt_div.find_all("div", class_="alineagroep")
 
-        speaker_name_title = alineagroep_divs[0].find_all("p")[0].get_text()  # type: ignore
-        if len(alineagroep_divs[0].find_all("p")) == 1:
+        paragraphs_first = alineagroep_divs[0].find_all("p")  # type: ignore
+        speaker_name_title = paragraphs_first[0].get_text()
+        if len(paragraphs_first) == 1:
             paragraphs_text = ""
         else:
-            paragraphs_text = alineagroep_divs[0].find_all("p")[1].get_text()
+            paragraphs_text = paragraphs_first[1].get_text()
         for alineagroep_div in alineagroep_divs[1:]:
             paragraphs = alineagroep_div.find_all("p")
             for paragraph in paragraphs:
@@ -94,17 +150,29 @@ def parse_page_content_soup(
 
 def parse_search_results_soup(
     beautiful_soup: BeautifulSoup,
+) -> Tuple[List[EntryReference], int, bool]:
+    span_element: Optional[PageElement] = beautiful_soup.find("span", class_="h1__sub")
+    header_text = span_element.text if span_element else None
+    return _parse_search_results(beautiful_soup, header_text)
+
+
+def _parse_search_results_header(header_text: str) -> Tuple[int, bool]:
+    final_entry = int(header_text.split(" ")[-5])
+    total_entries = int(header_text.split(" ")[-2])
+    return total_entries, final_entry < total_entries
+
+
+def _parse_search_results(
+    beautiful_soup: BeautifulSoup, header_text: Optional[str]
 ) -> Tuple[List[EntryReference], int, bool]:
     results: List[EntryReference] = []
 
     # find div with id "Publicaties"
     publications_div: Optional[PageElement] = beautiful_soup.find("div", id="Publicaties")
 
-    span_element: Optional[PageElement] = beautiful_soup.find("span", class_="h1__sub")
-    if span_element:
-        final_entry = int(span_element.text.split(" ")[-5])
-        total_entries = int(span_element.text.split(" ")[-2])
-        has_next = final_entry < total_entries
+    total_entries, has_next = 0, False
+    if header_text is not None:
+        total_entries, has_next = _parse_search_results_header(header_text)
     if not publications_div:
         return results, 0, False
     # ul that is a child of publications_div contains the publication list
@@ -148,27 +216,114 @@ def parse_search_results_soup(
     return results, total_entries, has_next
 
 
-def get_page_content_from_url(store: BytesStoreBase, url: str) -> str:
-    url_hash = hashlib.sha256(url.encode()).hexdigest()
+def parse_page_content_html(
+    content_str: str, reference: EntryReference, features: str = HTML_PARSER_FEATURES
+) -> Optional[EntryContent]:
+    """Parse a document page, building a tree of the div#broodtekst subtree only."""
+    beautiful_soup = BeautifulSoup(content_str, features, parse_only=_STRAINER_BROODTEKST)
+    return parse_page_content_soup(beautiful_soup, reference)
+
+
+def parse_search_results_html(
+    content_str: str, features: str = HTML_PARSER_FEATURES
+) -> Tuple[List[EntryReference], int, bool]:
+    """Parse a search results page, building a tree of the div#Publicaties subtree only.
+
+    The result count header lives outside that subtree, it is read with a regular
+    expression instead.
+    """
+    beautiful_soup = BeautifulSoup(content_str, features, parse_only=_STRAINER_PUBLICATIES)
+    match = _PATTERN_H1_SUB.search(content_str)
+    header_text = None
+    if match:
+        header_text = html.unescape(_PATTERN_TAG.sub("", match.group(1)))
+    return _parse_search_results(beautiful_soup, header_text)
+
+
+def url_hash_from_url(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def load_page_cache_meta(meta_store: DictStoreBase, url_hash: str) -> Optional[PageCacheMeta]:
+    meta_dict = meta_store.mget([url_hash])[0]
+    if meta_dict is None:
+        return None
+    return PageCacheMeta(**meta_dict)
+
+
+def get_page_content_from_url(
+    store: BytesStoreBase,
+    url: str,
+    fetch: Optional[Fetch] = None,
+    meta_store: Optional[DictStoreBase] = None,
+    revalidate: bool = False,
+    cache_policy: Optional[CachePolicy] = None,
+) -> str:
+    """Return the page at the url from the store, downloading it when it is not cached.
+
+    A cached page is checked against the server when `revalidate` is set, or when the cache
+    policy says it is stale according to the fetch time kept in `meta_store`. Revalidation
+    uses the stored ETag and Last-Modified, a 304 answer keeps the cached page without
+    downloading it again.
+    """
+    url_hash = url_hash_from_url(url)
+    return _page_single_flight.get(
+        f"{store.collection_name}/{url_hash}/{revalidate}",
+        lambda: _get_page_content_from_url(store, url, url_hash, fetch, meta_store, revalidate, cache_policy),
+    )
+
+
+def _get_page_content_from_url(
+    store: BytesStoreBase,
+    url: str,
+    url_hash: str,
+    fetch: Optional[Fetch],
+    meta_store: Optional[DictStoreBase],
+    revalidate: bool,
+    cache_policy: Optional[CachePolicy],
+) -> str:
     content_bytes = store.mget([url_hash])[0]
-    if content_bytes:
-        print("Content found in store")
+    meta: Optional[PageCacheMeta] = None
+    if content_bytes and (revalidate or cache_policy is not None):
+        if meta_store is not None:
+            meta = load_page_cache_meta(meta_store, url_hash)
+        # without metadata the age of the page is unknown, the policy then treats it as stale
+        if cache_policy is not None and cache_policy.is_stale(url, meta):
+            revalidate = True
+    if content_bytes and not revalidate:
+        logger.debug("Content found in store")
+        return content_bytes.decode("utf-8")
+    if fetch is None:
+        fetch = get_default_fetch_client().fetch
+    if meta is None:
+        result = fetch(url, None, None)
+    else:
+        result = fetch(url, meta.etag, meta.last_modified)
+    if result.not_modified and content_bytes:
+        logger.debug(f"Content not modified for {url}")
         content_str = content_bytes.decode("utf-8")
     else:
-        response = requests.get(url)
-        store.mset([(url_hash, response.text.encode("utf-8"))])
-        content_str = response.text
+        content_str = result.text or ""
+        store.mset([(url_hash, content_str.encode("utf-8"))])
+    if meta_store is not None:
+        meta = PageCacheMeta(
+            url=url,
+            etag=result.etag or (meta.etag if meta else None),
+            last_modified=result.last_modified or (meta.last_modified if meta else None),
+            fetched_at=time.time(),
+            url_class=classify_url(url),
+        )
+        meta_store.mset([(url_hash, meta.model_dump())])
     return content_str
 
 
-def get_page_content(
-    store: BytesStoreBase,
+def search_results_url(
     vergaderjaar: str,
     query_type: Literal["kamervragen", "handeling"],
     page: int,
 ) -> str:
     base_url = "https://zoek.officielebekendmakingen.nl/resultaten?"
-    result_per_page = 50
+    result_per_page = RESULTS_PER_PAGE
 
     query_kamervragen = f"q=(c.product-area==%22officielepublicaties%22)and(((w.publicatienaam==%22Kamervragen%20(Aanhangsel)%22)or(w.publicatienaam==%22Kamervragen%20zonder%20antwoord%22)))%20AND%20w.vergaderjaar=={vergaderjaar}"
     query_handeling = f"q=(c.product-area==%22officielepublicaties%22)and((w.publicatienaam==%22Handelingen%22))%20AND%20w.vergaderjaar=={vergaderjaar}"
@@ -197,41 +352,225 @@ def get_page_content(
         url = url_handeling
     else:
         raise ValueError(f"Invalid query type: {query_type}")
-    content_str = get_page_content_from_url(store, url)
+    return url
+
+
+def get_page_content(
+    store: BytesStoreBase,
+    vergaderjaar: str,
+    query_type: Literal["kamervragen", "handeling"],
+    page: int,
+    fetch: Optional[Fetch] = None,
+    meta_store: Optional[DictStoreBase] = None,
+    cache_policy: Optional[CachePolicy] = None,
+) -> str:
+    url = search_results_url(vergaderjaar, query_type, page)
+    content_str = get_page_content_from_url(store, url, fetch, meta_store, cache_policy=cache_policy)
     return content_str
 
 
+def crawl_search_results_page(
+    html_store: BytesStoreBase,
+    vergaderjaar: str,
+    page: int,
+    fetch: Optional[Fetch] = None,
+    meta_store: Optional[DictStoreBase] = None,
+    cache_policy: Optional[CachePolicy] = None,
+) -> Tuple[List[EntryReference], int, bool]:
+    content_str = get_page_content(html_store, vergaderjaar, "handeling", page, fetch, meta_store, cache_policy)
+    return parse_search_results_html(content_str)
+
+
+def get_index_log(index_store: BytesStoreBase, index_id: str) -> SegmentLog[EntryReference]:
+    return SegmentLog(index_store, index_id, EntryReference)
+
+
+def segments_from_references(
+    references: List[EntryReference], segment_size: int = INDEX_SEGMENT_SIZE
+) -> List[List[EntryReference]]:
+    return [references[i : i + segment_size] for i in range(0, len(references), segment_size)]
+
+
 def build_index(
     index_store: BytesStoreBase,
     index_id: str,
     html_store: BytesStoreBase,
+    crawl_engine: Optional[CrawlEngine] = None,
+    meta_store: Optional[DictStoreBase] = None,
+    cache_policy: Optional[CachePolicy] = None,
 ) -> None:
+    """Crawl all search result pages of every vergaderjaar and store them as one index.
+
+    The first page of every vergaderjaar tells how many results there are, after that all
+    remaining pages are crawled concurrently within the limits of the crawl engine. The
+    references are merged in vergaderjaar and page order, so the index is deterministic.
+    With a cache policy, result pages that are stale are revalidated against the server.
+    """
     logger.info(f"Building index {index_id}")
-    all_references: List[EntryReference] = []
-    total_entries = 0
-    vergaderjaren = []
-    vergaderjaren.append("%222025-2026%22")
-    vergaderjaren.append("%222024-2025%22")
-    vergaderjaren.append("%222023-2024%22")
-    vergaderjaren.append("%222022-2023%22")
-    for vergaderjaar in vergaderjaren:
-        page = 1
-        while True:
-            print(f"Processing page {page}")
-            print(f"Total entries: {len(all_references)} of {total_entries}")
-            content_str = get_page_content(html_store, vergaderjaar, "handeling", page)
-            beautiful_soup = BeautifulSoup(content_str, "html.parser")
-            references, total_entries, has_next = parse_search_results_soup(beautiful_soup)
-            all_references.extend(references)
-            if not has_next:
-                break
-            page += 1
-    index_object = EntryReferenceIndex(references=all_references)
-    index_bytes = index_object.model_dump_json().encode("utf-8")
-    index_store.mset([(index_id, index_bytes)])
+    if crawl_engine is None:
+        crawl_engine = CrawlEngine()
+    fetch = crawl_engine.fetch
+
+    first_pages = crawl_engine.map(
+        lambda vergaderjaar: crawl_search_results_page(
+            html_store, vergaderjaar, 1, fetch, meta_store, cache_policy
+        ),
+        VERGADERJAREN,
+    )
+    page_tasks: List[Tuple[str, int]] = []
+    for vergaderjaar, (_, total_entries, has_next) in zip(VERGADERJAREN, first_pages):
+        logger.info(f"Vergaderjaar {vergaderjaar} has {total_entries} entries")
+        if has_next:
+            count_pages = math.ceil(total_entries / RESULTS_PER_PAGE)
+            page_tasks.extend((vergaderjaar, page) for page in range(2, count_pages + 1))
+    logger.info(f"Crawling {len(page_tasks)} result pages")
+    other_pages = crawl_engine.map(
+        lambda page_task: crawl_search_results_page(
+            html_store, page_task[0], page_task[1], fetch, meta_store, cache_policy
+        ),
+        page_tasks,
+    )
+
+    references_by_vergaderjaar = {
+        vergaderjaar: list(references) for vergaderjaar, (references, _, _) in zip(VERGADERJAREN, first_pages)
+    }
+    for (vergaderjaar, _), (references, _, _) in zip(page_tasks, other_pages):
+        references_by_vergaderjaar[vergaderjaar].extend(references)
+    segments: List[List[EntryReference]] = []
+    for vergaderjaar in VERGADERJAREN:
+        segments.extend(segments_from_references(references_by_vergaderjaar[vergaderjaar]))
+    get_index_log(index_store, index_id).write(segments)
+
+
+def crawl_new_references(
+    html_store: BytesStoreBase,
+    vergaderjaar: str,
+    urls_known: Set[str],
+    fetch: Optional[Fetch] = None,
+    meta_store: Optional[DictStoreBase] = None,
+    cache_policy: Optional[CachePolicy] = None,
+) -> Tuple[List[EntryReference], Optional[str]]:
+    """Crawl the result pages of a vergaderjaar newest first until a known reference shows up.
+
+    Returns the new references in page order and the url of the first known reference that
+    was found, which tells where the new references belong in the existing index.
+    """
+    references_new: List[EntryReference] = []
+    page = 1
+    while True:
+        references, _, has_next = crawl_search_results_page(
+            html_store, vergaderjaar, page, fetch, meta_store, cache_policy
+        )
+        for reference in references:
+            if reference.content_url_html in urls_known:
+                return references_new, reference.content_url_html
+            references_new.append(reference)
+        if not has_next:
+            return references_new, None
+        page += 1
+
+
+def update_index(
+    index_store: BytesStoreBase,
+    index_id: str,
+    html_store: BytesStoreBase,
+    crawl_engine: Optional[CrawlEngine] = None,
+    meta_store: Optional[DictStoreBase] = None,
+    cache_policy: Optional[CachePolicy] = None,
+) -> List[EntryReference]:
+    """Add the references published since the stored index was built, returns the new ones.
+
+    Results are sorted by publication date descending, so every vergaderjaar is crawled from
+    its first page and the crawl stops at the first reference already in the index. Listing
+    pages are revalidated when stale according to the cache policy. The new references are
+    stored as new segments, existing segments are not rewritten until the small segments
+    of the updates are compacted. Falls back to a full build when there is no index yet.
+    """
+    index_log = get_index_log(index_store, index_id)
+    if not index_log.exists():
+        index_object = load_index(index_store, index_id)
+        if index_object is None:
+            build_index(index_store, index_id, html_store, crawl_engine, meta_store, cache_policy)
+            return list(yield_index_references(index_store, index_id))
+        logger.info(f"Converting index {index_id} to segments")
+        index_log.write(segments_from_references(index_object.references))
+    if crawl_engine is None:
+        crawl_engine = CrawlEngine()
+    if cache_policy is None:
+        cache_policy = CachePolicy()
+    fetch = crawl_engine.fetch
+
+    manifest = index_log.load_manifest()
+    if manifest is None:
+        raise ValueError(f"Index {index_id} not found in store")
+    # position in the manifest of the segment that holds every known reference
+    segment_position_by_url: Dict[str, int] = {}
+    for segment_position, (_, references) in enumerate(index_log.yield_segments(manifest)):
+        for reference in references:
+            segment_position_by_url[reference.content_url_html] = segment_position
+    urls_known = set(segment_position_by_url)
+
+    crawl_results = crawl_engine.map(
+        lambda vergaderjaar: crawl_new_references(
+            html_store, vergaderjaar, urls_known, fetch, meta_store, cache_policy
+        ),
+        VERGADERJAREN,
+    )
+    # new references go before the segment of the known reference they were found above,
+    # references of a vergaderjaar without any known reference are the newest and go first.
+    # Pages shift while new documents are published, so the same reference can show up twice.
+    segments_by_position: List[Tuple[int, List[EntryReference]]] = []
+    references_added: List[EntryReference] = []
+    urls_seen: Set[str] = set(urls_known)
+    for references_new, url_anchor in crawl_results:
+        references_unique = []
+        for reference in references_new:
+            if reference.content_url_html not in urls_seen:
+                urls_seen.add(reference.content_url_html)
+                references_unique.append(reference)
+        position = 0 if url_anchor is None else segment_position_by_url[url_anchor]
+        for segment in segments_from_references(references_unique):
+            segments_by_position.append((position, segment))
+        references_added.extend(references_unique)
+    logger.info(f"Adding {len(references_added)} references to index {index_id}")
+    index_log.insert_segments(segments_by_position)
+    index_log.compact(INDEX_SEGMENT_SIZE)
+    return references_added
+
+
+def yield_index_references(index_store: BytesStoreBase, index_id: str) -> Iterator[EntryReference]:
+    """Stream the references of an index segment by segment.
+
+    Indexes written before the segmented format are a single blob under the index id, they
+    are loaded whole.
+    """
+    index_log = get_index_log(index_store, index_id)
+    manifest = index_log.load_manifest()
+    if manifest is not None:
+        yield from index_log.yield_items(manifest)
+        return
+    index_bytes = index_store.mget([index_id])[0]
+    if index_bytes:
+        yield from EntryReferenceIndex.model_validate_json(index_bytes.decode("utf-8")).references
+
+
+def index_exists(index_store: BytesStoreBase, index_id: str) -> bool:
+    if get_index_log(index_store, index_id).exists():
+        return True
+    return index_store.mget([index_id])[0] is not None
+
+
+def count_index_references(index_store: BytesStoreBase, index_id: str) -> Optional[int]:
+    """Number of references in the index from its manifest, None when the index is not segmented."""
+    manifest = get_index_log(index_store, index_id).load_manifest()
+    if manifest is None:
+        return None
+    return manifest.count_items
 
 
 def load_index(index_store: BytesStoreBase, index_id: str) -> Optional[EntryReferenceIndex]:
+    if get_index_log(index_store, index_id).exists():
+        return EntryReferenceIndex(references=list(yield_index_references(index_store, index_id)))
     index_bytes = index_store.mget([index_id])[0]
     if index_bytes:
         index_object = EntryReferenceIndex.model_validate_json(index_bytes.decode("utf-8"))
@@ -239,31 +578,296 @@ def load_index(index_store: BytesStoreBase, index_id: str) -> Optional[EntryRefe
     return None
 
 
+def entry_id_from_reference(reference: EntryReference) -> str:
+    return reference.content_url_html.replace(
+        "https://zoek.officielebekendmakingen.nl/", ""
+    ).replace(".html", ".json")
+
+
+def parse_fetched_page(fetched_page: Tuple[EntryReference, str]) -> Optional[EntryContent]:
+    """Parse a fetched document page, module level so it can run in a process pool."""
+    reference, content_str = fetched_page
+    return parse_page_content_html(content_str, reference)
+
+
+def parse_fetched_page_or_failure(fetched_page: Tuple[EntryReference, str]) -> Union[EntryContent, ParseFailure]:
+    """Parse a fetched document page, returning a failure record instead of raising."""
+    reference = fetched_page[0]
+    try:
+        entry_content = parse_fetched_page(fetched_page)
+    except Exception as e:
+        return parse_failure_from_reference(reference, repr(e))
+    if entry_content is None:
+        return parse_failure_from_reference(reference, "No broodtekst found in page")
+    return entry_content
+
+
+def parse_failure_from_reference(reference: EntryReference, error: str) -> ParseFailure:
+    return ParseFailure(
+        entry_id=entry_id_from_reference(reference),
+        content_url_html=reference.content_url_html,
+        parser_version=PARSER_VERSION,
+        error=error,
+        failed_at=time.time(),
+    )
+
+
+def parse_fetched_page_with_fragment(
+    fetched_page: Tuple[EntryReference, str, bool],
+) -> Tuple[Union[EntryContent, ParseFailure], Optional[bytes]]:
+    """Parse a fetched page, extracting its fragment first when it is a raw page.
+
+    Returns the parse result and the compressed fragment to store, None when the page
+    already was a fragment or has no broodtekst.
+    """
+    reference, content_str, is_fragment = fetched_page
+    fragment_bytes = None
+    if not is_fragment:
+        fragment = extract_fragment(content_str, HTML_PARSER_FEATURES)
+        if fragment is None:
+            return parse_failure_from_reference(reference, "No broodtekst found in page"), None
+        content_str = fragment
+        fragment_bytes = compress_fragment(fragment)
+    return parse_fetched_page_or_failure((reference, content_str)), fragment_bytes
+
+
+def apply_raw_retention(
+    html_store: BytesStoreBase,
+    url_hashes: List[str],
+    raw_retention: RawRetention,
+    cold_store: Optional[BytesStoreBase] = None,
+) -> None:
+    """Move or drop raw pages whose fragment is stored."""
+    if raw_retention == "keep" or len(url_hashes) == 0:
+        return
+    if raw_retention == "cold":
+        if cold_store is None:
+            raise ValueError("Raw retention cold needs a cold store")
+        key_value_pairs = [
+            (url_hash, content_bytes)
+            for url_hash, content_bytes in zip(url_hashes, html_store.mget(url_hashes))
+            if content_bytes is not None
+        ]
+        cold_store.mset(key_value_pairs)
+    html_store.mdelete(url_hashes)
+
+
+def yield_references_to_process(
+    references: Iterable[EntryReference],
+    entry_store: ObjectStoreBase[EntryContent],
+    failure_store: Optional[DictStoreBase] = None,
+    batch_size: int = 1000,
+) -> Iterator[EntryReference]:
+    """Skip the references whose entry is already stored or that failed with the current parser.
+
+    Existence is checked in bulk per batch, so resuming a large index costs a few store
+    round trips per thousand references instead of reading every entry.
+    """
+    count_skipped = 0
+    batch: List[EntryReference] = []
+
+    def process_batch(batch: List[EntryReference]) -> List[EntryReference]:
+        nonlocal count_skipped
+        entry_ids = [entry_id_from_reference(reference) for reference in batch]
+        list_exists = entry_store.mexists(entry_ids)
+        entry_ids_failed: Set[str] = set()
+        if failure_store is not None:
+            entry_ids_missing = [entry_id for entry_id, exists in zip(entry_ids, list_exists) if not exists]
+            for entry_id, failure_dict in zip(entry_ids_missing, failure_store.mget(entry_ids_missing)):
+                if failure_dict is not None and failure_dict.get("parser_version", 0) >= PARSER_VERSION:
+                    entry_ids_failed.add(entry_id)
+        references_missing = [
+            reference
+            for reference, entry_id, exists in zip(batch, entry_ids, list_exists)
+            if not exists and entry_id not in entry_ids_failed
+        ]
+        count_skipped += len(batch) - len(references_missing)
+        return references_missing
+
+    for reference in references:
+        batch.append(reference)
+        if len(batch) >= batch_size:
+            yield from process_batch(batch)
+            batch = []
+    if len(batch) > 0:
+        yield from process_batch(batch)
+    logger.info(f"Skipped {count_skipped} references that were already processed")
+
+
+def ingest_references(
+    html_store: BytesStoreBase,
+    references: Iterable[EntryReference],
+    entry_store: ObjectStoreBase[EntryContent],
+    crawl_engine: Optional[CrawlEngine] = None,
+    fetch_workers: int = 8,
+    parse_workers: Optional[int] = None,
+    batch_size: int = 50,
+    meta_store: Optional[DictStoreBase] = None,
+    total: Optional[int] = None,
+    failure_store: Optional[DictStoreBase] = None,
+    fragment_store: Optional[BytesStoreBase] = None,
+    raw_retention: RawRetention = "keep",
+    cold_store: Optional[BytesStoreBase] = None,
+) -> Dict[str, StageMetrics]:
+    """Fetch, parse and store the documents of the references as a pipeline.
+
+    Fetching runs in `fetch_workers` threads, parsing (the CPU bound part) in a process
+    pool and the results are written to the entry store in batches of `batch_size`. The
+    references may be a stream, `total` is then only used for the progress bar. Pages that
+    can not be fetched are skipped and pages that can not be parsed are stored as failures,
+    both are recorded in `failure_store` when given and only the fetch failures are retried.
+
+    With a `fragment_store` the compressed broodtekst fragment of every page is stored
+    under the same key as the raw page, and read instead of the raw page when present.
+    `raw_retention` then decides whether the raw page is kept, moved to `cold_store` or
+    dropped once its fragment is stored.
+    """
+    if total is None and isinstance(references, list):
+        total = len(references)
+    if crawl_engine is None:
+        crawl_engine = CrawlEngine()
+    fetch = crawl_engine.fetch
+
+    def fetch_page(reference: EntryReference) -> Tuple[EntryReference, str]:
+        return reference, get_page_content_from_url(
+            html_store, reference.content_url_html, fetch, meta_store
+        )
+
+    def fetch_page_or_fragment(reference: EntryReference) -> Tuple[EntryReference, str, bool]:
+        if fragment_store is not None:
+            fragment_bytes = fragment_store.mget([url_hash_from_url(reference.content_url_html)])[0]
+            if fragment_bytes is not None:
+                return reference, decompress_fragment(fragment_bytes), True
+        return (*fetch_page(reference), False)
+
+    def fetch_or_record(fetch_function: Callable[[EntryReference], Any]) -> Callable[[EntryReference], Any]:
+        # one page that can not be fetched drops its reference instead of stopping the run
+        def fetch_reference(reference: EntryReference) -> Any:
+            try:
+                return fetch_function(reference)
+            except Exception as e:
+                logger.warning(f"Failed to fetch {reference.content_url_html}: {e!r}")
+                if failure_store is not None:
+                    fetch_failure = FetchFailure(
+                        entry_id=entry_id_from_reference(reference),
+                        content_url_html=reference.content_url_html,
+                        error=repr(e),
+                        failed_at=time.time(),
+                    )
+                    failure_store.mset([(fetch_failure.entry_id, fetch_failure.model_dump())])
+                return None
+
+        return fetch_reference
+
+    def write_entries(parse_results: List[Union[EntryContent, ParseFailure]]) -> None:
+        entry_contents = [result for result in parse_results if isinstance(result, EntryContent)]
+        parse_failures = [result for result in parse_results if isinstance(result, ParseFailure)]
+        if len(entry_contents) > 0:
+            entry_store.mset(
+                [(entry_id_from_reference(entry_content.reference), entry_content) for entry_content in entry_contents]
+            )
+        if len(parse_failures) > 0:
+            logger.warning(f"Failed to parse {len(parse_failures)} pages, first: {parse_failures[0].content_url_html}")
+            if failure_store is not None:
+                failure_store.mset([(parse_failure.entry_id, parse_failure.model_dump()) for parse_failure in parse_failures])
+
+    def write_entries_and_fragments(
+        parse_results: List[Tuple[Union[EntryContent, ParseFailure], Optional[bytes]]],
+    ) -> None:
+        write_entries([parse_result for parse_result, _ in parse_results])
+        # fragments of pages that failed to parse are stored too, so a fixed parser can use them
+        key_value_pairs = []
+        for parse_result, fragment_bytes in parse_results:
+            if fragment_bytes is None:
+                continue
+            if isinstance(parse_result, ParseFailure):
+                url = parse_result.content_url_html
+            else:
+                url = parse_result.reference.content_url_html
+            key_value_pairs.append((url_hash_from_url(url), fragment_bytes))
+        if fragment_store is not None and len(key_value_pairs) > 0:
+            fragment_store.mset(key_value_pairs)
+            apply_raw_retention(html_store, [key for key, _ in key_value_pairs], raw_retention, cold_store)
+
+    if fragment_store is None:
+        stages = [
+            PipelineStage("fetch", fetch_or_record(fetch_page), workers=fetch_workers),
+            PipelineStage("parse", parse_fetched_page_or_failure, workers=parse_workers or os.cpu_count() or 1, use_processes=True),
+        ]
+        sink = write_entries
+    else:
+        stages = [
+            PipelineStage("fetch", fetch_or_record(fetch_page_or_fragment), workers=fetch_workers),
+            PipelineStage("parse", parse_fetched_page_with_fragment, workers=parse_workers or os.cpu_count() or 1, use_processes=True),
+        ]
+        sink = write_entries_and_fragments
+
+    with tqdm(total=total) as progress_bar:
+        pipeline = StagePipeline(
+            stages,
+            sink=sink,
+            batch_size=batch_size,
+            progress=progress_bar.update,
+        )
+        metrics = pipeline.run(references)
+    for stage_metrics in metrics.values():
+        logger.info(
+            f"{stage_metrics.name}: {stage_metrics.count_out} out, {stage_metrics.count_dropped} dropped, "
+            f"{stage_metrics.seconds_busy:.1f}s busy, max queue {stage_metrics.queue_size_max}"
+        )
+    return metrics
+
+
 def main(
     html_store: BytesStoreBase,
     index_store: BytesStoreBase,
     index_id: str,
     entry_store: ObjectStoreBase[EntryContent],
-):
-    index_object = load_index(index_store, index_id)
-    if index_object is None:
-        build_index(index_store, index_id, html_store)
-        index_object = load_index(index_store, index_id)
-    if index_object is None:
+    crawl_engine: Optional[CrawlEngine] = None,
+    fetch_workers: int = 8,
+    parse_workers: Optional[int] = None,
+    batch_size: int = 50,
+    meta_store: Optional[DictStoreBase] = None,
+    update: bool = False,
+    resume: bool = False,
+    failure_store: Optional[DictStoreBase] = None,
+    fragment_store: Optional[BytesStoreBase] = None,
+    raw_retention: RawRetention = "keep",
+    cold_store: Optional[BytesStoreBase] = None,
+) -> Dict[str, StageMetrics]:
+    """Build the index if needed, then fetch, parse and store every document in it.
+
+    With `update` an existing index is first brought up to date with `update_index`. With
+    `resume` references whose entry is already stored, or whose page failed to parse with
+    the current parser version, are skipped. Returns the metrics of the ingest pipeline.
+    """
+    if update:
+        update_index(index_store, index_id, html_store, crawl_engine, meta_store)
+    if not index_exists(index_store, index_id):
+        build_index(index_store, index_id, html_store, crawl_engine, meta_store)
+    if not index_exists(index_store, index_id):
         raise ValueError(f"Index {index_id} not found in store")
-    all_references: List[EntryReference] = []
-
-    for reference in tqdm(index_object.references):
-        content_str = get_page_content_from_url(html_store, reference.content_url_html)
-        beautiful_soup = BeautifulSoup(content_str, "html.parser")
-        entry_content = parse_page_content_soup(beautiful_soup, reference)
-        if not entry_content:
-            continue
-        entry_id = entry_content.reference.content_url_html.replace(
-            "https://zoek.officielebekendmakingen.nl/", ""
-        ).replace(".html", ".json")
-        entry_store.mset([(entry_id, entry_content)])
-    return all_references
+    # the references are streamed from the index segments, processing starts with the first one
+    references: Iterable[EntryReference] = yield_index_references(index_store, index_id)
+    total = count_index_references(index_store, index_id)
+    if resume:
+        references = yield_references_to_process(references, entry_store, failure_store)
+        total = None
+    return ingest_references(
+        html_store,
+        references,
+        entry_store,
+        crawl_engine,
+        fetch_workers,
+        parse_workers,
+        batch_size,
+        meta_store,
+        total=total,
+        failure_store=failure_store,
+        fragment_store=fragment_store,
+        raw_retention=raw_retention,
+        cold_store=cold_store,
+    )
 
 
 if __name__ == "__main__":
@@ -272,9 +876,9 @@ if __name__ == "__main__":
     database_name = "database_ob"
     CONNECTION_STRING_OB_CACHE = os.getenv("CONNECTION_STRING_OB_CACHE")
     CONNECTION_STRING_OB_INDEX = os.getenv("CONNECTION_STRING_OB_INDEX")
-    html_store = StoreProviderS3(database_name, CONNECTION_STRING_OB_CACHE).get_bytes_store(
-        "html_cache"
-    )
+    html_store = StoreProviderS3(
+        database_name, CONNECTION_STRING_OB_CACHE, key_filter_collection_names=["html_cache"]
+    ).get_bytes_store("html_cache")
     index_store = StoreProviderS3(database_name, CONNECTION_STRING_OB_INDEX).get_bytes_store(
         "index_store"
     )
@@ -299,5 +903,9 @@ if __name__ == "__main__":
         "database_ob_entries",
         path_dir_database,
     ).get_object_store("entry_content", EntryContent)
+    failure_store = StoreProviderDisk(
+        "database_ob_entries",
+        path_dir_database,
+    ).get_dict_store("parse_failures")
 
-    main(html_store, index_store, "index_2025-2021", entry_store)
+    main(html_store, index_store, "index_2025-2021", entry_store, resume=True, failure_store=failure_store)
@@ -1,29 +1,112 @@
-import zipfile
+import importlib.util
 import json
-from typing import List
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Deque, Iterator, List, Optional, TypeVar
 
 from dutch_politics.model import PoliticalEntry
+
+R = TypeVar("R")
+
+# orjson decodes several times faster than the standard library when it is installed
+if importlib.util.find_spec("orjson"):
+    import orjson
+
+    def _json_loads(data: bytes) -> Any:
+        return orjson.loads(data)
+
+else:
+
+    def _json_loads(data: bytes) -> Any:
+        return json.loads(data)
+
+
+def list_json_members(path_file_data: str) -> List[str]:
+    with zipfile.ZipFile(path_file_data, "r") as zip_ref:
+        return [f for f in zip_ref.namelist() if f.endswith(".json")]
+
+
+def _identity(entry: PoliticalEntry) -> PoliticalEntry:
+    return entry
+
+
+def map_members(path_file_data: str, json_files: List[str], function: Callable[[PoliticalEntry], R]) -> List[R]:
+    """Read a chunk of members and apply a function, module level so worker processes can run it.
+
+    The zip is opened per chunk, which costs one read of the central directory per chunk and
+    leaves no file handle open in the worker.
+    """
+    with zipfile.ZipFile(path_file_data, "r") as zip_ref:
+        return [function(PoliticalEntry(**_json_loads(zip_ref.read(json_file)))) for json_file in json_files]
+
+
+def map_zip_entries(
+    path_file_data: str,
+    function: Callable[[PoliticalEntry], R],
+    workers: Optional[int] = None,
+    chunk_size: int = 256,
+) -> Iterator[R]:
+    """Apply a picklable function to every entry in worker processes, results in member order.
+
+    The member list is split into chunks, every worker opens the zip itself and decompresses,
+    decodes and validates its chunks. Only a few chunks per worker are in flight, so memory
+    stays flat however large the corpus is. Only the results travel back to this process, so
+    throughput scales with cores when the function reduces an entry to something small.
+    """
+    json_files = list_json_members(path_file_data)
+    chunks = (json_files[i : i + chunk_size] for i in range(0, len(json_files), chunk_size))
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as executor:
+        futures: Deque[Future] = deque(
+            executor.submit(map_members, path_file_data, chunk, function) for chunk in islice(chunks, workers * 2)
+        )
+        while futures:
+            results = futures.popleft().result()
+            chunk = next(chunks, None)
+            if chunk is not None:
+                futures.append(executor.submit(map_members, path_file_data, chunk, function))
+            yield from results
+
+
+def yield_data_from_zip(
+    path_file_data: str,
+    workers: Optional[int] = None,
+    chunk_size: int = 256,
+) -> Iterator[PoliticalEntry]:
+    """Yield the entries of the zip one by one, in member order.
+
+    With `workers` the entries are decoded by a process pool (see `map_zip_entries`). Whole
+    entries then have to be unpickled here, which costs about as much as decoding them, so
+    this only pays off when decompression dominates; move the per-entry work into the
+    workers with `map_zip_entries` to scale with cores.
+    """
+    if workers is not None and workers > 1:
+        yield from map_zip_entries(path_file_data, _identity, workers, chunk_size)
+        return
+    with zipfile.ZipFile(path_file_data, "r") as zip_ref:
+        for json_file in [f for f in zip_ref.namelist() if f.endswith(".json")]:
+            yield PoliticalEntry(**_json_loads(zip_ref.read(json_file)))
+
+
 def read_data_from_zip(path_file_data: str) -> List[PoliticalEntry]:
-    entry_list = []
-    with zipfile.ZipFile(path_file_data, 'r') as zip_ref:
-        # Get list of JSON files in the zip
-        json_files = [f for f in zip_ref.namelist() if f.endswith('.json')]
-        # Read each JSON file directly from the zip
-        for json_file in json_files:
-            with zip_ref.open(json_file) as f:
-                data = json.load(f)
-                entry_list.append(PoliticalEntry(**data))
-    return entry_list
+    return list(yield_data_from_zip(path_file_data))
+
 
 if __name__ == "__main__":
     # load the zip file and read json files directly from it:
     path_file_data = 'data/entry_content.zip'
-    entry_list = read_data_from_zip(path_file_data)
-    print(len(entry_list))
+    count_entries = 0
     list_politician_name = []
     list_politician_name_title = []
-    for entry in entry_list[:10]:
+    for entry in yield_data_from_zip(path_file_data, workers=os.cpu_count()):
+        count_entries += 1
+        if count_entries > 10:
+            continue
         print(json.dumps(entry.model_dump(), indent=4))
         for element in entry.entry_elements:
             list_politician_name.append(element.speaker_name)
-            list_politician_name_title.append(element.speaker_name_title)
\ No newline at end of file
+            list_politician_name_title.append(element.speaker_name_title)
+    print(count_entries)
@@ -0,0 +1,48 @@
+import zlib
+from typing import Literal, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.element import Comment, NavigableString, Tag
+
+# what happens to the raw page once its fragment is stored
+RawRetention = Literal["keep", "cold", "drop"]
+
+_STRAINER_BROODTEKST = SoupStrainer("div", id="broodtekst")
+
+
+def extract_fragment_soup(content_str: str, features: str = "html.parser") -> Optional[Tag]:
+    """Return the div#broodtekst of a document page with everything the parsers do not read removed.
+
+    Scripts, styles and comments other than the vlos annotations are dropped, and so is the
+    indentation between block elements. Whitespace inside paragraphs is kept, so the text
+    the parsers extract is unchanged.
+    """
+    beautiful_soup = BeautifulSoup(content_str, features, parse_only=_STRAINER_BROODTEKST)
+    content_div = beautiful_soup.find("div", id="broodtekst")
+    if not isinstance(content_div, Tag):
+        return None
+    for element in content_div.find_all(["script", "style"]):
+        element.decompose()
+    for string in list(content_div.find_all(string=True)):
+        if isinstance(string, Comment):
+            if not string.strip().startswith("vlos:"):
+                string.extract()
+        elif isinstance(string, NavigableString) and string.parent is not None:
+            if string.parent.name == "div" and not string.strip():
+                string.extract()
+    return content_div
+
+
+def extract_fragment(content_str: str, features: str = "html.parser") -> Optional[str]:
+    content_div = extract_fragment_soup(content_str, features)
+    if content_div is None:
+        return None
+    return str(content_div)
+
+
+def compress_fragment(fragment: str) -> bytes:
+    return zlib.compress(fragment.encode("utf-8"), 9)
+
+
+def decompress_fragment(fragment_bytes: bytes) -> str:
+    return zlib.decompress(fragment_bytes).decode("utf-8")
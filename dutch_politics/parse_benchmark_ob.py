@@ -0,0 +1,93 @@
+import logging
+import time
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+from dutch_politics.http_scraper_ob import (
+    HTML_PARSER_FEATURES,
+    EntryReference,
+    parse_page_content_html,
+    parse_page_content_soup,
+    parse_search_results_html,
+    parse_search_results_soup,
+)
+from dutch_politics.store.bytes_store_base import BytesStoreBase
+from dutch_politics.store.store_provider_disk import StoreProviderDisk
+
+logger = logging.getLogger(__name__)
+
+# document pages are parsed without their index entry, the reference is only copied along
+_REFERENCE_EMPTY = EntryReference(
+    title="", subtitle="", content_url_html="", content_url_pdf="", publication_date=""
+)
+
+
+def page_type(content_str: str) -> Optional[str]:
+    if 'id="Publicaties"' in content_str:
+        return "listing"
+    if 'id="broodtekst"' in content_str:
+        return "document"
+    return None
+
+
+def parse_full_tree(content_str: str) -> Any:
+    """Output of the original parsers, which build a tree of the whole page."""
+    beautiful_soup = BeautifulSoup(content_str, "html.parser")
+    if page_type(content_str) == "listing":
+        references, total_entries, has_next = parse_search_results_soup(beautiful_soup)
+        return [reference.model_dump() for reference in references], total_entries, has_next
+    entry_content = parse_page_content_soup(beautiful_soup, _REFERENCE_EMPTY)
+    return None if entry_content is None else entry_content.model_dump()
+
+
+def parse_fast_path(content_str: str, features: str = HTML_PARSER_FEATURES) -> Any:
+    if page_type(content_str) == "listing":
+        references, total_entries, has_next = parse_search_results_html(content_str, features)
+        return [reference.model_dump() for reference in references], total_entries, has_next
+    entry_content = parse_page_content_html(content_str, _REFERENCE_EMPTY, features)
+    return None if entry_content is None else entry_content.model_dump()
+
+
+def yield_cached_pages(html_store: BytesStoreBase, limit: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+    for key in islice(html_store.yield_keys(), limit):
+        content_bytes = html_store.mget([key])[0]
+        if content_bytes is not None:
+            yield key, content_bytes.decode("utf-8")
+
+
+def benchmark(
+    contents: List[str], parse_function: Callable[[str], Any], repeat: int = 3
+) -> Tuple[float, float]:
+    """Return the best pages per second and the total megabytes per second over `repeat` runs."""
+    size_megabytes = sum(len(content_str) for content_str in contents) / 1e6
+    seconds_best = float("inf")
+    for _ in range(repeat):
+        time_start = time.perf_counter()
+        for content_str in contents:
+            parse_function(content_str)
+        seconds_best = min(seconds_best, time.perf_counter() - time_start)
+    return len(contents) / seconds_best, size_megabytes / seconds_best
+
+
+def benchmark_parsers(html_store: BytesStoreBase, limit: int = 200) -> Dict[str, float]:
+    contents = [content_str for _, content_str in yield_cached_pages(html_store, limit) if page_type(content_str)]
+    results = {}
+    parse_functions: Dict[str, Callable[[str], Any]] = {
+        "full_tree": parse_full_tree,
+        "fast_path": parse_fast_path,
+        "fast_path_html_parser": lambda content_str: parse_fast_path(content_str, "html.parser"),
+    }
+    for name, parse_function in parse_functions.items():
+        pages_per_second, megabytes_per_second = benchmark(contents, parse_function)
+        logger.info(f"{name}: {pages_per_second:.1f} pages/s, {megabytes_per_second:.2f} MB/s")
+        results[name] = pages_per_second
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    store_provider = StoreProviderDisk("database_ob", "data")
+    html_store = store_provider.get_bytes_store("html_cache")
+    benchmark_parsers(html_store)
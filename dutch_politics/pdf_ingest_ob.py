@@ -0,0 +1,300 @@
+import hashlib
+import importlib.util
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from pydantic import BaseModel
+from tqdm import tqdm
+
+from dutch_politics.crawl_engine import CrawlEngine
+from dutch_politics.http_scraper_ob import (
+    EntryContent,
+    EntryElement,
+    EntryReference,
+    entry_id_from_reference,
+    url_hash_from_url,
+    yield_index_references,
+)
+from dutch_politics.stage_pipeline import PipelineStage, StageMetrics, StagePipeline
+from dutch_politics.store.bytes_store_base import BytesStoreBase
+from dutch_politics.store.dict_store_base import DictStoreBase
+from dutch_politics.store.object_store_base import ObjectStoreBase
+from dutch_politics.store.store_provider_disk import StoreProviderDisk
+
+logger = logging.getLogger(__name__)
+
+# text extraction needs pypdf, downloading works without it
+PDF_TEXT_EXTRACTION_AVAILABLE = importlib.util.find_spec("pypdf") is not None
+# bump when the extraction changes, pdfs extracted by older versions are extracted again
+PDF_EXTRACTOR_VERSION = 1
+PDF_CHUNK_SIZE = 1 << 20
+
+
+class PdfDownload(BaseModel):
+    """Metadata of a stored pdf, kept under the url hash next to the pdf itself."""
+
+    url: str
+    content_hash: str
+    size_bytes: int
+    downloaded_at: float
+
+
+class PdfExtraction(BaseModel):
+    """Record of an extracted pdf, kept under its content hash."""
+
+    content_hash: str
+    entry_id: str
+    extractor_version: int
+    count_pages: int
+    error: Optional[str] = None
+    extracted_at: float
+
+
+class PdfDownloadFailure(BaseModel):
+    """Record of a pdf that could not be downloaded, kept under the entry id and retried next run."""
+
+    entry_id: str
+    url: str
+    error: str
+    failed_at: float
+
+
+class _PdfToExtract(BaseModel):
+    reference: EntryReference
+    content_hash: str
+    # temporary copy of the pdf for the extraction process, removed by the extraction
+    path_file: str
+
+
+def extract_pdf_pages(path_file: str) -> List[str]:
+    """Extract the text of every page, pypdf reads the file lazily one page at a time."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path_file)
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+def extract_pdf(
+    pdf_to_extract: _PdfToExtract,
+) -> Tuple[_PdfToExtract, Optional[EntryContent], Optional[str]]:
+    """Turn a downloaded pdf into an entry with one element per page, module level for a process pool."""
+    try:
+        pages = extract_pdf_pages(pdf_to_extract.path_file)
+    except Exception as e:
+        return pdf_to_extract, None, repr(e)
+    finally:
+        os.remove(pdf_to_extract.path_file)
+    entry_elements = [
+        EntryElement(type="other", speaker_name=None, speaker_name_title=None, text=text) for text in pages
+    ]
+    return pdf_to_extract, EntryContent(reference=pdf_to_extract.reference, entry_elements=entry_elements), None
+
+
+def _hash_and_copy(chunks: Iterable[bytes], sha256: "hashlib._Hash", file: BinaryIO) -> Iterator[bytes]:
+    for chunk in chunks:
+        sha256.update(chunk)
+        file.write(chunk)
+        yield chunk
+
+
+def download_pdf(
+    pdf_store: BytesStoreBase,
+    pdf_meta_store: DictStoreBase,
+    url: str,
+    crawl_engine: CrawlEngine,
+    file: BinaryIO,
+) -> PdfDownload:
+    """Stream a pdf into the store chunk by chunk, hashing it and copying it to `file` on the way."""
+    sha256 = hashlib.sha256()
+    url_hash = url_hash_from_url(url)
+    with crawl_engine.stream_content(url, PDF_CHUNK_SIZE) as chunks:
+        size_bytes = pdf_store.set_stream(url_hash, _hash_and_copy(chunks, sha256, file))
+    pdf_download = PdfDownload(
+        url=url, content_hash=sha256.hexdigest(), size_bytes=size_bytes, downloaded_at=time.time()
+    )
+    pdf_meta_store.mset([(url_hash, pdf_download.model_dump())])
+    return pdf_download
+
+
+def load_pdf_download(pdf_meta_store: DictStoreBase, url: str) -> Optional[PdfDownload]:
+    meta_dict = pdf_meta_store.mget([url_hash_from_url(url)])[0]
+    if meta_dict is None:
+        return None
+    return PdfDownload(**meta_dict)
+
+
+def load_extraction(extraction_store: DictStoreBase, content_hash: str) -> Optional[PdfExtraction]:
+    """The extraction of a content hash by the current extractor, None when missing, outdated or failed."""
+    extraction_dict = extraction_store.mget([content_hash])[0]
+    if extraction_dict is None:
+        return None
+    extraction = PdfExtraction(**extraction_dict)
+    if extraction.extractor_version < PDF_EXTRACTOR_VERSION or extraction.error is not None:
+        return None
+    return extraction
+
+
+def is_extracted(extraction_store: DictStoreBase, content_hash: str) -> bool:
+    return load_extraction(extraction_store, content_hash) is not None
+
+
+def ingest_pdfs(
+    references: Iterable[EntryReference],
+    pdf_store: BytesStoreBase,
+    pdf_meta_store: DictStoreBase,
+    extraction_store: DictStoreBase,
+    pdf_entry_store: ObjectStoreBase[EntryContent],
+    crawl_engine: Optional[CrawlEngine] = None,
+    fetch_workers: int = 4,
+    extract_workers: Optional[int] = None,
+    batch_size: int = 20,
+    total: Optional[int] = None,
+    failure_store: Optional[DictStoreBase] = None,
+) -> Dict[str, StageMetrics]:
+    """Download the pdfs of the references and store their text per page as entries.
+
+    Downloads are streamed into `pdf_store` (keyed by the url hash) and copied to a temporary
+    file for the extraction process, so no pdf is held in memory whole. A pdf that was
+    downloaded before is not downloaded again. Extraction is skipped for pdfs whose content
+    hash was already extracted by the current extractor version, also when the same pdf is
+    published under another url, the entry is then copied to the entry id of the reference.
+    The entries are stored under the entry id of the reference in `pdf_entry_store`, separate
+    from the entries parsed from the html. Pdfs that fail to download are logged, recorded in
+    `failure_store` when given and retried on the next run, as are pdfs that failed to extract.
+    """
+    if not PDF_TEXT_EXTRACTION_AVAILABLE:
+        raise ImportError("Extracting pdf text needs pypdf, install it with pip install pypdf")
+    if crawl_engine is None:
+        crawl_engine = CrawlEngine()
+
+    # temporary files handed to the extraction, removed after the run when it stopped early
+    paths_pending: Set[str] = set()
+    count_failed = 0
+    lock = threading.Lock()
+
+    def link_extracted(reference: EntryReference, content_hash: str) -> bool:
+        """Whether the pdf was extracted, its entry is copied when that happened for another reference."""
+        extraction = load_extraction(extraction_store, content_hash)
+        if extraction is None:
+            return False
+        entry_id = entry_id_from_reference(reference)
+        if extraction.entry_id != entry_id and not pdf_entry_store.mexists([entry_id])[0]:
+            entry_content = pdf_entry_store.mget([extraction.entry_id])[0]
+            if entry_content is None:
+                return False
+            pdf_entry_store.mset(
+                [(entry_id, EntryContent(reference=reference, entry_elements=entry_content.entry_elements))]
+            )
+        return True
+
+    def download_or_skip(reference: EntryReference) -> Optional[_PdfToExtract]:
+        url = reference.content_url_pdf
+        pdf_download = load_pdf_download(pdf_meta_store, url)
+        chunks = None
+        if pdf_download is not None:
+            if link_extracted(reference, pdf_download.content_hash):
+                return None
+            chunks = pdf_store.get_stream(url_hash_from_url(url), PDF_CHUNK_SIZE)
+        file_descriptor, path_file = tempfile.mkstemp(suffix=".pdf")
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                if chunks is not None and pdf_download is not None:
+                    for chunk in chunks:
+                        file.write(chunk)
+                else:
+                    pdf_download = download_pdf(pdf_store, pdf_meta_store, url, crawl_engine, file)
+            # the same pdf may have been extracted under another url
+            if link_extracted(reference, pdf_download.content_hash):
+                os.remove(path_file)
+                return None
+        except BaseException:
+            os.remove(path_file)
+            raise
+        with lock:
+            paths_pending.add(path_file)
+        return _PdfToExtract(reference=reference, content_hash=pdf_download.content_hash, path_file=path_file)
+
+    def download(reference: EntryReference) -> Optional[_PdfToExtract]:
+        nonlocal count_failed
+        try:
+            return download_or_skip(reference)
+        except Exception as e:
+            logger.warning(f"Failed to download {reference.content_url_pdf}: {e!r}")
+            with lock:
+                count_failed += 1
+            if failure_store is not None:
+                failure = PdfDownloadFailure(
+                    entry_id=entry_id_from_reference(reference),
+                    url=reference.content_url_pdf,
+                    error=repr(e),
+                    failed_at=time.time(),
+                )
+                failure_store.mset([(failure.entry_id, failure.model_dump())])
+            return None
+
+    def write_extractions(
+        extractions: List[Tuple[_PdfToExtract, Optional[EntryContent], Optional[str]]],
+    ) -> None:
+        with lock:
+            paths_pending.difference_update(pdf_to_extract.path_file for pdf_to_extract, _, _ in extractions)
+        entries = [
+            (entry_id_from_reference(pdf_to_extract.reference), entry_content)
+            for pdf_to_extract, entry_content, _ in extractions
+            if entry_content is not None
+        ]
+        if len(entries) > 0:
+            pdf_entry_store.mset(entries)
+        records = []
+        for pdf_to_extract, entry_content, error in extractions:
+            if error is not None:
+                logger.warning(f"Failed to extract {pdf_to_extract.reference.content_url_pdf}: {error}")
+            extraction = PdfExtraction(
+                content_hash=pdf_to_extract.content_hash,
+                entry_id=entry_id_from_reference(pdf_to_extract.reference),
+                extractor_version=PDF_EXTRACTOR_VERSION,
+                count_pages=len(entry_content.entry_elements) if entry_content is not None else 0,
+                error=error,
+                extracted_at=time.time(),
+            )
+            records.append((pdf_to_extract.content_hash, extraction.model_dump()))
+        extraction_store.mset(records)
+
+    references = (reference for reference in references if reference.content_url_pdf)
+    stages = [
+        PipelineStage("download", download, workers=fetch_workers),
+        PipelineStage("extract", extract_pdf, workers=extract_workers or os.cpu_count() or 1, use_processes=True),
+    ]
+    try:
+        with tqdm(total=total) as progress_bar:
+            pipeline = StagePipeline(stages, sink=write_extractions, batch_size=batch_size, progress=progress_bar.update)
+            metrics = pipeline.run(references)
+    finally:
+        for path_file in paths_pending:
+            if os.path.exists(path_file):
+                os.remove(path_file)
+    count_skipped = metrics["download"].count_dropped - count_failed
+    logger.info(f"Skipped {count_skipped} pdfs that were already extracted, {count_failed} failed to download")
+    return metrics
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    store_provider = StoreProviderDisk("database_ob", "data")
+    index_store = store_provider.get_bytes_store("index_store")
+    pdf_store = store_provider.get_bytes_store("pdf_cache")
+    pdf_meta_store = store_provider.get_dict_store("pdf_cache_meta")
+    store_provider_entries = StoreProviderDisk("database_ob_entries", "data")
+    extraction_store = store_provider_entries.get_dict_store("pdf_extractions")
+    pdf_entry_store = store_provider_entries.get_object_store("entry_content_pdf", EntryContent)
+    ingest_pdfs(
+        yield_index_references(index_store, "index_2025-2021"),
+        pdf_store,
+        pdf_meta_store,
+        extraction_store,
+        pdf_entry_store,
+        failure_store=store_provider_entries.get_dict_store("pdf_download_failures"),
+    )
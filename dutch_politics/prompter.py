@@ -9,7 +9,7 @@ from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
 
-from dutch_politics.index import StatementQuery
+from dutch_politics.model import StatementQuery
 
 class Prompter:
 
@@ -0,0 +1,65 @@
+import logging
+import os
+from typing import List, Optional
+
+from dutch_politics.cache_policy import HOURS, CachePolicy
+from dutch_politics.crawl_engine import CrawlEngine
+from dutch_politics.http_scraper_ob import (
+    EntryContent,
+    EntryReference,
+    ingest_references,
+    update_index,
+)
+from dutch_politics.store.bytes_store_base import BytesStoreBase
+from dutch_politics.store.dict_store_base import DictStoreBase
+from dutch_politics.store.object_store_base import ObjectStoreBase
+from dutch_politics.store.store_provider_disk import StoreProviderDisk
+from dutch_politics.store.store_provider_s3 import StoreProviderS3
+
+logger = logging.getLogger(__name__)
+
+
+def refresh(
+    html_store: BytesStoreBase,
+    meta_store: DictStoreBase,
+    index_store: BytesStoreBase,
+    index_id: str,
+    entry_store: ObjectStoreBase[EntryContent],
+    crawl_engine: Optional[CrawlEngine] = None,
+    cache_policy: Optional[CachePolicy] = None,
+) -> List[EntryReference]:
+    """Re-crawl the stale listing pages and ingest the documents that newly appeared.
+
+    The index is updated incrementally: listing pages that are still fresh according to the
+    cache policy are served from the html cache, stale ones are revalidated (a 304 costs no
+    download) and crawling stops at the first known reference. Returns the new references.
+    """
+    if crawl_engine is None:
+        crawl_engine = CrawlEngine()
+    references_new = update_index(index_store, index_id, html_store, crawl_engine, meta_store, cache_policy)
+    logger.info(f"Found {len(references_new)} new documents in index {index_id}")
+    if len(references_new) > 0:
+        ingest_references(html_store, references_new, entry_store, crawl_engine, meta_store=meta_store)
+    return references_new
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    database_name = "database_ob"
+    CONNECTION_STRING_OB_CACHE = os.getenv("CONNECTION_STRING_OB_CACHE")
+    CONNECTION_STRING_OB_INDEX = os.getenv("CONNECTION_STRING_OB_INDEX")
+    REFRESH_LISTING_TTL_HOURS = float(os.getenv("REFRESH_LISTING_TTL_HOURS", "6"))
+    store_provider_cache = StoreProviderS3(
+        database_name, CONNECTION_STRING_OB_CACHE, key_filter_collection_names=["html_cache"]
+    )
+    html_store = store_provider_cache.get_bytes_store("html_cache")
+    meta_store = store_provider_cache.get_dict_store("html_cache_meta")
+    index_store = StoreProviderS3(database_name, CONNECTION_STRING_OB_INDEX).get_bytes_store(
+        "index_store"
+    )
+    entry_store = StoreProviderDisk(
+        "database_ob_entries",
+        "data",
+    ).get_object_store("entry_content", EntryContent)
+    cache_policy = CachePolicy({"listing": REFRESH_LISTING_TTL_HOURS * HOURS})
+    refresh(html_store, meta_store, index_store, "index_2025-2021", entry_store, cache_policy=cache_policy)
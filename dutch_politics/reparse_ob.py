@@ -0,0 +1,178 @@
+import hashlib
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+
+from pydantic import BaseModel
+
+from dutch_politics.http_scraper_ob import (
+    PARSER_VERSION,
+    EntryContent,
+    EntryReference,
+    ParseFailure,
+    entry_id_from_reference,
+    parse_failure_from_reference,
+    parse_page_content_html,
+    url_hash_from_url,
+    yield_index_references,
+)
+from dutch_politics.page_fragment import decompress_fragment
+from dutch_politics.store.bytes_store_base import BytesStoreBase
+from dutch_politics.store.dict_store_base import DictStoreBase
+from dutch_politics.store.key_partition import map_collection
+from dutch_politics.store.object_store_base import ObjectStoreBase
+from dutch_politics.store.store_provider_disk import StoreProviderDisk
+
+logger = logging.getLogger(__name__)
+
+# the workers parse without the reference, it is attached again in the main process
+_REFERENCE_EMPTY = EntryReference(
+    title="", subtitle="", content_url_html="", content_url_pdf="", publication_date=""
+)
+
+
+class ReparseReport(BaseModel):
+    parser_version: int
+    count_changed: int = 0
+    count_unchanged: int = 0
+    count_failed: int = 0
+    seconds_elapsed: float = 0.0
+
+
+class EntryVersion(BaseModel):
+    parser_version: int
+    content_hash: str
+
+
+def content_hash(entry_content: EntryContent) -> str:
+    return hashlib.sha256(entry_content.model_dump_json().encode("utf-8")).hexdigest()
+
+
+def reparse_page(key: str, content_bytes: bytes) -> Union[EntryContent, str]:
+    """Parse a cached page in a worker process, returns the error message on failure."""
+    try:
+        entry_content = parse_page_content_html(content_bytes.decode("utf-8"), _REFERENCE_EMPTY)
+    except Exception as e:
+        return repr(e)
+    if entry_content is None:
+        return "No broodtekst found in page"
+    return entry_content
+
+
+def reparse_fragment(key: str, fragment_bytes: bytes) -> Union[EntryContent, str]:
+    return reparse_page(key, decompress_fragment(fragment_bytes).encode("utf-8"))
+
+
+def reparse(
+    html_store: BytesStoreBase,
+    index_store: BytesStoreBase,
+    index_id: str,
+    entry_store: ObjectStoreBase[EntryContent],
+    version_store: DictStoreBase,
+    failure_store: Optional[DictStoreBase] = None,
+    n_partitions: int = 8,
+    max_workers: Optional[int] = None,
+    batch_size: int = 500,
+    fragment_store: Optional[BytesStoreBase] = None,
+) -> ReparseReport:
+    """Re-parse every cached document page of the index without touching the network.
+
+    The html cache is scanned in `n_partitions` parallel partitions and parsed in a process
+    pool. Every entry gets a version record with the parser version and a hash of its
+    output, an entry is only rewritten when that hash changed. With a fragment store the
+    (much smaller) fragments are parsed first, the html cache only for pages without one.
+    """
+    time_start = time.time()
+    report = ReparseReport(parser_version=PARSER_VERSION)
+    reference_by_url_hash: Dict[str, EntryReference] = {
+        url_hash_from_url(reference.content_url_html): reference
+        for reference in yield_index_references(index_store, index_id)
+        if reference.content_url_html
+    }
+    logger.info(f"Reparsing {len(reference_by_url_hash)} documents of index {index_id}")
+
+    pending: List[Tuple[str, EntryContent]] = []
+    failures: List[ParseFailure] = []
+
+    def flush() -> None:
+        if len(pending) > 0:
+            entry_ids = [entry_id for entry_id, _ in pending]
+            hashes_new = [content_hash(entry_content) for _, entry_content in pending]
+            versions_old = version_store.mget(entry_ids)
+            # entries written before version records existed are compared with their stored output
+            entry_ids_unknown = [entry_id for entry_id, version in zip(entry_ids, versions_old) if version is None]
+            hashes_old: Dict[str, str] = {}
+            for entry_id, version in zip(entry_ids, versions_old):
+                if version is not None:
+                    hashes_old[entry_id] = version["content_hash"]
+            for entry_id, entry_content_old in zip(entry_ids_unknown, entry_store.mget(entry_ids_unknown)):
+                if entry_content_old is not None:
+                    hashes_old[entry_id] = content_hash(entry_content_old)
+
+            entries_changed = []
+            versions_new = []
+            for (entry_id, entry_content), hash_new, version_old in zip(pending, hashes_new, versions_old):
+                if hashes_old.get(entry_id) == hash_new:
+                    report.count_unchanged += 1
+                else:
+                    report.count_changed += 1
+                    entries_changed.append((entry_id, entry_content))
+                if version_old != {"parser_version": PARSER_VERSION, "content_hash": hash_new}:
+                    versions_new.append(
+                        (entry_id, EntryVersion(parser_version=PARSER_VERSION, content_hash=hash_new).model_dump())
+                    )
+            if len(entries_changed) > 0:
+                entry_store.mset(entries_changed)
+            if len(versions_new) > 0:
+                version_store.mset(versions_new)
+            pending.clear()
+        if len(failures) > 0:
+            report.count_failed += len(failures)
+            if failure_store is not None:
+                failure_store.mset([(failure.entry_id, failure.model_dump()) for failure in failures])
+            failures.clear()
+
+    sources: List[Tuple[BytesStoreBase, Callable[[str, bytes], Union[EntryContent, str]]]] = []
+    if fragment_store is not None:
+        sources.append((fragment_store, reparse_fragment))
+    sources.append((html_store, reparse_page))
+    url_hashes_done: Set[str] = set()
+    for source_store, function in sources:
+        for key, result in map_collection(
+            source_store,
+            function,
+            n_partitions=n_partitions,
+            max_workers=max_workers,
+            key_filter=lambda key: key in reference_by_url_hash and key not in url_hashes_done,
+        ):
+            url_hashes_done.add(key)
+            reference = reference_by_url_hash[key]
+            if isinstance(result, str):
+                failures.append(parse_failure_from_reference(reference, result))
+            else:
+                pending.append((entry_id_from_reference(reference), result.model_copy(update={"reference": reference})))
+            if len(pending) + len(failures) >= batch_size:
+                flush()
+    flush()
+    report.seconds_elapsed = time.time() - time_start
+    logger.info(
+        f"Reparse with parser version {PARSER_VERSION}: {report.count_changed} changed, "
+        f"{report.count_unchanged} unchanged, {report.count_failed} failed in {report.seconds_elapsed:.1f}s"
+    )
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    path_dir_database = "data"
+    store_provider = StoreProviderDisk("database_ob", path_dir_database)
+    store_provider_entries = StoreProviderDisk("database_ob_entries", path_dir_database)
+    reparse(
+        store_provider.get_bytes_store("html_cache"),
+        store_provider.get_bytes_store("index_store"),
+        "index_2025-2021",
+        store_provider_entries.get_object_store("entry_content", EntryContent),
+        store_provider_entries.get_dict_store("entry_version"),
+        store_provider_entries.get_dict_store("parse_failures"),
+        fragment_store=store_provider.get_bytes_store("html_fragment"),
+    )
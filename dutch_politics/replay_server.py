@@ -0,0 +1,158 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+from pydantic import BaseModel
+
+from dutch_politics.store.bytes_store_base import BytesStoreBase
+
+logger = logging.getLogger(__name__)
+
+ORIGIN = "https://zoek.officielebekendmakingen.nl"
+
+
+class ReplayConfig(BaseModel):
+    # every response is delayed by latency_seconds plus a uniform jitter of up to jitter_seconds
+    latency_seconds: float = 0.05
+    jitter_seconds: float = 0.02
+    # fraction of requests answered with a 503 or a 429
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after_seconds: int = 1
+    seed: Optional[int] = None
+
+
+class ReplayStats(BaseModel):
+    count_requests: int = 0
+    count_served: int = 0
+    count_not_modified: int = 0
+    count_not_found: int = 0
+    count_errors: int = 0
+    count_rate_limited: int = 0
+
+
+def _etag(content_bytes: bytes) -> str:
+    return '"' + hashlib.sha256(content_bytes).hexdigest()[:32] + '"'
+
+
+class ReplayServer:
+    """Local HTTP server that answers requests from a recorded html cache snapshot.
+
+    The html cache is keyed by the sha256 of the original url, so a request for a path is
+    answered with the page cached for `origin` + path. Pages carry an ETag derived from their
+    content and If-None-Match is answered with a 304, so revalidation can be exercised too.
+    Latency, jitter, server errors and rate limit responses are injected according to the
+    config. Point a `FetchClient` at the server with `url_rewrites={origin: server.base_url}`.
+    """
+
+    def __init__(
+        self,
+        html_store: BytesStoreBase,
+        config: Optional[ReplayConfig] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        origin: str = ORIGIN,
+    ) -> None:
+        self.html_store = html_store
+        self.config = config or ReplayConfig()
+        self.origin = origin
+        self.stats = ReplayStats()
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self.stats, name, getattr(self.stats, name) + 1)
+
+    def _draw(self) -> Tuple[float, float]:
+        # one lock for the shared random generator keeps seeded runs reproducible per request order
+        with self._lock:
+            delay = self.config.latency_seconds + self._random.uniform(0, self.config.jitter_seconds)
+            return delay, self._random.random()
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class ReplayRequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                server._handle(self)
+
+            def log_message(self, format: str, *args: object) -> None:
+                logger.debug(format, *args)
+
+        return ReplayRequestHandler
+
+    def _handle(self, request: BaseHTTPRequestHandler) -> None:
+        self._count("count_requests")
+        delay, draw = self._draw()
+        time.sleep(delay)
+        if draw < self.config.rate_limit_rate:
+            self._count("count_rate_limited")
+            self._send(request, 429, headers={"Retry-After": str(self.config.retry_after_seconds)})
+            return
+        if draw < self.config.rate_limit_rate + self.config.error_rate:
+            self._count("count_errors")
+            self._send(request, 503)
+            return
+        url_hash = hashlib.sha256((self.origin + request.path).encode()).hexdigest()
+        content_bytes = self.html_store.mget([url_hash])[0]
+        if content_bytes is None:
+            self._count("count_not_found")
+            self._send(request, 404)
+            return
+        etag = _etag(content_bytes)
+        if request.headers.get("If-None-Match") == etag:
+            self._count("count_not_modified")
+            self._send(request, 304, headers={"ETag": etag})
+            return
+        self._count("count_served")
+        self._send(request, 200, content_bytes, {"ETag": etag, "Content-Type": "text/html; charset=utf-8"})
+
+    def _send(
+        self,
+        request: BaseHTTPRequestHandler,
+        status_code: int,
+        content_bytes: bytes = b"",
+        headers: Optional[dict] = None,
+    ) -> None:
+        request.send_response(status_code)
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        if status_code != 304:
+            request.send_header("Content-Length", str(len(content_bytes)))
+        request.end_headers()
+        if status_code != 304:
+            request.wfile.write(content_bytes)
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Replaying {self.html_store.collection_name} at {self.base_url}")
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "ReplayServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
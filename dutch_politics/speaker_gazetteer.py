@@ -0,0 +1,240 @@
+import datetime
+import json
+import logging
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from dutch_politics.corpus_columnar import DATE_UNKNOWN, SPEAKER_NONE, ColumnarCorpus, date_from_days
+from dutch_politics.text_dutch import fold_diacritics
+
+logger = logging.getLogger(__name__)
+
+# forms of address and offices that precede a name in titles and in free text queries
+ROLE_WORDS = [
+    "de heer",
+    "mevrouw",
+    "meneer",
+    "dhr",
+    "mw",
+    "minister-president",
+    "premier",
+    "minister",
+    "staatssecretaris",
+    "kamerlid",
+    "de voorzitter",
+    "voorzitter",
+]
+_PATTERN_ROLE = re.compile(r"^(?:(?:" + "|".join(re.escape(role) for role in ROLE_WORDS) + r")\b\.?\s*)+")
+_PATTERN_PARTY = re.compile(r"\(([^)]*)\)")
+_PATTERN_NON_NAME = re.compile(r"[^a-z0-9' -]+")
+_PATTERN_SPACES = re.compile(r"\s+")
+
+
+def normalize_name(name: str) -> str:
+    """Fold case and diacritics, drop forms of address, party tags and punctuation."""
+    name = fold_diacritics(name)
+    name = _PATTERN_PARTY.sub(" ", name)
+    name = _PATTERN_NON_NAME.sub(" ", name)
+    name = _PATTERN_SPACES.sub(" ", name).strip()
+    return _PATTERN_ROLE.sub("", name).strip()
+
+
+def parse_speaker_title(speaker_name_title: str) -> Tuple[Optional[str], str, Optional[str]]:
+    """Split 'De heer Dijk (SP):' into role, name and party: ('de heer', 'Dijk', 'SP')."""
+    text = speaker_name_title.strip().rstrip(":").strip()
+    match = _PATTERN_PARTY.search(text)
+    party = match.group(1).strip() if match else None
+    text = _PATTERN_PARTY.sub("", text).strip()
+    match_role = _PATTERN_ROLE.match(fold_diacritics(text))
+    role = None
+    if match_role:
+        role = match_role.group(0).strip().rstrip(".")
+        text = text[_offset_unfolded(text, match_role.end()) :].strip()
+    return role, text, party
+
+
+def _offset_unfolded(text: str, offset_folded: int) -> int:
+    """Offset in `text` of an offset in its folded form, folding can change the length."""
+    length_folded = 0
+    for offset, character in enumerate(text):
+        if length_folded >= offset_folded:
+            return offset
+        length_folded += len(fold_diacritics(character))
+    return len(text)
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str) -> int:
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, character_a in enumerate(a, 1):
+        current = [i]
+        for j, character_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (character_a != character_b)))
+        previous = current
+    return previous[-1]
+
+
+class SpeakerRecord(BaseModel):
+    speaker_id: str
+    name: str
+    party: Optional[str] = None
+    roles: List[str] = []
+    aliases: List[str] = []
+    count_turns: int = 0
+    date_first: Optional[datetime.date] = None
+    date_last: Optional[datetime.date] = None
+    # codes of the speaker in the dictionary of the columnar corpus, used to filter rows
+    corpus_speaker_ids: List[int] = []
+
+
+class SpeakerMatch(BaseModel):
+    speaker_id: str
+    name: str
+    score: float
+
+
+class SpeakerGazetteer:
+    """Canonical speakers of the corpus with fuzzy name lookup.
+
+    Speakers are identified by the normalised name of the vlos:spreker comment. The speaker
+    titles ('Minister Yeşilgöz-Zegerius:', 'Mevrouw Yeşilgöz-Zegerius (VVD):') add the
+    surname as an alias, the party and the roles. Lookup normalises the query the same way,
+    tries an exact alias match and otherwise ranks aliases by shared trigrams and re-ranks
+    the best of them by edit distance. Turns without a vlos:spreker name are not included.
+    """
+
+    def __init__(self, records: List[SpeakerRecord]) -> None:
+        self.records = {record.speaker_id: record for record in records}
+        self._alias_speakers: Dict[str, List[str]] = defaultdict(list)
+        for record in records:
+            for alias in record.aliases:
+                self._alias_speakers[alias].append(record.speaker_id)
+        self._aliases = list(self._alias_speakers)
+        self._trigram_aliases: Dict[str, List[int]] = defaultdict(list)
+        for alias_index, alias in enumerate(self._aliases):
+            for trigram in trigrams(alias):
+                self._trigram_aliases[trigram].append(alias_index)
+
+    @classmethod
+    def build(cls, corpus: ColumnarCorpus) -> "SpeakerGazetteer":
+        speakers = np.asarray(corpus.columns["element_speaker"])
+        titles = np.asarray(corpus.columns["element_speaker_title"])
+        dates = np.asarray(corpus.columns["element_date"])
+        has_speaker = speakers != SPEAKER_NONE
+        speakers, titles, dates = speakers[has_speaker], titles[has_speaker], dates[has_speaker]
+        count_speakers = len(corpus.speakers)
+        counts = np.bincount(speakers, minlength=count_speakers)
+        has_date = dates != DATE_UNKNOWN
+        date_first = np.full(count_speakers, np.iinfo(np.int32).max, dtype=np.int64)
+        date_last = np.full(count_speakers, DATE_UNKNOWN, dtype=np.int64)
+        np.minimum.at(date_first, speakers[has_date], dates[has_date])
+        np.maximum.at(date_last, speakers[has_date], dates[has_date])
+        # every distinct (speaker, title) pair is parsed once
+        pairs, pair_counts = np.unique(speakers.astype(np.int64) * (len(corpus.speaker_titles) + 1) + titles + 1, return_counts=True)
+
+        records: Dict[str, SpeakerRecord] = {}
+        parties: Dict[str, Counter] = defaultdict(Counter)
+        for corpus_speaker_id, speaker in enumerate(corpus.speakers):
+            if counts[corpus_speaker_id] == 0:
+                continue
+            name = normalize_name(speaker)
+            if not name:
+                continue
+            speaker_id = name.replace(" ", "-")
+            record = records.get(speaker_id)
+            if record is None:
+                record = records[speaker_id] = SpeakerRecord(speaker_id=speaker_id, name=speaker, aliases=[name])
+            record.corpus_speaker_ids.append(corpus_speaker_id)
+            record.count_turns += int(counts[corpus_speaker_id])
+            if date_last[corpus_speaker_id] != DATE_UNKNOWN:
+                first = date_from_days(int(date_first[corpus_speaker_id]))
+                last = date_from_days(int(date_last[corpus_speaker_id]))
+                record.date_first = first if record.date_first is None else min(record.date_first, first)  # type: ignore
+                record.date_last = last if record.date_last is None else max(record.date_last, last)  # type: ignore
+        speaker_ids_by_code = {
+            code: record.speaker_id for record in records.values() for code in record.corpus_speaker_ids
+        }
+        for pair, pair_count in zip(pairs.tolist(), pair_counts.tolist()):
+            corpus_speaker_id, title_code = divmod(pair, len(corpus.speaker_titles) + 1)
+            record_id = speaker_ids_by_code.get(corpus_speaker_id)
+            if record_id is None or title_code == 0:
+                continue
+            record = records[record_id]
+            role, title_name, party = parse_speaker_title(corpus.speaker_titles[title_code - 1])
+            alias = normalize_name(title_name)
+            if alias and alias not in record.aliases:
+                record.aliases.append(alias)
+            if role and role not in record.roles:
+                record.roles.append(role)
+            if party:
+                parties[record_id][party] += pair_count
+        for record_id, party_counts in parties.items():
+            records[record_id].party = party_counts.most_common(1)[0][0]
+        logger.info(f"Built gazetteer with {len(records)} speakers")
+        return cls(list(records.values()))
+
+    def save(self, path_file: str) -> None:
+        path_file_temporary = path_file + ".tmp"
+        with open(path_file_temporary, "w", encoding="utf-8") as f:
+            json.dump([record.model_dump(mode="json") for record in self.records.values()], f, ensure_ascii=False)
+        os.replace(path_file_temporary, path_file)
+
+    @classmethod
+    def load(cls, path_file: str) -> "SpeakerGazetteer":
+        with open(path_file, "r", encoding="utf-8") as f:
+            return cls([SpeakerRecord(**record_dict) for record_dict in json.load(f)])
+
+    def lookup(self, name: str, limit: int = 5, min_score: float = 0.3) -> List[SpeakerMatch]:
+        """Candidate speakers for a free text name, best first.
+
+        Scores are 1 for an exact alias, otherwise the mean of the trigram Dice coefficient
+        and the edit distance similarity of the best matching alias. Ties go to the speaker
+        with the most turns.
+        """
+        query = normalize_name(name)
+        if not query:
+            return []
+        scores: Dict[str, float] = {}
+        if query in self._alias_speakers:
+            for speaker_id in self._alias_speakers[query]:
+                scores[speaker_id] = 1.0
+        else:
+            query_trigrams = trigrams(query)
+            shared: Counter = Counter()
+            for trigram in query_trigrams:
+                shared.update(self._trigram_aliases.get(trigram, ()))
+            for alias_index, count_shared in shared.most_common(limit * 4):
+                alias = self._aliases[alias_index]
+                dice = 2 * count_shared / (len(query_trigrams) + len(trigrams(alias)))
+                similarity = 1 - edit_distance(query, alias) / max(len(query), len(alias))
+                score = (dice + similarity) / 2
+                for speaker_id in self._alias_speakers[alias]:
+                    scores[speaker_id] = max(scores.get(speaker_id, 0.0), score)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -self.records[item[0]].count_turns))
+        return [
+            SpeakerMatch(speaker_id=speaker_id, name=self.records[speaker_id].name, score=score)
+            for speaker_id, score in ranked[:limit]
+            if score >= min_score
+        ]
+
+    def corpus_speaker_ids(self, speaker_ids: List[str]) -> List[int]:
+        return [code for speaker_id in speaker_ids for code in self.records[speaker_id].corpus_speaker_ids]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    gazetteer = SpeakerGazetteer.build(ColumnarCorpus("data/entry_content_columnar"))
+    gazetteer.save("data/speaker_gazetteer.json")
+    for name in ["Rutte", "Dilan Yesilgoz", "minister Yeşilgöz", "Jimmy Dijk (SP)", "Wilders"]:
+        logger.info(f"{name}: {gazetteer.lookup(name)}")
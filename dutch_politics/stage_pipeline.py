@@ -0,0 +1,232 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class StageMetrics(BaseModel):
+    name: str
+    count_in: int = 0
+    count_out: int = 0
+    count_dropped: int = 0
+    seconds_busy: float = 0.0
+    queue_size_max: int = 0
+
+    def throughput(self, seconds_elapsed: float) -> float:
+        return self.count_out / seconds_elapsed if seconds_elapsed > 0 else 0.0
+
+
+class PipelineStage:
+    """One step of a pipeline, run by `workers` threads or by a process pool of that size.
+
+    The function gets one item and returns the item for the next stage, or None to drop it.
+    Functions for process stages must be picklable (module level functions).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        function: Callable[[Any], Any],
+        workers: int = 1,
+        use_processes: bool = False,
+        queue_size: int = 64,
+    ) -> None:
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.use_processes = use_processes
+        self.queue_size = queue_size
+
+
+class StagePipeline:
+    """Runs items through stages connected by bounded queues and writes the results in batches.
+
+    A full queue blocks the stage in front of it, so a slow stage slows down the stages
+    before it instead of letting items pile up in memory. The last stage feeds a single
+    writer that hands batches of `batch_size` results to the sink. `progress` is called with
+    the number of items written or dropped. Queue depths and per-stage throughput are
+    logged every `log_interval_seconds` and returned by `run`.
+    """
+
+    def __init__(
+        self,
+        stages: List[PipelineStage],
+        sink: Callable[[List[Any]], None],
+        batch_size: int = 100,
+        log_interval_seconds: float = 10.0,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        self.stages = stages
+        self.sink = sink
+        self.batch_size = batch_size
+        self.log_interval_seconds = log_interval_seconds
+        self.progress = progress
+        self.metrics: Dict[str, StageMetrics] = {stage.name: StageMetrics(name=stage.name) for stage in stages}
+        self.metrics["write"] = StageMetrics(name="write")
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+
+    def _put(self, target: queue.Queue, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source: queue.Queue) -> Any:
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _fail(self, error: BaseException) -> None:
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        self._stop.set()
+
+    def _run_worker(
+        self,
+        stage: PipelineStage,
+        source: queue.Queue,
+        target: queue.Queue,
+        process_pool: Optional[ProcessPoolExecutor],
+        workers_alive: List[int],
+    ) -> None:
+        metrics = self.metrics[stage.name]
+        try:
+            while True:
+                item = self._get(source)
+                if item is _END:
+                    # let the sibling workers see the end marker too
+                    self._put(source, _END)
+                    break
+                time_start = time.perf_counter()
+                if process_pool is not None:
+                    result = process_pool.submit(stage.function, item).result()
+                else:
+                    result = stage.function(item)
+                with self._lock:
+                    metrics.seconds_busy += time.perf_counter() - time_start
+                    metrics.count_in += 1
+                    if result is None:
+                        metrics.count_dropped += 1
+                    else:
+                        metrics.count_out += 1
+                if result is None:
+                    # a dropped item is finished too, or the progress never reaches the total
+                    if self.progress is not None:
+                        self.progress(1)
+                elif not self._put(target, result):
+                    break
+        except BaseException as e:
+            logger.exception(f"Stage {stage.name} failed")
+            self._fail(e)
+        finally:
+            with self._lock:
+                workers_alive[0] -= 1
+                is_last = workers_alive[0] == 0
+            if is_last:
+                self._put(target, _END)
+
+    def _run_writer(self, source: queue.Queue) -> None:
+        metrics = self.metrics["write"]
+        batch: List[Any] = []
+
+        def flush() -> None:
+            time_start = time.perf_counter()
+            self.sink(batch)
+            with self._lock:
+                metrics.seconds_busy += time.perf_counter() - time_start
+                metrics.count_in += len(batch)
+                metrics.count_out += len(batch)
+            if self.progress is not None:
+                self.progress(len(batch))
+
+        try:
+            while True:
+                item = self._get(source)
+                if item is _END:
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    flush()
+                    batch = []
+            if len(batch) > 0 and not self._stop.is_set():
+                flush()
+        except BaseException as e:
+            logger.exception("Writer failed")
+            self._fail(e)
+
+    def _log_metrics(self, queues: List[queue.Queue], seconds_elapsed: float) -> None:
+        parts = []
+        for stage_queue, metrics in zip(queues, self.metrics.values()):
+            with self._lock:
+                metrics.queue_size_max = max(metrics.queue_size_max, stage_queue.qsize())
+            parts.append(
+                f"{metrics.name}: {metrics.count_out} done, {metrics.throughput(seconds_elapsed):.1f}/s, queue {stage_queue.qsize()}"
+            )
+        logger.info(" | ".join(parts))
+
+    def run(self, items: Iterable[Any]) -> Dict[str, StageMetrics]:
+        # queues[i] feeds stage i, the last queue feeds the writer
+        queues: List[queue.Queue] = [queue.Queue(stage.queue_size) for stage in self.stages]
+        queues.append(queue.Queue(self.batch_size * 2))
+        process_pools: List[ProcessPoolExecutor] = []
+        threads: List[threading.Thread] = []
+        for index, stage in enumerate(self.stages):
+            process_pool = None
+            if stage.use_processes:
+                process_pool = ProcessPoolExecutor(stage.workers)
+                process_pools.append(process_pool)
+            workers_alive = [stage.workers]
+            for _ in range(stage.workers):
+                threads.append(
+                    threading.Thread(
+                        target=self._run_worker,
+                        args=(stage, queues[index], queues[index + 1], process_pool, workers_alive),
+                        daemon=True,
+                    )
+                )
+        writer = threading.Thread(target=self._run_writer, args=(queues[-1],), daemon=True)
+        threads.append(writer)
+
+        time_start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            time_log = time.perf_counter()
+            for item in items:
+                if not self._put(queues[0], item):
+                    break
+                if time.perf_counter() - time_log > self.log_interval_seconds:
+                    self._log_metrics(queues, time.perf_counter() - time_start)
+                    time_log = time.perf_counter()
+            self._put(queues[0], _END)
+            while writer.is_alive():
+                writer.join(timeout=self.log_interval_seconds)
+                if writer.is_alive():
+                    self._log_metrics(queues, time.perf_counter() - time_start)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            for process_pool in process_pools:
+                process_pool.shutdown()
+        self._log_metrics(queues, time.perf_counter() - time_start)
+        if self._error is not None:
+            raise self._error
+        return self.metrics
@@ -0,0 +1,142 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from dutch_politics.bm25_index import BM25Index
+from dutch_politics.corpus_columnar import ColumnarCorpus
+from dutch_politics.model import Reference, StatementQuery
+from dutch_politics.speaker_gazetteer import SpeakerGazetteer, SpeakerMatch, normalize_name
+
+logger = logging.getLogger(__name__)
+
+
+class StatementPassage(BaseModel):
+    row: int
+    score: float
+    speaker_name: Optional[str]
+    speaker_name_title: Optional[str]
+    text: str
+    document_key: str
+    reference: Reference
+
+
+class StatementResult(BaseModel):
+    query: StatementQuery
+    speakers: List[SpeakerMatch]
+    passages: List[StatementPassage]
+
+
+class StatementRetriever:
+    """Answers a StatementQuery with the best matching turns of the politician.
+
+    The politician name is resolved with the gazetteer. Every speaker that scores within
+    `speaker_margin` of the best match is kept, so an ambiguous surname searches all its
+    bearers. The BM25 search is restricted to the turns of those speakers and ranks them
+    against the statement description. An unresolved name gives no passages rather than
+    statements of someone else. Results are kept in an LRU cache keyed by the normalised
+    query, so they are shared and must not be modified. The cache is cleared when the corpus
+    grows or the segments of the index change through `update` or `merge`.
+    """
+
+    def __init__(
+        self,
+        corpus: ColumnarCorpus,
+        bm25_index: BM25Index,
+        gazetteer: SpeakerGazetteer,
+        cache_size: int = 1024,
+        speaker_margin: float = 0.05,
+    ) -> None:
+        self.corpus = corpus
+        self.bm25_index = bm25_index
+        self.gazetteer = gazetteer
+        self.cache_size = cache_size
+        self.speaker_margin = speaker_margin
+        self._cache: "OrderedDict[Tuple[str, str, int], StatementResult]" = OrderedDict()
+        self._cache_generation: Optional[Tuple] = None
+        self._lock = threading.Lock()
+
+    def _generation(self) -> Tuple:
+        manifest = self.bm25_index.manifest
+        return (len(self.corpus), manifest.row_end, tuple(info.name for info in manifest.segments))
+
+    def resolve_speakers(self, politician_name: str) -> List[SpeakerMatch]:
+        matches = self.gazetteer.lookup(politician_name)
+        if len(matches) == 0:
+            return []
+        return [match for match in matches if match.score >= matches[0].score - self.speaker_margin]
+
+    def _passage(self, row: int, score: float) -> StatementPassage:
+        columns = self.corpus.columns
+        speaker = int(columns["element_speaker"][row])
+        speaker_title = int(columns["element_speaker_title"][row])
+        document = int(columns["element_document"][row])
+        return StatementPassage(
+            row=row,
+            score=score,
+            speaker_name=self.corpus.speakers[speaker] if speaker >= 0 else None,
+            speaker_name_title=self.corpus.speaker_titles[speaker_title] if speaker_title >= 0 else None,
+            text=self.corpus.text(row),
+            document_key=self.corpus.document_key(document),
+            reference=self.corpus.reference(document),
+        )
+
+    def retrieve(self, statement_query: StatementQuery, k: int = 10) -> StatementResult:
+        key = (normalize_name(statement_query.politician_name), statement_query.statement_description.strip(), k)
+        generation = self._generation()
+        with self._lock:
+            if generation != self._cache_generation:
+                self._cache.clear()
+                self._cache_generation = generation
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                return result
+        speakers = self.resolve_speakers(statement_query.politician_name)
+        passages: List[StatementPassage] = []
+        if len(speakers) > 0:
+            speaker_ids = self.gazetteer.corpus_speaker_ids([speaker.speaker_id for speaker in speakers])
+            hits = self.bm25_index.search(statement_query.statement_description, k=k, speaker_ids=speaker_ids)
+            passages = [self._passage(row, score) for row, score in hits]
+        result = StatementResult(query=statement_query, speakers=speakers, passages=passages)
+        with self._lock:
+            if generation != self._cache_generation:
+                # the index changed while searching, do not cache a result of the old one
+                return result
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+
+if __name__ == "__main__":
+    import time
+
+    import numpy as np
+
+    logging.basicConfig(level=logging.INFO)
+    corpus = ColumnarCorpus("data/entry_content_columnar")
+    retriever = StatementRetriever(
+        corpus,
+        BM25Index("data/entry_content_bm25", corpus),
+        SpeakerGazetteer.load("data/speaker_gazetteer.json"),
+        cache_size=0,
+    )
+    statement_queries = [
+        StatementQuery(politician_name="Rutte", statement_description="stikstof boeren"),
+        StatementQuery(politician_name="Dilan Yesilgoz", statement_description="asielzoekers opvang gemeenten"),
+        StatementQuery(politician_name="Jimmy Dijk", statement_description="huurprijzen woningbouw"),
+    ]
+    latencies = []
+    for statement_query in statement_queries * 20:
+        time_start = time.perf_counter()
+        result = retriever.retrieve(statement_query)
+        latencies.append(time.perf_counter() - time_start)
+    logger.info(f"p50 {np.percentile(latencies, 50) * 1000:.1f} ms, p95 {np.percentile(latencies, 95) * 1000:.1f} ms")
+    for statement_query in statement_queries:
+        result = retriever.retrieve(statement_query, k=3)
+        logger.info(f"{statement_query}: {[speaker.name for speaker in result.speakers]}")
+        for passage in result.passages:
+            logger.info(f"  {passage.score:.2f} {passage.reference.publication_date} {passage.text[:100]}")
@@ -1,9 +1,14 @@
 from abc import abstractmethod
-from typing import Iterator, List, Optional, Sequence
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Sequence
 
 from fastapi import HTTPException
 from langchain_core.stores import BaseStore
 
+from dutch_politics.store.key_partition import KeyRange, KeyScanner, key_ranges_from_stripes
+
+if TYPE_CHECKING:
+    from dutch_politics.store.change_journal import ChangeJournal
+
 
 class BytesStoreBase(BaseStore[str, bytes]):
     def __init__(self, collection_name: str) -> None:
@@ -27,6 +32,33 @@ class BytesStoreBase(BaseStore[str, bytes]):
             raise HTTPException(status_code=404, detail=f"Key {key} not found in store")
         return value
 
+    def set_stream(self, key: str, chunks: Iterable[bytes]) -> int:
+        """Store a value given as chunks and return its size.
+
+        Stores override this to write the chunks as they arrive instead of joining them in memory.
+        """
+        value = b"".join(chunks)
+        self.mset([(key, value)])
+        return len(value)
+
+    def get_stream(self, key: str, chunk_size: int = 1 << 20) -> Optional[Iterator[bytes]]:
+        """Return the value as chunks of at most `chunk_size` bytes, None when the key is absent."""
+        value = self.mget([key])[0]
+        if value is None:
+            return None
+        return (value[i : i + chunk_size] for i in range(0, len(value), chunk_size))
+
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        """Return for each key whether it is in the store, stores override this to skip reading values."""
+        return [value is not None for value in self.mget(keys)]
+
+    def compare_and_set(self, key: str, expected: Optional[bytes], value: bytes) -> bool:
+        """Set the value only if the current value equals `expected` (None: key absent), atomically.
+
+        Returns whether the value was set. Stores that can not do this atomically raise.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support compare_and_set")
+
     @abstractmethod
     def mdelete(self, keys: Sequence[str]) -> None:
         pass
@@ -35,6 +67,20 @@ class BytesStoreBase(BaseStore[str, bytes]):
     def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
         pass
 
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        """Yield the keys that fall in a key range, stores override this with a ranged scan."""
+        return (key for key in self.yield_keys(prefix=prefix) if key_range.contains(key))
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        """Split the keys into n independent scanners that can be consumed in parallel."""
+        return [KeyScanner(self, key_range, prefix) for key_range in key_ranges_from_stripes(n)]
+
+    def with_change_journal(self, journal: "ChangeJournal") -> "BytesStoreBase":
+        """Return a view of this store that records every mset and mdelete in the journal."""
+        from dutch_politics.store.bytes_store_journal import BytesStoreJournal
+
+        return BytesStoreJournal(self, journal)
+
     @abstractmethod
     async def asample(self, count: int) -> List[bytes]:
         pass
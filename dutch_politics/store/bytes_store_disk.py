@@ -1,8 +1,36 @@
+import fcntl
 import os
 import random
-from typing import Iterator, List, Optional, Sequence, Union
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 from dutch_politics.store.bytes_store_base import BytesStoreBase
+from dutch_politics.store.key_partition import (
+    KeyRange,
+    KeyScanner,
+    boundaries_from_sorted_keys,
+    key_ranges_from_boundaries,
+)
+
+
+# files being written are created under this prefix and renamed into place when complete
+_PREFIX_TEMPORARY = ".tmp-"
+# lock files that make compare_and_set atomic across processes
+_PREFIX_LOCK = ".lock-"
+# stored files get the mode open() would give them, the umask applies to it
+_MODE_FILE = 0o666
+
+
+def _create_temporary(path_dir: str) -> Tuple[int, str]:
+    """Create a new temporary file like mkstemp, but with the mode of a regular file."""
+    while True:
+        path_file_temporary = os.path.join(path_dir, f"{_PREFIX_TEMPORARY}{uuid.uuid4().hex}")
+        try:
+            return os.open(path_file_temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL, _MODE_FILE), path_file_temporary
+        except FileExistsError:
+            continue
 
 
 class BytesStoreDisk(BytesStoreBase):
@@ -16,9 +44,39 @@ class BytesStoreDisk(BytesStoreBase):
         return os.path.join(self.path_dir_store, id)
 
     def set(self, id: str, blob: bytes) -> None:
+        self.set_stream(id, [blob])
+
+    def set_stream(self, id: str, chunks: Iterable[bytes]) -> int:
+        # write to a temporary file and rename it, so readers never see a partial file
         path_file = self._path_file(id)
-        with open(path_file, "wb") as f:
-            f.write(blob)
+        file_descriptor, path_file_temporary = _create_temporary(os.path.dirname(path_file))
+        size = 0
+        try:
+            with os.fdopen(file_descriptor, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(path_file_temporary, path_file)
+        except BaseException:
+            os.remove(path_file_temporary)
+            raise
+        return size
+
+    def get_stream(self, id: str, chunk_size: int = 1 << 20) -> Optional[Iterator[bytes]]:
+        try:
+            f = open(self._path_file(id), "rb")
+        except FileNotFoundError:
+            return None
+
+        def read_chunks() -> Iterator[bytes]:
+            with f:
+                while chunk := f.read(chunk_size):
+                    yield chunk
+
+        return read_chunks()
+
+    def _list_ids(self) -> List[str]:
+        return [id for id in os.listdir(self.path_dir_store) if not id.startswith((_PREFIX_TEMPORARY, _PREFIX_LOCK))]
 
     def get(self, id: str) -> Optional[bytes]:
         path_file = self._path_file(id)
@@ -39,12 +97,50 @@ class BytesStoreDisk(BytesStoreBase):
         for key, value in key_value_pairs:
             self.set(key, value)
 
+    @contextmanager
+    def _lock(self, id: str, timeout_seconds: float = 10.0) -> Iterator[None]:
+        # flock is released by the kernel when the holder dies, so a lock is never stale
+        path_lock = self._path_file(_PREFIX_LOCK + id)
+        time_start = time.monotonic()
+        while True:
+            file_descriptor = os.open(path_lock, os.O_CREAT | os.O_RDWR)
+            try:
+                fcntl.flock(file_descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(file_descriptor)
+                if time.monotonic() - time_start > timeout_seconds:
+                    raise TimeoutError(f"Timed out waiting for the lock on {id}")
+                time.sleep(0.005)
+                continue
+            # the previous holder removes the file on release, a lock on a removed file guards nothing
+            try:
+                if os.fstat(file_descriptor).st_ino == os.stat(path_lock).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            os.close(file_descriptor)
+        try:
+            yield
+        finally:
+            os.remove(path_lock)
+            os.close(file_descriptor)
+
+    def compare_and_set(self, id: str, expected: Optional[bytes], value: bytes) -> bool:
+        with self._lock(id):
+            if self.get(id) != expected:
+                return False
+            self.set(id, value)
+            return True
+
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        return [os.path.exists(self._path_file(key)) for key in keys]
+
     def mdelete(self, keys: Sequence[str]) -> None:
         for key in keys:
             self.delete(key)
 
     def list_ids(self, *, prefix: Optional[str] = None) -> List[str]:
-        list_ids = os.listdir(self.path_dir_store)
+        list_ids = self._list_ids()
         if prefix is None:
             return list_ids
         return [id for id in list_ids if id.startswith(prefix)]
@@ -52,11 +148,28 @@ class BytesStoreDisk(BytesStoreBase):
     def yield_keys(
         self, *, prefix: Optional[str] = None
     ) -> Union[Iterator[str], Iterator[str]]:
-        list_ids = os.listdir(self.path_dir_store)
+        list_ids = self._list_ids()
         for id in list_ids:
             if prefix is None or id.startswith(prefix):
                 yield id
 
+    def yield_keys_range(
+        self, key_range: KeyRange, *, prefix: Optional[str] = None
+    ) -> Iterator[str]:
+        with os.scandir(self.path_dir_store) as entries:
+            for entry in entries:
+                id = entry.name
+                if id.startswith((_PREFIX_TEMPORARY, _PREFIX_LOCK)):
+                    continue
+                if (prefix is None or id.startswith(prefix)) and key_range.contains(id):
+                    yield id
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        # the directory listing is cheap compared to reading the files, so split it at quantiles
+        sorted_ids = sorted(self.list_ids(prefix=prefix))
+        boundaries = boundaries_from_sorted_keys(sorted_ids, n)
+        return [KeyScanner(self, key_range, prefix) for key_range in key_ranges_from_boundaries(boundaries)]
+
     async def asample(self, count: int) -> List[bytes]:
-        list_ids = os.listdir(self.path_dir_store)
+        list_ids = self._list_ids()
         return [self.get_raise(id) for id in random.sample(list_ids, count)]
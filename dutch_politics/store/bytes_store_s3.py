@@ -1,13 +1,65 @@
+import io
 import logging
-from typing import Iterator, List, Optional, Sequence, Tuple, Union
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 from botocore.exceptions import ClientError
 
 from dutch_politics.store.bytes_store_base import BytesStoreBase
+from dutch_politics.store.key_filter_bloom import KeyFilterBloomPersisted
+from dutch_politics.store.key_partition import (
+    ALPHABET_HEX,
+    KeyRange,
+    KeyScanner,
+    boundaries_from_alphabet,
+    key_ranges_from_boundaries,
+)
 
 logger = logging.getLogger(__name__)
 
 
+def _start_after(s3_key: str) -> Optional[str]:
+    """The StartAfter of a listing that must begin at `s3_key`, StartAfter itself is excluded.
+
+    Returns a key sorting just below `s3_key`. Keys between the two are listed too and must be
+    filtered by the caller, keys from `s3_key` on are never skipped.
+    """
+    if s3_key == "":
+        return None
+    character_last = s3_key[-1]
+    if character_last == "\x00":
+        # nothing sorts between a key and the same key followed by NUL
+        return s3_key[:-1]
+    character_below = chr(ord(character_last) - 1)
+    if "\ud800" <= character_below <= "\udfff":
+        # surrogates can not be encoded, the last character below them will do
+        character_below = "\ud7ff"
+    return s3_key[:-1] + character_below + "\uffff"
+
+
+class _ChunkReader(io.RawIOBase):
+    """File-like view of an iterable of chunks, so boto3 can upload it in parts."""
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        self.size = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:  # type: ignore[override]
+        while len(self._buffer) == 0:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buffer = chunk
+        count = min(len(buffer), len(self._buffer))
+        buffer[:count] = self._buffer[:count]
+        self._buffer = self._buffer[count:]
+        self.size += count
+        return count
+
+
 class BytesStoreS3(BytesStoreBase):
     """S3-based byte store for caching binary data."""
 
@@ -29,6 +81,8 @@ class BytesStoreS3(BytesStoreBase):
         self.s3_client = client
         self.bucket_name = bucket_name
         self.prefix = collection_name.rstrip("/") + "/" if collection_name else ""
+        # optional bloom filter that answers definite misses without a round trip
+        self.key_filter: Optional[KeyFilterBloomPersisted] = None
 
     def _get_key(self, id: str) -> str:
         """Get the full S3 key with prefix."""
@@ -37,8 +91,15 @@ class BytesStoreS3(BytesStoreBase):
 
     def mget(self, keys: Sequence[str]) -> List[Optional[bytes]]:
         """Get multiple objects from S3."""
+        if self.key_filter is not None:
+            list_might_contain = self.key_filter.mfilter(keys)
+        else:
+            list_might_contain = [True] * len(keys)
         results = []
-        for key in keys:
+        for key, might_contain in zip(keys, list_might_contain):
+            if not might_contain:
+                results.append(None)
+                continue
             try:
                 s3_key = self._get_key(key)
                 response = self.s3_client.get_object(
@@ -49,14 +110,43 @@ class BytesStoreS3(BytesStoreBase):
             except ClientError as e:
                 if e.response["Error"]["Code"] == "NoSuchKey":
                     logger.debug(f"Object not found in S3: {s3_key}")
+                    if self.key_filter is not None:
+                        self.key_filter.record_false_positive()
                     results.append(None)
                 else:
                     logger.error(f"Error retrieving object from S3: {e}")
                     raise
         return results
 
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        """Check which objects exist with HEAD requests, so no bodies are downloaded."""
+        if self.key_filter is not None:
+            list_might_contain = self.key_filter.mfilter(keys)
+        else:
+            list_might_contain = [True] * len(keys)
+        results = []
+        for key, might_contain in zip(keys, list_might_contain):
+            if not might_contain:
+                results.append(False)
+                continue
+            try:
+                self.s3_client.head_object(Bucket=self.bucket_name, Key=self._get_key(key))
+                results.append(True)
+            except ClientError as e:
+                if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                    if self.key_filter is not None:
+                        self.key_filter.record_false_positive()
+                    results.append(False)
+                else:
+                    logger.error(f"Error checking object in S3: {e}")
+                    raise
+        return results
+
     def mset(self, key_value_pairs: Sequence[Tuple[str, bytes]]) -> None:
         """Set multiple objects in S3."""
+        if self.key_filter is not None:
+            # added before the writes, a failed write only leaves a false positive behind
+            self.key_filter.madd([key for key, _ in key_value_pairs])
         for key, value in key_value_pairs:
             try:
                 s3_key = self._get_key(key)
@@ -68,6 +158,35 @@ class BytesStoreS3(BytesStoreBase):
                 logger.error(f"Error storing object in S3: {e}")
                 raise
 
+    def set_stream(self, key: str, chunks: Iterable[bytes]) -> int:
+        """Upload the chunks as a multipart upload, only a few parts are held in memory."""
+        if self.key_filter is not None:
+            self.key_filter.madd([key])
+        reader = _ChunkReader(chunks)
+        s3_key = self._get_key(key)
+        try:
+            self.s3_client.upload_fileobj(io.BufferedReader(reader), self.bucket_name, s3_key)
+            logger.debug(f"Streamed object to S3: {s3_key}")
+        except ClientError as e:
+            logger.error(f"Error storing object in S3: {e}")
+            raise
+        return reader.size
+
+    def get_stream(self, key: str, chunk_size: int = 1 << 20) -> Optional[Iterator[bytes]]:
+        if self.key_filter is not None and not self.key_filter.mfilter([key])[0]:
+            return None
+        s3_key = self._get_key(key)
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "NoSuchKey":
+                if self.key_filter is not None:
+                    self.key_filter.record_false_positive()
+                return None
+            logger.error(f"Error retrieving object from S3: {e}")
+            raise
+        return response["Body"].iter_chunks(chunk_size)
+
     def mdelete(self, keys: Sequence[str]) -> None:
         """Delete multiple objects from S3."""
         for key in keys:
@@ -78,6 +197,8 @@ class BytesStoreS3(BytesStoreBase):
             except ClientError as e:
                 logger.error(f"Error deleting object from S3: {e}")
                 raise
+        if self.key_filter is not None:
+            self.key_filter.mdelete(keys)
 
     def yield_keys(
         self, *, prefix: Optional[str] = None
@@ -100,5 +221,45 @@ class BytesStoreS3(BytesStoreBase):
             logger.error(f"Error yielding objects in S3: {e}")
             raise
 
+    def yield_keys_range(
+        self, key_range: KeyRange, *, prefix: Optional[str] = None
+    ) -> Iterator[str]:
+        """Yield the keys in a key range using StartAfter so each range is an independent listing."""
+        if key_range.stripe_count is not None:
+            yield from super().yield_keys_range(key_range, prefix=prefix)
+            return
+        try:
+            search_prefix = self._get_key(prefix) if prefix else self.prefix
+            kwargs = {"Bucket": self.bucket_name, "Prefix": search_prefix}
+            start_after = None if key_range.start is None else _start_after(self._get_key(key_range.start))
+            if start_after is not None:
+                kwargs["StartAfter"] = start_after
+            paginator = self.s3_client.get_paginator("list_objects_v2")
+            for page in paginator.paginate(**kwargs):
+                for obj in page.get("Contents", []):
+                    key = obj["Key"]
+                    if not key.startswith(self.prefix):
+                        continue
+                    id = key[len(self.prefix) :]
+                    if key_range.end is not None and id >= key_range.end:
+                        return
+                    if key_range.contains(id):
+                        yield id
+        except ClientError as e:
+            logger.error(f"Error yielding objects in S3: {e}")
+            raise
+
+    def partition_keys(
+        self, n: int, *, prefix: Optional[str] = None, alphabet: str = ALPHABET_HEX
+    ) -> List[KeyScanner]:
+        """Split the listing into n StartAfter ranges.
+
+        S3 has no cheap way to find key quantiles, so the ranges assume keys are spread
+        uniformly over `alphabet` after the prefix. The default fits the sha256 keys of
+        the html cache, other collections should pass their own alphabet.
+        """
+        boundaries = boundaries_from_alphabet(n, alphabet, prefix)
+        return [KeyScanner(self, key_range, prefix) for key_range in key_ranges_from_boundaries(boundaries)]
+
     async def asample(self, count: int) -> List[bytes]:
         raise NotImplementedError("Not implemented")
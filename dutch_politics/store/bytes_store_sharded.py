@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from dutch_politics.store.bytes_store_base import BytesStoreBase
+from dutch_politics.store.consistent_hash_ring import ConsistentHashRing
+from dutch_politics.store.key_partition import KeyRange, KeyScanner
+from dutch_politics.store.shard_router import ShardRouter
+
+
+class BytesStoreSharded(BytesStoreBase):
+    """Spreads the keys of a collection over several bytes stores with a consistent hash ring.
+
+    The routing, the fallback to the previous owner and the rebalance live in ShardRouter.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        stores: Dict[str, BytesStoreBase],
+        ring: ConsistentHashRing,
+        executor: ThreadPoolExecutor,
+    ) -> None:
+        super().__init__(collection_name)
+        self.router: ShardRouter[bytes] = ShardRouter(collection_name, stores, ring, executor)
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        return self.router.mget(keys)
+
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        return self.router.mexists(keys)
+
+    def mset(self, key_value_pairs: Sequence[Tuple[str, bytes]]) -> None:
+        self.router.mset(key_value_pairs)
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        self.router.mdelete(keys)
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        return self.router.yield_keys(prefix=prefix)
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        return self.router.partition_keys(n, prefix=prefix)
+
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        return self.router.yield_keys_range(key_range, prefix=prefix)
+
+    async def asample(self, count: int) -> List[bytes]:
+        return await self.router.asample(count)
+
+    def add_shard(self, shard_name: str, store: BytesStoreBase) -> None:
+        self.router.add_shard(shard_name, store)
+
+    def rebalance(self, batch_size: int = 100) -> int:
+        return self.router.rebalance(batch_size)
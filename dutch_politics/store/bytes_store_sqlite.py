@@ -3,11 +3,12 @@ import re
 import sqlite3
 import zlib
 from contextlib import contextmanager
-from typing import Iterator, List, Optional, Sequence, Tuple
+from typing import Iterator, List, Optional, Sequence, Set, Tuple
 
 from langchain.storage.exceptions import InvalidKeyException
 
 from dutch_politics.store.bytes_store_base import BytesStoreBase
+from dutch_politics.store.key_partition import KeyRange, KeyScanner, key_ranges_from_boundaries
 
 
 class BytesStoreSqlite(BytesStoreBase):
@@ -79,6 +80,36 @@ class BytesStoreSqlite(BytesStoreBase):
                     values.append(None)
         return values
 
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        """Check which keys are in the store without reading their values."""
+        keys_found: Set[str] = set()
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            # stay below the default limit on the number of sql variables
+            for i in range(0, len(keys), 500):
+                keys_batch = keys[i : i + 500]
+                for key in keys_batch:
+                    self._validate_key(key)
+                placeholders = ",".join("?" * len(keys_batch))
+                cursor.execute(f"SELECT key FROM store WHERE key IN ({placeholders})", tuple(keys_batch))
+                keys_found.update(row[0] for row in cursor.fetchall())
+        return [key in keys_found for key in keys]
+
+    def compare_and_set(self, key: str, expected: Optional[bytes], value: bytes) -> bool:
+        """Set the value if the current value equals `expected`, in one write transaction."""
+        self._validate_key(key)
+        with self._get_connection() as conn:
+            # take the write lock before reading, so no other writer can interleave
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT value FROM store WHERE key=?", (key,)).fetchone()
+            current = self._decompress(row[0]) if row else None
+            if current != expected:
+                conn.rollback()
+                return False
+            conn.execute("REPLACE INTO store (key, value) VALUES (?, ?)", (key, self._compress(value)))
+            conn.commit()
+            return True
+
     def mset(self, key_value_pairs: Sequence[Tuple[str, bytes]]) -> None:
         """Set the values for the given keys.
 
@@ -136,6 +167,70 @@ class BytesStoreSqlite(BytesStoreBase):
             for row in cursor:
                 yield row[0]
 
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        """Get an iterator over the keys in a key range, using the primary key index.
+
+        Args:
+            key_range (KeyRange): The range of keys to scan.
+            prefix (Optional[str]): The prefix to match.
+
+        Returns:
+            Iterator[str]: An iterator over keys in the range.
+        """
+        if key_range.stripe_count is not None:
+            yield from super().yield_keys_range(key_range, prefix=prefix)
+            return
+        conditions = []
+        parameters = []
+        if prefix:
+            self._validate_key(prefix)
+            conditions.append("key LIKE ?")
+            parameters.append(f"{prefix}%")
+        if key_range.start is not None:
+            conditions.append("key >= ?")
+            parameters.append(key_range.start)
+        if key_range.end is not None:
+            conditions.append("key < ?")
+            parameters.append(key_range.end)
+        sql = "SELECT key FROM store"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, parameters)
+            for row in cursor:
+                yield row[0]
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        """Split the keys into n ranges of about equal size.
+
+        Args:
+            n (int): The number of partitions.
+            prefix (Optional[str]): The prefix to match.
+
+        Returns:
+            List[KeyScanner]: One scanner per key range.
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            if prefix:
+                self._validate_key(prefix)
+                where, parameters = " WHERE key LIKE ?", [f"{prefix}%"]
+            else:
+                where, parameters = "", []
+            cursor.execute("SELECT COUNT(*) FROM store" + where, parameters)
+            count = cursor.fetchone()[0]
+            boundaries = []
+            for i in range(1, n):
+                cursor.execute(
+                    "SELECT key FROM store" + where + " ORDER BY key LIMIT 1 OFFSET ?",
+                    [*parameters, (i * count) // n],
+                )
+                row = cursor.fetchone()
+                if row:
+                    boundaries.append(row[0])
+        return [KeyScanner(self, key_range, prefix) for key_range in key_ranges_from_boundaries(boundaries)]
+
     def clear(self) -> None:
         """Clear all data from the store."""
         with self._get_connection() as conn:
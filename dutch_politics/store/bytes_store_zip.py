@@ -0,0 +1,238 @@
+import bisect
+import json
+import logging
+import os
+import random
+import struct
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from dutch_politics.store.bytes_store_base import BytesStoreBase
+from dutch_politics.store.key_partition import (
+    KeyRange,
+    KeyScanner,
+    boundaries_from_sorted_keys,
+    key_ranges_from_boundaries,
+)
+
+logger = logging.getLogger(__name__)
+
+# signature, versions, flags, method, time, date, crc, sizes, name length, extra length
+_LOCAL_HEADER_FORMAT = "<4sHHHHHIIIHH"
+_LOCAL_HEADER_SIZE = struct.calcsize(_LOCAL_HEADER_FORMAT)
+_INDEX_VERSION = 1
+
+
+class ZipMember:
+    __slots__ = ("name", "header_offset", "compress_type", "compress_size", "file_size", "crc")
+
+    def __init__(
+        self, name: str, header_offset: int, compress_type: int, compress_size: int, file_size: int, crc: int
+    ) -> None:
+        self.name = name
+        self.header_offset = header_offset
+        self.compress_type = compress_type
+        self.compress_size = compress_size
+        self.file_size = file_size
+        self.crc = crc
+
+
+def _zip_signature(path_file_zip: str) -> Dict[str, int]:
+    stat = os.stat(path_file_zip)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def build_zip_index(path_file_zip: str) -> List[ZipMember]:
+    """Read the central directory of the archive, members sorted by name."""
+    with zipfile.ZipFile(path_file_zip, "r") as zip_file:
+        members = [
+            ZipMember(info.filename, info.header_offset, info.compress_type, info.compress_size, info.file_size, info.CRC)
+            for info in zip_file.infolist()
+            if not info.is_dir()
+        ]
+    members.sort(key=lambda member: member.name)
+    return members
+
+
+def load_zip_index(path_file_zip: str, path_file_index: Optional[str] = None) -> List[ZipMember]:
+    """Load the member index from the sidecar file, rebuilding it when the archive changed."""
+    path_file_index = path_file_index or path_file_zip + ".index.json"
+    signature = _zip_signature(path_file_zip)
+    if os.path.exists(path_file_index):
+        with open(path_file_index, "r") as f:
+            index = json.load(f)
+        if index.get("version") == _INDEX_VERSION and index.get("signature") == signature:
+            return [ZipMember(*fields) for fields in index["members"]]
+        logger.info(f"Index of {path_file_zip} is outdated, rebuilding")
+    members = build_zip_index(path_file_zip)
+    index = {
+        "version": _INDEX_VERSION,
+        "signature": signature,
+        "members": [
+            [member.name, member.header_offset, member.compress_type, member.compress_size, member.file_size, member.crc]
+            for member in members
+        ],
+    }
+    path_file_temporary = path_file_index + ".tmp"
+    with open(path_file_temporary, "w") as f:
+        json.dump(index, f)
+    os.replace(path_file_temporary, path_file_index)
+    logger.info(f"Indexed {len(members)} members of {path_file_zip}")
+    return members
+
+
+class BytesStoreZip(BytesStoreBase):
+    """Read-only store over the members of a zip archive, keyed by member name.
+
+    The central directory is indexed once and cached in a sidecar file next to the archive,
+    so opening a large archive does not parse the directory again. `mget` seeks straight to
+    the local header of a member and inflates only that member. Every thread reads through
+    its own file handle. Wrap it in `DictStoreBytes` and `ObjectStoreNested` to read json
+    members as models, `export_store_to_zip` writes such an archive from any store.
+    """
+
+    def __init__(self, collection_name: str, path_file_zip: str, path_file_index: Optional[str] = None) -> None:
+        super().__init__(collection_name)
+        self.path_file_zip = path_file_zip
+        members = load_zip_index(path_file_zip, path_file_index)
+        self._names = [member.name for member in members]
+        self._members = {member.name: member for member in members}
+        self._local = threading.local()
+
+    def _file(self) -> BinaryIO:
+        if getattr(self._local, "file", None) is None:
+            self._local.file = open(self.path_file_zip, "rb")
+        return self._local.file
+
+    def _zip_file(self) -> zipfile.ZipFile:
+        # only used for compression methods other than stored and deflated
+        if getattr(self._local, "zip_file", None) is None:
+            self._local.zip_file = zipfile.ZipFile(self.path_file_zip, "r")
+        return self._local.zip_file
+
+    def _read_member(self, member: ZipMember) -> bytes:
+        if member.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            return self._zip_file().read(member.name)
+        f = self._file()
+        f.seek(member.header_offset)
+        header = f.read(_LOCAL_HEADER_SIZE)
+        signature, _, flags, _, _, _, _, _, _, name_length, extra_length = struct.unpack(_LOCAL_HEADER_FORMAT, header)
+        if signature != b"PK\x03\x04":
+            raise zipfile.BadZipFile(f"Bad local header for {member.name} in {self.path_file_zip}")
+        if flags & 0x1:
+            raise NotImplementedError(f"Member {member.name} is encrypted")
+        f.seek(member.header_offset + _LOCAL_HEADER_SIZE + name_length + extra_length)
+        data = f.read(member.compress_size)
+        if member.compress_type == zipfile.ZIP_DEFLATED:
+            data = zlib.decompress(data, -15)
+        if zlib.crc32(data) != member.crc:
+            raise zipfile.BadZipFile(f"Bad CRC for {member.name} in {self.path_file_zip}")
+        return data
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        results: List[Optional[bytes]] = []
+        for key in keys:
+            member = self._members.get(key)
+            results.append(None if member is None else self._read_member(member))
+        return results
+
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        return [key in self._members for key in keys]
+
+    def mset(self, key_value_pairs: Sequence[Tuple[str, bytes]]) -> None:
+        raise PermissionError(f"{self.collection_name} is a read-only zip store")
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        raise PermissionError(f"{self.collection_name} is a read-only zip store")
+
+    def _slice(self, start: Optional[str], end: Optional[str]) -> Iterator[str]:
+        index_start = 0 if start is None else bisect.bisect_left(self._names, start)
+        index_end = len(self._names) if end is None else bisect.bisect_left(self._names, end)
+        for index in range(index_start, index_end):
+            yield self._names[index]
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        if prefix is None:
+            return iter(self._names)
+        return self._yield_prefix(prefix)
+
+    def _yield_prefix(self, prefix: str) -> Iterator[str]:
+        # names sharing a prefix are contiguous in sorted order
+        for name in self._slice(prefix, None):
+            if not name.startswith(prefix):
+                return
+            yield name
+
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        if key_range.stripe_count is not None:
+            yield from super().yield_keys_range(key_range, prefix=prefix)
+            return
+        for name in self._slice(key_range.start, key_range.end):
+            if prefix is None or name.startswith(prefix):
+                yield name
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        sorted_names = list(self.yield_keys(prefix=prefix))
+        boundaries = boundaries_from_sorted_keys(sorted_names, n)
+        return [KeyScanner(self, key_range, prefix) for key_range in key_ranges_from_boundaries(boundaries)]
+
+    async def asample(self, count: int) -> List[bytes]:
+        names = random.sample(self._names, min(count, len(self._names)))
+        return [value for value in self.mget(names) if value is not None]
+
+
+def export_store_to_zip(
+    store: BytesStoreBase,
+    path_file_zip: str,
+    n_partitions: int = 8,
+    batch_size: int = 100,
+    compresslevel: int = 6,
+    prefix: Optional[str] = None,
+) -> int:
+    """Write every value of a store to a zip archive, one deflated member per key.
+
+    Partitions of the key space are read by parallel threads, which overlaps the reads of
+    slow stores; compressing and appending a member to the archive is serialised. The
+    archive is written under a temporary name and indexed before it is moved into place.
+    Returns the number of members written.
+    """
+    path_file_temporary = path_file_zip + ".tmp"
+    lock = threading.Lock()
+    count_members = 0
+
+    def export_partition(zip_file: zipfile.ZipFile, scanner: KeyScanner) -> None:
+        nonlocal count_members
+        keys: List[str] = []
+
+        def write_batch() -> None:
+            nonlocal count_members
+            for key, value in zip(keys, store.mget(keys)):
+                if value is None:
+                    continue
+                zip_info = zipfile.ZipInfo(key)
+                zip_info.compress_type = zipfile.ZIP_DEFLATED
+                zip_info.external_attr = 0o600 << 16
+                with lock:
+                    zip_file.writestr(zip_info, value, compresslevel=compresslevel)
+                    count_members += 1
+
+        for key in scanner:
+            keys.append(key)
+            if len(keys) >= batch_size:
+                write_batch()
+                keys = []
+        if len(keys) > 0:
+            write_batch()
+
+    scanners = store.partition_keys(n_partitions, prefix=prefix)
+    with zipfile.ZipFile(path_file_temporary, "w", allowZip64=True) as zip_file:
+        with ThreadPoolExecutor(len(scanners)) as executor:
+            for future in [executor.submit(export_partition, zip_file, scanner) for scanner in scanners]:
+                future.result()
+    os.replace(path_file_temporary, path_file_zip)
+    load_zip_index(path_file_zip)
+    logger.info(f"Exported {count_members} members of {store.collection_name} to {path_file_zip}")
+    return count_members
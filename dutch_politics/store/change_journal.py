@@ -0,0 +1,197 @@
+import logging
+import threading
+import time
+from typing import List, Literal, Sequence
+
+from pydantic import BaseModel
+
+from dutch_politics.store.dict_store_base import DictStoreBase
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeRecord(BaseModel):
+    sequence_number: int
+    key: str
+    op: Literal["set", "delete"]
+    timestamp: float
+
+
+class ChangeJournalHead(BaseModel):
+    next_sequence_number: int = 1
+    # first sequence number of every stored batch, in increasing order
+    batch_starts: List[int] = []
+
+
+class ChangeJournal:
+    """Append-only log of the keys changed in a collection, kept in a side dict store.
+
+    Every append is written as one batch document followed by the head document, so a
+    reader never sees a head that points at a missing batch. Sequence numbers are handed
+    out by this object, so a collection should have a single journal writer process.
+    Consumers keep their own offset (the last sequence number they processed) and read
+    the changes after it. The wrappers append a record before they write the store, so a
+    record can describe a write that failed or is still in flight: consumers read the
+    current value of the key and must treat a replay that changes nothing as a no-op.
+    Records younger than `settle_seconds` are held back so the write they announce has
+    landed before a consumer reads the key and moves its offset past it. Compaction drops
+    the oldest batches once the journal holds more than `max_records` records and merges
+    small batches together.
+    """
+
+    _HEAD_KEY = "head"
+
+    def __init__(
+        self,
+        journal_store: DictStoreBase,
+        max_records: int = 1_000_000,
+        compact_every: int = 1000,
+        batch_size: int = 1000,
+        settle_seconds: float = 5.0,
+    ) -> None:
+        self.journal_store = journal_store
+        self.max_records = max_records
+        self.compact_every = compact_every
+        self.batch_size = batch_size
+        self.settle_seconds = settle_seconds
+        self._lock = threading.Lock()
+        self._count_appends_since_compact = 0
+
+    def _batch_key(self, first_sequence_number: int) -> str:
+        return f"batch-{first_sequence_number:020d}"
+
+    def _offset_key(self, consumer_name: str) -> str:
+        return f"offset-{consumer_name}"
+
+    def _load_head(self) -> ChangeJournalHead:
+        head_dict = self.journal_store.mget([self._HEAD_KEY])[0]
+        if head_dict is None:
+            return ChangeJournalHead()
+        return ChangeJournalHead(**head_dict)
+
+    def _save_head(self, head: ChangeJournalHead) -> None:
+        self.journal_store.mset([(self._HEAD_KEY, head.model_dump())])
+
+    def append(self, op: Literal["set", "delete"], keys: Sequence[str]) -> None:
+        if len(keys) == 0:
+            return
+        with self._lock:
+            timestamp = time.time()
+            head = self._load_head()
+            first_sequence_number = head.next_sequence_number
+            records = [
+                ChangeRecord(sequence_number=first_sequence_number + i, key=key, op=op, timestamp=timestamp).model_dump()
+                for i, key in enumerate(keys)
+            ]
+            self.journal_store.mset([(self._batch_key(first_sequence_number), {"records": records})])
+            head.next_sequence_number = first_sequence_number + len(records)
+            head.batch_starts.append(first_sequence_number)
+            self._save_head(head)
+            self._count_appends_since_compact += 1
+            should_compact = self._count_appends_since_compact >= self.compact_every
+        if should_compact:
+            self.compact()
+
+    @property
+    def last_sequence_number(self) -> int:
+        return self._load_head().next_sequence_number - 1
+
+    @property
+    def first_sequence_number(self) -> int:
+        """The oldest sequence number still in the journal."""
+        head = self._load_head()
+        if len(head.batch_starts) == 0:
+            return head.next_sequence_number
+        return head.batch_starts[0]
+
+    def read_since(self, sequence_number: int, limit: int = 10000) -> List[ChangeRecord]:
+        """Return the records after `sequence_number`, oldest first.
+
+        Raises a ValueError when records after the offset were already compacted away, the
+        consumer then has to rescan the collection and restart from `last_sequence_number`.
+        """
+        head = self._load_head()
+        if len(head.batch_starts) > 0 and sequence_number + 1 < head.batch_starts[0]:
+            raise ValueError(
+                f"Journal of {self.journal_store.collection_name} was compacted past sequence number {sequence_number}"
+            )
+        batch_ends = [*head.batch_starts[1:], head.next_sequence_number]
+        keys_batch = [
+            self._batch_key(batch_start)
+            for batch_start, batch_end in zip(head.batch_starts, batch_ends)
+            if batch_end > sequence_number + 1
+        ]
+        records: List[ChangeRecord] = []
+        timestamp_settled = time.time() - self.settle_seconds
+        # a batch that is being merged by a compaction may repeat records of the next batches
+        sequence_number_last = sequence_number
+        for i in range(0, len(keys_batch), 100):
+            for batch in self.journal_store.mget(keys_batch[i : i + 100]):
+                if batch is None:
+                    continue
+                for record_dict in batch["records"]:
+                    if record_dict["sequence_number"] > sequence_number_last:
+                        if record_dict["timestamp"] > timestamp_settled:
+                            return records
+                        records.append(ChangeRecord(**record_dict))
+                        sequence_number_last = record_dict["sequence_number"]
+                        if len(records) >= limit:
+                            return records
+        return records
+
+    def get_offset(self, consumer_name: str) -> int:
+        offset_dict = self.journal_store.mget([self._offset_key(consumer_name)])[0]
+        if offset_dict is None:
+            return 0
+        return offset_dict["sequence_number"]
+
+    def set_offset(self, consumer_name: str, sequence_number: int) -> None:
+        self.journal_store.mset([(self._offset_key(consumer_name), {"sequence_number": sequence_number})])
+
+    def read_for_consumer(self, consumer_name: str, limit: int = 10000) -> List[ChangeRecord]:
+        """Read the changes after the stored offset of a consumer, call `set_offset` once processed."""
+        return self.read_since(self.get_offset(consumer_name), limit)
+
+    def compact(self) -> None:
+        with self._lock:
+            self._count_appends_since_compact = 0
+            head = self._load_head()
+            batch_ends = [*head.batch_starts[1:], head.next_sequence_number]
+            sequence_number_floor = head.next_sequence_number - self.max_records
+            keys_drop: List[str] = []
+            batches_keep: List[tuple[int, int]] = []
+            for batch_start, batch_end in zip(head.batch_starts, batch_ends):
+                if batch_end <= sequence_number_floor:
+                    keys_drop.append(self._batch_key(batch_start))
+                else:
+                    batches_keep.append((batch_start, batch_end))
+
+            # merge runs of small batches into batches of about batch_size records
+            batch_starts_new: List[int] = []
+            run: List[tuple[int, int]] = []
+            for batch_start, batch_end in batches_keep:
+                run.append((batch_start, batch_end))
+                if run[-1][1] - run[0][0] >= self.batch_size:
+                    batch_starts_new.append(self._merge_batches(run, keys_drop))
+                    run = []
+            if len(run) > 0:
+                batch_starts_new.append(self._merge_batches(run, keys_drop))
+
+            head.batch_starts = batch_starts_new
+            self._save_head(head)
+            if len(keys_drop) > 0:
+                self.journal_store.mdelete(keys_drop)
+            logger.info(f"Compacted journal {self.journal_store.collection_name}, dropped {len(keys_drop)} batches")
+
+    def _merge_batches(self, run: List[tuple[int, int]], keys_drop: List[str]) -> int:
+        if len(run) == 1:
+            return run[0][0]
+        keys_batch = [self._batch_key(batch_start) for batch_start, _ in run]
+        records: List[dict] = []
+        for batch in self.journal_store.mget(keys_batch):
+            if batch is not None:
+                records.extend(batch["records"])
+        self.journal_store.mset([(keys_batch[0], {"records": records})])
+        keys_drop.extend(keys_batch[1:])
+        return run[0][0]
+
@@ -0,0 +1,46 @@
+import bisect
+import hashlib
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+
+class ConsistentHashRing:
+    """Maps keys to shards with consistent hashing over virtual nodes.
+
+    Every shard is placed on the ring `virtual_nodes` times, so adding a shard only moves
+    the keys that land on its virtual nodes, about 1 / (n + 1) of all keys.
+    """
+
+    def __init__(self, shard_names: Iterable[str], virtual_nodes: int = 128) -> None:
+        self.shard_names: List[str] = list(shard_names)
+        if len(self.shard_names) == 0:
+            raise ValueError("A hash ring needs at least one shard")
+        if len(set(self.shard_names)) != len(self.shard_names):
+            raise ValueError("Shard names must be unique")
+        self.virtual_nodes = virtual_nodes
+        points: List[Tuple[int, str]] = []
+        for shard_name in self.shard_names:
+            for i in range(virtual_nodes):
+                points.append((self._hash(f"{shard_name}#{i}"), shard_name))
+        points.sort()
+        self._points = [point for point, _ in points]
+        self._point_shard_names = [shard_name for _, shard_name in points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+    def get_shard_name(self, key: str) -> str:
+        index = bisect.bisect(self._points, self._hash(key))
+        if index == len(self._points):
+            index = 0
+        return self._point_shard_names[index]
+
+    def group_keys(self, keys: Sequence[str]) -> Dict[str, List[int]]:
+        """Group the positions of keys by the shard that owns them."""
+        groups: Dict[str, List[int]] = {}
+        for index, key in enumerate(keys):
+            groups.setdefault(self.get_shard_name(key), []).append(index)
+        return groups
+
+    def with_shard(self, shard_name: str) -> "ConsistentHashRing":
+        return ConsistentHashRing([*self.shard_names, shard_name], self.virtual_nodes)
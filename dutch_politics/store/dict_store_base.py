@@ -1,9 +1,14 @@
 from abc import abstractmethod
-from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence, Tuple
 
 from fastapi import HTTPException
 from langchain_core.stores import BaseStore
 
+from dutch_politics.store.key_partition import KeyRange, KeyScanner, key_ranges_from_stripes
+
+if TYPE_CHECKING:
+    from dutch_politics.store.change_journal import ChangeJournal
+
 
 class DictStoreBase(BaseStore[str, dict]):
     def __init__(self, collection_name: str) -> None:
@@ -29,6 +34,17 @@ class DictStoreBase(BaseStore[str, dict]):
     def get(self, key: str) -> Optional[dict]:
         return self.mget([key])[0]
 
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        """Return for each key whether it is in the store, stores override this to skip reading values."""
+        return [value is not None for value in self.mget(keys)]
+
+    def compare_and_set(self, key: str, expected: Optional[dict], value: dict) -> bool:
+        """Set the value only if the current value equals `expected` (None: key absent), atomically.
+
+        Returns whether the value was set. Stores that can not do this atomically raise.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support compare_and_set")
+
     @abstractmethod
     def mdelete(self, keys: Sequence[str]) -> None:
         pass
@@ -37,6 +53,20 @@ class DictStoreBase(BaseStore[str, dict]):
     def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
         pass
 
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        """Yield the keys that fall in a key range, stores override this with a ranged scan."""
+        return (key for key in self.yield_keys(prefix=prefix) if key_range.contains(key))
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        """Split the keys into n independent scanners that can be consumed in parallel."""
+        return [KeyScanner(self, key_range, prefix) for key_range in key_ranges_from_stripes(n)]
+
+    def with_change_journal(self, journal: "ChangeJournal") -> "DictStoreBase":
+        """Return a view of this store that records every mset and mdelete in the journal."""
+        from dutch_politics.store.dict_store_journal import DictStoreJournal
+
+        return DictStoreJournal(self, journal)
+
     @abstractmethod
     async def asample(self, count: int) -> List[dict]:
         pass
@@ -3,6 +3,7 @@ from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
 from dutch_politics.store.bytes_store_base import BytesStoreBase
 from dutch_politics.store.dict_store_base import DictStoreBase
+from dutch_politics.store.key_partition import KeyRange, KeyScanner
 
 
 class DictStoreBytes(DictStoreBase):
@@ -33,10 +34,16 @@ class DictStoreBytes(DictStoreBase):
     def yield_keys(
         self, *, prefix: Optional[str] = None
     ) -> Union[Iterator[str], Iterator[str]]:
-        if prefix is None:
-            return self._store.yield_keys()
-        else:
-            return (key for key in self._store.yield_keys() if key.startswith(prefix))
+        return self._store.yield_keys(prefix=prefix)
+
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        return self._store.mexists(keys)
+
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        return self._store.yield_keys_range(key_range, prefix=prefix)
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        return self._store.partition_keys(n, prefix=prefix)
 
     async def asample(self, count: int) -> List[dict]:
         list_bytes = await self._store.asample(count)
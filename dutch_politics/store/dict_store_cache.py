@@ -1,8 +1,11 @@
-from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple, TypeVar
 
 from pydantic import BaseModel
 
 from dutch_politics.store.dict_store_base import DictStoreBase
+from dutch_politics.store.key_filter_bloom import KeyFilterBloomPersisted
+from dutch_politics.store.key_partition import KeyRange, KeyScanner
+from dutch_politics.store.single_flight import SingleFlight
 
 T = TypeVar("T", bound=BaseModel)
 
@@ -12,14 +15,22 @@ class DictStoreCache(DictStoreBase):
         self,
         dict_store_cache: DictStoreBase,
         dict_store_base: DictStoreBase,
+        key_filter: Optional[KeyFilterBloomPersisted] = None,
     ) -> None:
         if dict_store_cache.collection_name != dict_store_base.collection_name:
             raise ValueError("Collection names must match")
         super().__init__(dict_store_cache.collection_name)
         self.dict_store_cache = dict_store_cache
         self.dict_store_base = dict_store_base
+        # optional bloom filter over the keys of the base store
+        self.key_filter = key_filter
+        # concurrent misses on the same keys share a single read of the base store
+        self._single_flight: SingleFlight = SingleFlight()
 
     def mset(self, key_value_pairs: Sequence[tuple[str, dict]]) -> None:
+        if self.key_filter is not None:
+            # added before the writes, a failed write only leaves a false positive behind
+            self.key_filter.madd([key for key, _ in key_value_pairs])
         self.dict_store_cache.mset(key_value_pairs)
         self.dict_store_base.mset(key_value_pairs)
 
@@ -34,12 +45,19 @@ class DictStoreCache(DictStoreBase):
             else:
                 ids_not_found.append(key)
 
+        # skip the base for keys that the filter knows are not there
+        if self.key_filter is not None and len(ids_not_found) > 0:
+            list_might_contain = self.key_filter.mfilter(ids_not_found)
+            ids_not_found = [key for key, might_contain in zip(ids_not_found, list_might_contain) if might_contain]
+
         # then try to get the results from the base
         if len(ids_not_found) > 0:
-            results_base = self.dict_store_base.mget(ids_not_found)
+            results_base = self._single_flight.mget(ids_not_found, self.dict_store_base.mget)
             for key, result_base in zip(ids_not_found, results_base):
                 if result_base is not None:
                     results_dict[key] = result_base
+                elif self.key_filter is not None:
+                    self.key_filter.record_false_positive()
 
         # then turn it back into a list with the same order as the keys
         results_list: List[Optional[dict]] = []
@@ -50,13 +68,32 @@ class DictStoreCache(DictStoreBase):
                 results_list.append(None)
         return results_list
 
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        list_exists = self.dict_store_cache.mexists(keys)
+        ids_not_found = [key for key, exists in zip(keys, list_exists) if not exists]
+        if self.key_filter is not None and len(ids_not_found) > 0:
+            list_might_contain = self.key_filter.mfilter(ids_not_found)
+            ids_not_found = [key for key, might_contain in zip(ids_not_found, list_might_contain) if might_contain]
+        ids_found_base: Set[str] = set()
+        if len(ids_not_found) > 0:
+            ids_found_base = {key for key, exists in zip(ids_not_found, self.dict_store_base.mexists(ids_not_found)) if exists}
+        return [exists or key in ids_found_base for key, exists in zip(keys, list_exists)]
+
     def mdelete(self, keys: Sequence[str]) -> None:
         self.dict_store_cache.mdelete(keys)
         self.dict_store_base.mdelete(keys)
+        if self.key_filter is not None:
+            self.key_filter.mdelete(keys)
 
     def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
         return self.dict_store_base.yield_keys(prefix=prefix)
 
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        return self.dict_store_base.yield_keys_range(key_range, prefix=prefix)
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        return self.dict_store_base.partition_keys(n, prefix=prefix)
+
     async def asample(self, count: int) -> List[dict]:
         # sample the base directly because the cache is not used for sampling
         return await self.dict_store_base.asample(count)
@@ -0,0 +1,49 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from dutch_politics.store.change_journal import ChangeJournal
+from dutch_politics.store.dict_store_base import DictStoreBase
+from dutch_politics.store.key_partition import KeyRange, KeyScanner
+
+
+class DictStoreJournal(DictStoreBase):
+    """Dict store that records every mset and mdelete in a change journal before applying it."""
+
+    def __init__(self, store: DictStoreBase, journal: ChangeJournal) -> None:
+        super().__init__(store.collection_name)
+        self.store = store
+        self.journal = journal
+
+    def mset(self, key_value_pairs: Sequence[tuple[str, dict]]) -> None:
+        self.journal.append("set", [key for key, _ in key_value_pairs])
+        self.store.mset(key_value_pairs)
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[dict]]:
+        return self.store.mget(keys)
+
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        return self.store.mexists(keys)
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        self.journal.append("delete", keys)
+        self.store.mdelete(keys)
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        return self.store.yield_keys(prefix=prefix)
+
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        return self.store.yield_keys_range(key_range, prefix=prefix)
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        return self.store.partition_keys(n, prefix=prefix)
+
+    async def asample(self, count: int) -> List[dict]:
+        return await self.store.asample(count)
+
+    def query(
+        self,
+        query: Dict[str, Any],
+        order_by: List[Tuple[str, bool]] = [],
+        limit: int = 0,
+        offset: int = 0,
+    ) -> List[dict]:
+        return self.store.query(query, order_by, limit, offset)
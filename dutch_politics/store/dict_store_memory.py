@@ -1,5 +1,6 @@
 import random
-from typing import Dict, Iterator, List, Optional, Sequence, Union
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
 from dutch_politics.store.dict_store_base import DictStoreBase
 
@@ -8,6 +9,7 @@ class DictStoreMemory(DictStoreBase):
     def __init__(self, collection_name: str) -> None:
         super().__init__(collection_name)
         self._dict: Dict[str, dict] = {}
+        self._lock = threading.Lock()
 
     def mset(self, key_value_pairs: Sequence[tuple[str, dict]]) -> None:
         self._dict.update(key_value_pairs)
@@ -15,6 +17,13 @@ class DictStoreMemory(DictStoreBase):
     def mget(self, keys: Sequence[str]) -> list[Optional[dict]]:
         return [self._dict[key] for key in keys]
 
+    def compare_and_set(self, key: str, expected: Optional[dict], value: dict) -> bool:
+        with self._lock:
+            if self._dict.get(key) != expected:
+                return False
+            self._dict[key] = value
+            return True
+
     def mdelete(self, keys: Sequence[str]) -> None:
         for key in keys:
             self._dict.pop(key)
@@ -29,3 +38,12 @@ class DictStoreMemory(DictStoreBase):
 
     async def asample(self, count: int) -> List[dict]:
         return random.sample(list(self._dict.values()), count)
+
+    def query(
+        self,
+        query: Dict[str, str],
+        order_by: List[Tuple[str, bool]] = [],
+        limit: int = 0,
+        offset: int = 0,
+    ) -> List[dict]:
+        raise NotImplementedError("Not implemented")
@@ -0,0 +1,69 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from dutch_politics.store.dict_store_base import DictStoreBase
+from dutch_politics.store.hedged_read import HedgedReader
+from dutch_politics.store.key_partition import KeyRange, KeyScanner
+from dutch_politics.store.replica_set import ReplicaSet
+
+
+class DictStoreMirror(DictStoreBase):
+    """Writes to every replica and serves reads from the first one, hedged on the others.
+
+    The first store is the primary, the others are backups such as a second bucket or a
+    local disk copy. Listing and sampling only use the primary. See ReplicaSet for failed
+    writes and `repair`.
+    """
+
+    def __init__(
+        self,
+        stores: Sequence[DictStoreBase],
+        hedged_reader: Optional[HedgedReader] = None,
+        divergence_store: Optional[DictStoreBase] = None,
+    ) -> None:
+        super().__init__(stores[0].collection_name)
+        self.replica_set: ReplicaSet[dict] = ReplicaSet(stores, hedged_reader, divergence_store)
+
+    def mset(self, key_value_pairs: Sequence[Tuple[str, dict]]) -> None:
+        self.replica_set.mset(key_value_pairs)
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[dict]]:
+        return self.replica_set.mget(keys)
+
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        return self.replica_set.mexists(keys)
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        self.replica_set.mdelete(keys)
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        return self.replica_set.yield_keys(prefix=prefix)
+
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        return self.replica_set.yield_keys_range(key_range, prefix=prefix)
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        return self.replica_set.partition_keys(n, prefix=prefix)
+
+    async def asample(self, count: int) -> List[dict]:
+        return await self.replica_set.asample(count)
+
+    def query(
+        self,
+        query: Dict[str, Any],
+        order_by: List[Tuple[str, bool]] = [],
+        limit: int = 0,
+        offset: int = 0,
+    ) -> List[dict]:
+        return self.replica_set.read(lambda store: store.query(query, order_by, limit, offset))
+
+    def repair(self, batch_size: int = 100) -> int:
+        return self.replica_set.repair(batch_size)
+
+    def close(self) -> None:
+        self.replica_set.close()
+
+    def __enter__(self) -> "DictStoreMirror":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -6,6 +6,7 @@ from pymongo import MongoClient
 from pymongo.command_cursor import CommandCursor as PymongoCommandCursor
 
 from dutch_politics.store.dict_store_base import DictStoreBase
+from dutch_politics.store.key_partition import KeyRange, KeyScanner, key_ranges_from_boundaries
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +53,29 @@ class DictStoreMongo(DictStoreBase):
 
         return result
 
+    def compare_and_set(self, key: str, expected: Optional[dict], value: dict) -> bool:
+        from pymongo.errors import DuplicateKeyError
+
+        if expected is None:
+            try:
+                self.collection.insert_one({"_id": key, "document": value})
+                return True
+            except DuplicateKeyError:
+                return False
+        # the filter matches the whole embedded document, so any concurrent change fails it
+        document_previous = self.collection.find_one_and_replace(
+            {"_id": key, "document": expected}, {"_id": key, "document": value}
+        )
+        return document_previous is not None
+
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        if not keys:
+            return []
+        # project on _id only, the documents themselves are not transferred
+        query = {"_id": {"$in": list(keys)}}
+        ids_found = {doc["_id"] for doc in self.collection.find(query, {"_id": 1})}
+        return [key in ids_found for key in keys]
+
     def mdelete(self, keys: Sequence[str]) -> None:
         ids = list(keys)
         query = {"_id": {"$in": ids}}
@@ -69,6 +93,31 @@ class DictStoreMongo(DictStoreBase):
             for doc in self.collection.find(query, {"_id": 1}):
                 yield doc["_id"]
 
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        if key_range.stripe_count is not None:
+            yield from super().yield_keys_range(key_range, prefix=prefix)
+            return
+        conditions: Dict[str, str] = {}
+        if prefix is not None:
+            conditions["$regex"] = f"^{re.escape(prefix)}"
+        if key_range.start is not None:
+            conditions["$gte"] = key_range.start
+        if key_range.end is not None:
+            conditions["$lt"] = key_range.end
+        query = {"_id": conditions} if conditions else {}
+        for doc in self.collection.find(query, {"_id": 1}):
+            yield doc["_id"]
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        # let the server pick _id boundaries that give buckets of about equal size
+        pipeline: List[dict] = []
+        if prefix is not None:
+            pipeline.append({"$match": {"_id": {"$regex": f"^{re.escape(prefix)}"}}})
+        pipeline.append({"$bucketAuto": {"groupBy": "$_id", "buckets": n}})
+        buckets = list(self.collection.aggregate(pipeline))
+        boundaries = [bucket["_id"]["min"] for bucket in buckets[1:]]
+        return [KeyScanner(self, key_range, prefix) for key_range in key_ranges_from_boundaries(boundaries)]
+
     def clear(self) -> None:
         """Clear all documents from the collection."""
         self.collection.delete_many({})
@@ -6,6 +6,7 @@ from sqlalchemy.engine.base import Engine
 
 from dutch_politics.store.bytes_store_postgres import BytesStorePostgres
 from dutch_politics.store.dict_store_base import DictStoreBase
+from dutch_politics.store.key_partition import KeyRange, KeyScanner
 
 
 class DictStorePostgres(DictStoreBase):
@@ -39,6 +40,15 @@ class DictStorePostgres(DictStoreBase):
     ) -> Union[Iterator[str], Iterator[str]]:
         return self._bytes_store.yield_keys(prefix=prefix)
 
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        return self._bytes_store.mexists(keys)
+
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        return self._bytes_store.yield_keys_range(key_range, prefix=prefix)
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        return self._bytes_store.partition_keys(n, prefix=prefix)
+
     async def asample(self, count: int) -> List[dict]:
         list_blob = self._bytes_store.mget(
             random.sample(list(self._bytes_store.yield_keys()), count)
@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from dutch_politics.store.consistent_hash_ring import ConsistentHashRing
+from dutch_politics.store.dict_store_base import DictStoreBase
+from dutch_politics.store.key_partition import KeyRange, KeyScanner
+from dutch_politics.store.shard_router import ShardRouter
+
+
+class DictStoreSharded(DictStoreBase):
+    """Spreads the keys of a collection over several dict stores with a consistent hash ring.
+
+    The routing, the fallback to the previous owner and the rebalance live in ShardRouter.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        stores: Dict[str, DictStoreBase],
+        ring: ConsistentHashRing,
+        executor: ThreadPoolExecutor,
+    ) -> None:
+        super().__init__(collection_name)
+        self.router: ShardRouter[dict] = ShardRouter(collection_name, stores, ring, executor)
+        self._executor = executor
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[dict]]:
+        return self.router.mget(keys)
+
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        return self.router.mexists(keys)
+
+    def mset(self, key_value_pairs: Sequence[Tuple[str, dict]]) -> None:
+        self.router.mset(key_value_pairs)
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        self.router.mdelete(keys)
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        return self.router.yield_keys(prefix=prefix)
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        return self.router.partition_keys(n, prefix=prefix)
+
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        return self.router.yield_keys_range(key_range, prefix=prefix)
+
+    async def asample(self, count: int) -> List[dict]:
+        return await self.router.asample(count)
+
+    def add_shard(self, shard_name: str, store: DictStoreBase) -> None:
+        self.router.add_shard(shard_name, store)
+
+    def rebalance(self, batch_size: int = 100) -> int:
+        return self.router.rebalance(batch_size)
+
+    def query(
+        self,
+        query: Dict[str, Any],
+        order_by: List[Tuple[str, bool]] = [],
+        limit: int = 0,
+        offset: int = 0,
+    ) -> List[dict]:
+        # every shard returns its first offset + limit results, the merge applies the window
+        limit_shard = offset + limit if limit > 0 else 0
+        futures = [
+            self._executor.submit(self.router.stores[shard_name].query, query, order_by, limit_shard, 0)
+            for shard_name in self.router.ring.shard_names
+        ]
+        results: List[dict] = []
+        for future in futures:
+            results.extend(future.result())
+        for field, ascending in reversed(order_by):
+            # missing and None values sort before every value, as in MongoDB, and never compare to one
+            results.sort(
+                key=lambda document, field=field: (document.get(field) is not None, document.get(field)),
+                reverse=not ascending,
+            )
+        if limit > 0:
+            return results[offset : offset + limit]
+        return results[offset:]
@@ -3,6 +3,7 @@ from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
 from dutch_politics.store.bytes_store_sqlite import BytesStoreSqlite
 from dutch_politics.store.dict_store_base import DictStoreBase
+from dutch_politics.store.key_partition import KeyRange, KeyScanner
 
 
 class DictStoreSqlite(DictStoreBase):
@@ -30,6 +31,20 @@ class DictStoreSqlite(DictStoreBase):
     def yield_keys(self, *, prefix: Optional[str] = None) -> Union[Iterator[str], Iterator[str]]:
         return self._bytes_store.yield_keys(prefix=prefix)
 
+    def compare_and_set(self, key: str, expected: Optional[dict], value: dict) -> bool:
+        # values are compared in their serialized form, which is how mset writes them
+        expected_bytes = None if expected is None else json.dumps(expected).encode("utf-8")
+        return self._bytes_store.compare_and_set(key, expected_bytes, json.dumps(value).encode("utf-8"))
+
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        return self._bytes_store.mexists(keys)
+
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        return self._bytes_store.yield_keys_range(key_range, prefix=prefix)
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        return self._bytes_store.partition_keys(n, prefix=prefix)
+
     def clear(self) -> None:
         self._bytes_store.clear()
 
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, List, Optional, Sequence, TypeVar
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+
+class HedgedReader:
+    """Runs a read on a primary replica and hedges it on the backups when it is slow.
+
+    A backup request is only sent when the primary has not answered within the p95 of its
+    recent latencies, so about 5% of the reads are hedged. The first answer wins. When a
+    backup wins, the latency saved is measured once the primary finally answers. Readers
+    can share an executor, a reader only shuts down an executor it created on `close`.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 32,
+        hedge_quantile: float = 0.95,
+        initial_hedge_delay_seconds: float = 0.1,
+        minimum_hedge_delay_seconds: float = 0.005,
+        window_size: int = 1000,
+        minimum_samples: int = 20,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ) -> None:
+        self.hedge_quantile = hedge_quantile
+        self.initial_hedge_delay_seconds = initial_hedge_delay_seconds
+        self.minimum_hedge_delay_seconds = minimum_hedge_delay_seconds
+        self.minimum_samples = minimum_samples
+        self._latencies_primary: Deque[float] = deque(maxlen=window_size)
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers)
+        self._lock = threading.Lock()
+        self.count_reads = 0
+        self.count_hedged = 0
+        self.count_backup_won = 0
+        self.latency_saved_seconds = 0.0
+
+    def close(self) -> None:
+        if self._owns_executor:
+            # backup reads that lost the race may still run, do not wait for them
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self) -> "HedgedReader":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    @property
+    def hedge_delay_seconds(self) -> float:
+        with self._lock:
+            if len(self._latencies_primary) < self.minimum_samples:
+                return self.initial_hedge_delay_seconds
+            latencies = sorted(self._latencies_primary)
+        index = min(len(latencies) - 1, int(len(latencies) * self.hedge_quantile))
+        return max(self.minimum_hedge_delay_seconds, latencies[index])
+
+    @property
+    def hedge_rate(self) -> float:
+        if self.count_reads == 0:
+            return 0.0
+        return self.count_hedged / self.count_reads
+
+    def _record_primary(self, time_start: float, future: Future) -> None:
+        if future.exception() is None:
+            with self._lock:
+                self._latencies_primary.append(time.perf_counter() - time_start)
+
+    def read(self, read_primary: Callable[[], R], reads_backup: Sequence[Callable[[], R]]) -> R:
+        time_start = time.perf_counter()
+        future_primary = self.executor.submit(read_primary)
+        future_primary.add_done_callback(lambda future: self._record_primary(time_start, future))
+        with self._lock:
+            self.count_reads += 1
+        done, _ = wait([future_primary], timeout=self.hedge_delay_seconds)
+        if future_primary in done and future_primary.exception() is None:
+            return future_primary.result()
+
+        with self._lock:
+            self.count_hedged += 1
+        futures_pending: List[Future] = [future_primary]
+        reads_remaining = list(reads_backup)
+        error: Optional[BaseException] = None
+        while True:
+            # one more backup per round, a round ends on a failure or after another hedge delay
+            if len(reads_remaining) > 0:
+                futures_pending.append(self.executor.submit(reads_remaining.pop(0)))
+            if len(futures_pending) == 0:
+                if error is not None:
+                    raise error
+                raise ValueError("No replica answered the read")
+            timeout = self.hedge_delay_seconds if len(reads_remaining) > 0 else None
+            done, _ = wait(futures_pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                futures_pending.remove(future)
+                if future.exception() is not None:
+                    error = future.exception()
+                    logger.warning(f"Replica read failed: {error}")
+                    continue
+                if future is not future_primary:
+                    self._record_backup_won(future_primary)
+                return future.result()
+
+    def _record_backup_won(self, future_primary: Future) -> None:
+        time_won = time.perf_counter()
+        with self._lock:
+            self.count_backup_won += 1
+
+        def record_saved(future: Future) -> None:
+            if future.exception() is None:
+                with self._lock:
+                    self.latency_saved_seconds += time.perf_counter() - time_won
+
+        future_primary.add_done_callback(record_saved)
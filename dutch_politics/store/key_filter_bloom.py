@@ -0,0 +1,435 @@
+import hashlib
+import json
+import logging
+import math
+import struct
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Set
+
+from langchain_core.stores import BaseStore
+
+from dutch_politics.store.bytes_store_base import BytesStoreBase
+
+logger = logging.getLogger(__name__)
+
+
+class KeyFilterBloom:
+    """Bloom filter that answers definite misses for the keys of a collection.
+
+    A negative answer from `might_contain` is always correct, a positive answer may be a
+    false positive. Deletes can not be removed from a Bloom filter, so they are counted and
+    the filter asks for a rebuild (from `yield_keys`) once too many of them accumulated.
+    """
+
+    _MAGIC = b"BLM1"
+    _HEADER_FORMAT = ">4sQIQdQQd"
+
+    def __init__(
+        self,
+        capacity: int,
+        false_positive_rate: float = 0.01,
+        rebuild_deleted_fraction: float = 0.1,
+        rebuild_interval_seconds: Optional[float] = None,
+    ) -> None:
+        if capacity <= 0:
+            raise ValueError("Capacity must be positive")
+        if not 0 < false_positive_rate < 1:
+            raise ValueError("False positive rate must be between 0 and 1")
+        self.capacity = capacity
+        self.target_false_positive_rate = false_positive_rate
+        self.rebuild_deleted_fraction = rebuild_deleted_fraction
+        self.rebuild_interval_seconds = rebuild_interval_seconds
+        self.size_bits = max(8, int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.size_bits + 7) // 8)
+        self.count_added = 0
+        self.count_deleted = 0
+        self.built_at = time.time()
+        # statistics used to measure the real false positive rate
+        self.count_negative = 0
+        self.count_positive = 0
+        self.count_false_positive = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, key: str) -> Iterable[int]:
+        # double hashing: h1 + i * h2 over a single 128 bit digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        hash_1, hash_2 = struct.unpack(">QQ", digest)
+        hash_2 |= 1
+        for i in range(self.hash_count):
+            yield (hash_1 + i * hash_2) % self.size_bits
+
+    def add(self, key: str) -> None:
+        self.madd([key])
+
+    def madd(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                for position in self._positions(key):
+                    self._bits[position >> 3] |= 1 << (position & 7)
+                self.count_added += 1
+
+    def might_contain(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def mfilter(self, keys: Iterable[str]) -> List[bool]:
+        """Return for each key whether it might be present, and count the answers."""
+        list_might_contain = [self.might_contain(key) for key in keys]
+        with self._lock:
+            count_positive = sum(list_might_contain)
+            self.count_positive += count_positive
+            self.count_negative += len(list_might_contain) - count_positive
+        return list_might_contain
+
+    def record_false_positive(self, count: int = 1) -> None:
+        """Record that keys reported as present turned out to be missing in the base store."""
+        with self._lock:
+            self.count_false_positive += count
+
+    def mdelete(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            self.count_deleted += len(list(keys))
+
+    @property
+    def measured_false_positive_rate(self) -> float:
+        """Fraction of absent keys that the filter failed to reject."""
+        count_absent = self.count_negative + self.count_false_positive
+        if count_absent == 0:
+            return 0.0
+        return self.count_false_positive / count_absent
+
+    @property
+    def estimated_false_positive_rate(self) -> float:
+        """Theoretical false positive rate for the current number of inserted keys."""
+        return (1 - math.exp(-self.hash_count * self.count_added / self.size_bits)) ** self.hash_count
+
+    def needs_rebuild(self) -> bool:
+        if self.count_added > self.capacity:
+            return True
+        if self.count_added > 0 and self.count_deleted / self.count_added > self.rebuild_deleted_fraction:
+            return True
+        if self.rebuild_interval_seconds is not None:
+            return time.time() - self.built_at > self.rebuild_interval_seconds
+        return False
+
+    def to_bytes(self) -> bytes:
+        header = struct.pack(
+            self._HEADER_FORMAT,
+            self._MAGIC,
+            self.size_bits,
+            self.hash_count,
+            self.capacity,
+            self.target_false_positive_rate,
+            self.count_added,
+            self.count_deleted,
+            self.built_at,
+        )
+        return header + bytes(self._bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "KeyFilterBloom":
+        header_size = struct.calcsize(cls._HEADER_FORMAT)
+        if len(data) < header_size:
+            raise ValueError("Data is not a serialized bloom filter")
+        magic, size_bits, hash_count, capacity, false_positive_rate, count_added, count_deleted, built_at = struct.unpack(
+            cls._HEADER_FORMAT, data[:header_size]
+        )
+        if magic != cls._MAGIC:
+            raise ValueError("Data is not a serialized bloom filter")
+        key_filter = cls(capacity, false_positive_rate)
+        key_filter.size_bits = size_bits
+        key_filter.hash_count = hash_count
+        key_filter.count_added = count_added
+        key_filter.count_deleted = count_deleted
+        key_filter.built_at = built_at
+        key_filter._bits = bytearray(data[header_size:])
+        if len(key_filter._bits) != (size_bits + 7) // 8:
+            raise ValueError("Serialized bloom filter is truncated")
+        return key_filter
+
+    @classmethod
+    def build(
+        cls,
+        store: BaseStore,
+        false_positive_rate: float = 0.01,
+        headroom: float = 2.0,
+        minimum_capacity: int = 1024,
+    ) -> "KeyFilterBloom":
+        """Build a filter from all keys in the store, leaving room for growth."""
+        keys = list(store.yield_keys())
+        capacity = max(minimum_capacity, int(len(keys) * headroom))
+        key_filter = cls(capacity, false_positive_rate)
+        key_filter.madd(keys)
+        logger.info(f"Built bloom filter for {store.collection_name} with {len(keys)} keys")
+        return key_filter
+
+
+class KeyFilterBloomPersisted:
+    """Keeps a bloom filter for one collection persisted in a side store, shared by processes.
+
+    The filter snapshot is stored under the collection name in `filter_store`. Lookups are
+    answered from memory. The keys passed to `madd` are collected and written as one delta
+    under `<collection>.delta-` by `sync`, which also applies the deltas of other processes
+    and runs at most once per `sync_interval_seconds`, on the next lookup or add after the
+    interval. A key written by another process can therefore be answered as missing for
+    up to one interval, and the unsynced keys of a process that dies are missing until the
+    next rebuild; with an interval of 0 every add is persisted and every miss is checked
+    against the deltas first. `save` writes the snapshot after `save_every` changes, marks
+    it with a snapshot delta and removes the deltas it holds that are older than
+    `delta_retention_seconds`. Other processes reload the snapshot when they see a newer
+    mark. While syncing fails every key is answered as possibly present.
+    """
+
+    _SNAPSHOT_SUFFIX = "-snapshot"
+
+    def __init__(
+        self,
+        store: BaseStore,
+        filter_store: BytesStoreBase,
+        false_positive_rate: float = 0.01,
+        save_every: int = 1000,
+        rebuild_interval_seconds: Optional[float] = None,
+        sync_interval_seconds: float = 30.0,
+        delta_retention_seconds: float = 600.0,
+    ) -> None:
+        self.store = store
+        self.filter_store = filter_store
+        self.false_positive_rate = false_positive_rate
+        self.save_every = save_every
+        self.rebuild_interval_seconds = rebuild_interval_seconds
+        self.sync_interval_seconds = sync_interval_seconds
+        self.delta_retention_seconds = delta_retention_seconds
+        self._delta_prefix = f"{store.collection_name}.delta-"
+        self._token = uuid.uuid4().hex[:12]
+        self._count_deltas = 0
+        self._count_unsaved = 0
+        self._lock = threading.Lock()
+        self._lock_sync = threading.Lock()
+        # deltas whose keys are in the filter, and the keys of the deltas written by this process
+        self._deltas_applied: Set[str] = set()
+        self._deltas_own: Dict[str, List[str]] = {}
+        self._snapshot_mark = ""
+        self._synced_at: Optional[float] = None
+        self._sync_attempted_at: Optional[float] = None
+        # keys added since the last sync, written as one delta by the next sync
+        self._keys_pending: List[str] = []
+        # keys added while a rebuild is listing the collection, replayed into the new filter
+        self._keys_added_during_rebuild: Optional[List[str]] = None
+        self.key_filter = self._load_or_build()
+
+    def _load_or_build(self) -> KeyFilterBloom:
+        data = self.filter_store.mget([self.store.collection_name])[0]
+        if data is not None:
+            try:
+                key_filter = KeyFilterBloom.from_bytes(data)
+                key_filter.rebuild_interval_seconds = self.rebuild_interval_seconds
+                if not key_filter.needs_rebuild():
+                    self.key_filter = key_filter
+                    self.sync()
+                    return self.key_filter
+            except ValueError:
+                logger.warning(f"Discarding invalid bloom filter for {self.store.collection_name}")
+        return self.rebuild()
+
+    def rebuild(self) -> KeyFilterBloom:
+        with self._lock:
+            if self._keys_added_during_rebuild is not None:
+                # another thread is already rebuilding
+                return self.key_filter
+            self._keys_added_during_rebuild = []
+        try:
+            time_listing = time.time()
+            key_filter = KeyFilterBloom.build(self.store, self.false_positive_rate)
+            key_filter.rebuild_interval_seconds = self.rebuild_interval_seconds
+            with self._lock:
+                key_filter.madd(self._keys_added_during_rebuild)
+                key_filter.madd(self._keys_pending)
+                self.key_filter = key_filter
+                # values of recent deltas may have been written after the listing, apply them again,
+                # deltas removed since the listing started were listed as keys
+                self._deltas_applied = set()
+                self._synced_at = time_listing
+                self._sync_attempted_at = time_listing
+        finally:
+            with self._lock:
+                self._keys_added_during_rebuild = None
+        self.save()
+        return self.key_filter
+
+    def _delta_name(self, suffix: str = "") -> str:
+        with self._lock:
+            self._count_deltas += 1
+            count_deltas = self._count_deltas
+        return f"{self._delta_prefix}{time.time_ns():020d}-{self._token}-{count_deltas:08d}{suffix}"
+
+    def _delta_time(self, name: str) -> float:
+        return int(name[len(self._delta_prefix) :].split("-", 1)[0]) / 1e9
+
+    def sync(self) -> bool:
+        """Apply the deltas written by other processes, reloading the snapshot when it was replaced.
+
+        Returns False when the deltas could not be read consistently, for instance because
+        they were compacted while reading them three times in a row.
+        """
+        with self._lock_sync:
+            self._sync_attempted_at = time.time()
+            try:
+                self._flush()
+            except Exception as e:
+                logger.warning(f"Could not write the bloom filter delta of {self.store.collection_name}: {e!r}")
+                with self._lock:
+                    self._synced_at = None
+                return False
+            for _ in range(3):
+                names = sorted(self.filter_store.yield_keys(prefix=self._delta_prefix))
+                marks = [name for name in names if name.endswith(self._SNAPSHOT_SUFFIX)]
+                key_filter = None
+                mark = marks[-1] if len(marks) > 0 else ""
+                # deltas are only removed once past the retention, a recent sync has seen them all
+                synced_at = self._synced_at
+                is_recent = synced_at is not None and time.time() - synced_at < self.delta_retention_seconds / 2
+                if mark > self._snapshot_mark and not is_recent:
+                    data = self.filter_store.mget([self.store.collection_name])[0]
+                    try:
+                        key_filter = KeyFilterBloom.from_bytes(data or b"")
+                    except ValueError:
+                        continue
+                    key_filter.rebuild_interval_seconds = self.rebuild_interval_seconds
+                    names_to_apply = [name for name in names if name not in marks]
+                else:
+                    names_to_apply = [name for name in names if name not in self._deltas_applied and name not in marks]
+                names_to_read = [name for name in names_to_apply if name not in self._deltas_own]
+                values = self.filter_store.mget(names_to_read)
+                if any(value is None for value in values):
+                    # compacted while reading, the snapshot that holds these keys is marked by now
+                    continue
+                keys_by_name = {name: json.loads(value) for name, value in zip(names_to_read, values)}  # type: ignore[arg-type]
+                names_listed = set(names)
+                with self._lock:
+                    if key_filter is not None:
+                        # own deltas written after the listing are only known here
+                        for name_own, keys_own in self._deltas_own.items():
+                            if name_own not in names_listed:
+                                key_filter.madd(keys_own)
+                        key_filter.madd(self._keys_pending)
+                        self.key_filter = key_filter
+                        self._deltas_applied = set()
+                    self._snapshot_mark = max(self._snapshot_mark, mark)
+                    for name in names_to_apply:
+                        keys = keys_by_name.get(name)
+                        if keys is None:
+                            keys = self._deltas_own[name]
+                        if name not in self._deltas_applied:
+                            self.key_filter.madd(keys)
+                    self._deltas_applied = {
+                        name for name in self._deltas_applied if name in names_listed or name in self._deltas_own
+                    }
+                    self._deltas_applied.update(names)
+                    # own deltas that are gone were compacted into a snapshot
+                    time_keep = time.time() - 2 * self.delta_retention_seconds
+                    self._deltas_own = {
+                        name: keys
+                        for name, keys in self._deltas_own.items()
+                        if name in names_listed or self._delta_time(name) > time_keep
+                    }
+                    self._synced_at = time.time()
+                return True
+            logger.warning(f"Could not sync the bloom filter of {self.store.collection_name}")
+            with self._lock:
+                self._synced_at = None
+            return False
+
+    def save(self) -> None:
+        """Write the snapshot, mark it and remove the deltas it holds that are past the retention."""
+        if not self.sync():
+            return
+        with self._lock:
+            self._count_unsaved = 0
+            data = self.key_filter.to_bytes()
+            names_held = set(self._deltas_applied)
+        self.filter_store.mset([(self.store.collection_name, data)])
+        name_mark = self._delta_name(self._SNAPSHOT_SUFFIX)
+        self.filter_store.mset([(name_mark, b"")])
+        with self._lock:
+            self._snapshot_mark = max(self._snapshot_mark, name_mark)
+            self._deltas_applied.add(name_mark)
+        time_expired = time.time() - self.delta_retention_seconds
+        names_expired = [name for name in sorted(names_held) if self._delta_time(name) < time_expired]
+        if len(names_expired) > 0:
+            self.filter_store.mdelete(names_expired)
+
+    def _changed(self, count: int) -> None:
+        with self._lock:
+            self._count_unsaved += count
+            should_save = self._count_unsaved >= self.save_every
+        if self.key_filter.needs_rebuild():
+            self.rebuild()
+        elif should_save:
+            self.save()
+
+    def _flush(self) -> None:
+        """Write the keys added since the last flush as one delta."""
+        with self._lock:
+            keys = self._keys_pending
+            self._keys_pending = []
+        if len(keys) == 0:
+            return
+        name = self._delta_name()
+        try:
+            self.filter_store.mset([(name, json.dumps(keys).encode("utf-8"))])
+        except BaseException:
+            with self._lock:
+                self._keys_pending[:0] = keys
+            raise
+        with self._lock:
+            self._deltas_own[name] = keys
+            self._deltas_applied.add(name)
+
+    def _is_sync_due(self) -> bool:
+        sync_attempted_at = self._sync_attempted_at
+        return sync_attempted_at is None or time.time() - sync_attempted_at >= self.sync_interval_seconds
+
+    def madd(self, keys: Iterable[str]) -> None:
+        """Add keys before their values are written, they are persisted by the next sync."""
+        keys = list(keys)
+        if len(keys) == 0:
+            return
+        with self._lock:
+            self.key_filter.madd(keys)
+            self._keys_pending.extend(keys)
+            if self._keys_added_during_rebuild is not None:
+                self._keys_added_during_rebuild.extend(keys)
+        if self._is_sync_due():
+            self.sync()
+        self._changed(len(keys))
+
+    def mdelete(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        self.key_filter.mdelete(keys)
+        self._changed(len(keys))
+
+    def mfilter(self, keys: Iterable[str]) -> List[bool]:
+        keys = list(keys)
+        list_might_contain = self.key_filter.mfilter(keys)
+        if all(list_might_contain):
+            return list_might_contain
+        if self._is_sync_due():
+            if not self.sync():
+                return [True] * len(keys)
+            # only the keys rejected before are checked again, the statistics keep the first answer
+            list_might_contain = [
+                might_contain or self.key_filter.might_contain(key) for key, might_contain in zip(keys, list_might_contain)
+            ]
+        elif self._synced_at is None:
+            # the last sync failed, the filter may miss keys of other processes
+            return [True] * len(keys)
+        return list_might_contain
+
+    def record_false_positive(self, count: int = 1) -> None:
+        self.key_filter.record_false_positive(count)
+
+    @property
+    def measured_false_positive_rate(self) -> float:
+        return self.key_filter.measured_false_positive_rate
@@ -0,0 +1,173 @@
+import logging
+import queue
+import threading
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from langchain_core.stores import BaseStore
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+
+ALPHABET_HEX = "0123456789abcdef"
+ALPHABET_ALPHANUMERIC = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+class KeyRange(BaseModel):
+    """A slice of the key space of a collection.
+
+    Either a lexicographic range [start, end) where a missing bound is open, or a stripe of
+    keys selected by a stable hash. Key ranges are plain data so they can be shipped to worker
+    processes that open their own store and call `yield_keys_range`.
+    """
+
+    start: Optional[str] = None
+    end: Optional[str] = None
+    stripe_index: Optional[int] = None
+    stripe_count: Optional[int] = None
+
+    def contains(self, key: str) -> bool:
+        if self.stripe_count is not None:
+            return zlib.crc32(key.encode("utf-8")) % self.stripe_count == self.stripe_index
+        if self.start is not None and key < self.start:
+            return False
+        if self.end is not None and key >= self.end:
+            return False
+        return True
+
+
+class KeyScanner:
+    """Iterable over the keys of one partition of a store."""
+
+    def __init__(self, store: BaseStore, key_range: KeyRange, prefix: Optional[str] = None) -> None:
+        self.store = store
+        self.key_range = key_range
+        self.prefix = prefix
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.store.yield_keys_range(self.key_range, prefix=self.prefix))  # type: ignore
+
+
+def key_ranges_from_boundaries(boundaries: Sequence[str]) -> List[KeyRange]:
+    """Turn sorted boundaries into contiguous ranges that cover the whole key space."""
+    boundaries = sorted(set(boundaries))
+    starts: List[Optional[str]] = [None, *boundaries]
+    ends: List[Optional[str]] = [*boundaries, None]
+    return [KeyRange(start=start, end=end) for start, end in zip(starts, ends)]
+
+
+def key_ranges_from_stripes(n: int) -> List[KeyRange]:
+    return [KeyRange(stripe_index=i, stripe_count=n) for i in range(n)]
+
+
+def boundaries_from_sorted_keys(sorted_keys: Sequence[str], n: int) -> List[str]:
+    """Pick n - 1 boundaries at the quantiles of a sorted key sample."""
+    if n <= 1 or len(sorted_keys) == 0:
+        return []
+    return [sorted_keys[(i * len(sorted_keys)) // n] for i in range(1, n)]
+
+
+def boundaries_from_alphabet(n: int, alphabet: str = ALPHABET_HEX, prefix: Optional[str] = None) -> List[str]:
+    """Split the key space evenly assuming keys are uniformly spread over an alphabet.
+
+    Uses as many leading characters as needed to get n distinct boundaries, so hash based
+    keys such as the sha256 url keys of the html cache split into equal ranges.
+    """
+    if n <= 1:
+        return []
+    depth = 1
+    while len(alphabet) ** depth < n:
+        depth += 1
+    total = len(alphabet) ** depth
+    boundaries = []
+    for i in range(1, n):
+        value = (i * total) // n
+        characters = []
+        for _ in range(depth):
+            value, index = divmod(value, len(alphabet))
+            characters.append(alphabet[index])
+        boundaries.append((prefix or "") + "".join(reversed(characters)))
+    return boundaries
+
+
+def _apply_batch(
+    function: Callable[[str, Any], R], keys: Sequence[str], values: Sequence[Any]
+) -> List[Tuple[str, R]]:
+    return [(key, function(key, value)) for key, value in zip(keys, values) if value is not None]
+
+
+def map_collection(
+    store: BaseStore,
+    function: Callable[[str, Any], R],
+    *,
+    n_partitions: int = 8,
+    max_workers: Optional[int] = None,
+    batch_size: int = 100,
+    max_batches_in_flight: int = 32,
+    prefix: Optional[str] = None,
+    key_filter: Optional[Callable[[str], bool]] = None,
+) -> Iterator[Tuple[str, R]]:
+    """Map a function over every (key, value) of a collection with a process pool.
+
+    Every partition of the key space is scanned and read by its own thread, the values are
+    handed to a process pool in batches. The function must be picklable (a module level
+    function). Results are yielded as they complete, not in key order.
+    """
+    scanners: List[KeyScanner] = store.partition_keys(n_partitions, prefix=prefix)  # type: ignore
+    results: "queue.Queue[Optional[Future]]" = queue.Queue()
+    slots = threading.BoundedSemaphore(max_batches_in_flight)
+    stop = threading.Event()
+
+    def submit_batch(process_pool: ProcessPoolExecutor, keys: List[str]) -> None:
+        values = store.mget(keys)
+        slots.acquire()
+        results.put(process_pool.submit(_apply_batch, function, keys, values))
+
+    def scan_partition(process_pool: ProcessPoolExecutor, scanner: KeyScanner) -> None:
+        try:
+            keys: List[str] = []
+            for key in scanner:
+                if stop.is_set():
+                    return
+                if key_filter is not None and not key_filter(key):
+                    continue
+                keys.append(key)
+                if len(keys) >= batch_size:
+                    submit_batch(process_pool, keys)
+                    keys = []
+            if len(keys) > 0:
+                submit_batch(process_pool, keys)
+        except BaseException as e:
+            failed: Future = Future()
+            failed.set_exception(e)
+            slots.acquire()
+            results.put(failed)
+        finally:
+            results.put(None)
+
+    with ProcessPoolExecutor(max_workers) as process_pool, ThreadPoolExecutor(len(scanners)) as scan_pool:
+        for scanner in scanners:
+            scan_pool.submit(scan_partition, process_pool, scanner)
+        count_done = 0
+        try:
+            while count_done < len(scanners):
+                future = results.get()
+                if future is None:
+                    count_done += 1
+                    continue
+                try:
+                    yield from future.result()
+                finally:
+                    slots.release()
+        finally:
+            stop.set()
+            # unblock scanners waiting for a slot so the pools can shut down
+            while count_done < len(scanners):
+                future = results.get()
+                if future is None:
+                    count_done += 1
+                else:
+                    slots.release()
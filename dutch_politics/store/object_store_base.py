@@ -1,5 +1,6 @@
 from abc import abstractmethod
 from typing import (
+    TYPE_CHECKING,
     Any,
     Dict,
     Generic,
@@ -15,6 +16,11 @@ from fastapi import HTTPException
 from langchain_core.stores import BaseStore
 from pydantic import BaseModel
 
+from dutch_politics.store.key_partition import KeyRange, KeyScanner, key_ranges_from_stripes
+
+if TYPE_CHECKING:
+    from dutch_politics.store.change_journal import ChangeJournal
+
 T = TypeVar("T", bound=BaseModel)
 
 
@@ -39,6 +45,10 @@ class ObjectStoreBase(Generic[T], BaseStore[str, T]):
             raise HTTPException(status_code=404, detail=f"Key {key} not found in store")
         return value
 
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        """Return for each key whether it is in the store, stores override this to skip reading values."""
+        return [value is not None for value in self.mget(keys)]
+
     @abstractmethod
     def mdelete(self, keys: Sequence[str]) -> None:
         pass
@@ -47,6 +57,20 @@ class ObjectStoreBase(Generic[T], BaseStore[str, T]):
     def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
         pass
 
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        """Yield the keys that fall in a key range, stores override this with a ranged scan."""
+        return (key for key in self.yield_keys(prefix=prefix) if key_range.contains(key))
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        """Split the keys into n independent scanners that can be consumed in parallel."""
+        return [KeyScanner(self, key_range, prefix) for key_range in key_ranges_from_stripes(n)]
+
+    def with_change_journal(self, journal: "ChangeJournal") -> "ObjectStoreBase[T]":
+        """Return a view of this store that records every mset and mdelete in the journal."""
+        from dutch_politics.store.object_store_journal import ObjectStoreJournal
+
+        return ObjectStoreJournal(self, journal)
+
     @abstractmethod
     async def asample(self, count: int) -> List[T]:
         pass
@@ -4,6 +4,7 @@ from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Type, TypeVa
 from pydantic import BaseModel
 
 from dutch_politics.store.dict_store_base import DictStoreBase
+from dutch_politics.store.key_partition import KeyRange, KeyScanner
 from dutch_politics.store.object_store_base import ObjectStoreBase
 
 T = TypeVar("T", bound=BaseModel)
@@ -44,6 +45,15 @@ class ObjectStoreNested(ObjectStoreBase[T]):
     ) -> Union[Iterator[str], Iterator[str]]:
         return self.store.yield_keys(prefix=prefix)
 
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        return self.store.mexists(keys)
+
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        return self.store.yield_keys_range(key_range, prefix=prefix)
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        return self.store.partition_keys(n, prefix=prefix)
+
     async def asample(self, count: int) -> List[T]:
         list_dict = await self.store.asample(count)
         list_object: List[T] = []
@@ -79,8 +89,30 @@ class ObjectStoreNested(ObjectStoreBase[T]):
         self.mset(object_entries_changed)
         return count_reformatted
 
-    def validate_all(self, batch_size: int = 1000) -> int:
+    def _validate_scanner(self, scanner: KeyScanner, batch_size: int) -> int:
+        count_reformatted = 0
+        keys_batch: List[str] = []
+        for key in scanner:
+            keys_batch.append(key)
+            if len(keys_batch) >= batch_size:
+                count_reformatted += self.mvalidate(keys_batch)
+                keys_batch = []
+        if len(keys_batch) > 0:
+            count_reformatted += self.mvalidate(keys_batch)
+        return count_reformatted
+
+    def validate_all(self, batch_size: int = 1000, n_partitions: int = 1) -> int:
         logger.info(f"Validating all entries in {self.store.collection_name}...")
+        if n_partitions > 1:
+            # scan and validate independent key ranges in parallel
+            from concurrent.futures import ThreadPoolExecutor
+
+            scanners = self.partition_keys(n_partitions)
+            with ThreadPoolExecutor(len(scanners)) as executor:
+                counts = executor.map(lambda scanner: self._validate_scanner(scanner, batch_size), scanners)
+                count_reformatted = sum(counts)
+            logger.info(f"Reformatted {count_reformatted} entries...")
+            return count_reformatted
         count_reformatted = 0
         logger.info("Retrieving keys...")
         keys = list(self.yield_keys())
@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Generic, Iterator, List, Optional, Sequence, Set, Tuple, TypeVar
+
+from dutch_politics.store.dict_store_base import DictStoreBase
+from dutch_politics.store.hedged_read import HedgedReader
+from dutch_politics.store.key_partition import KeyRange, KeyScanner
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar("R")
+V = TypeVar("V")
+
+
+class ReplicaSet(Generic[V]):
+    """Writes to every replica and serves reads from the first one, hedged on the others.
+
+    Shared by the mirrored bytes and dict stores. The first store is the primary. Writes run
+    on the executor of the hedged reader. When a write fails on some replicas and not on
+    others, the keys are recorded as divergent, in `divergence_store` when given so they
+    survive a restart, and the error is raised. `repair` copies the primary value of those
+    keys to the other replicas. A mirror that creates its own hedged reader closes it.
+    """
+
+    def __init__(
+        self,
+        stores: Sequence[Any],
+        hedged_reader: Optional[HedgedReader] = None,
+        divergence_store: Optional[DictStoreBase] = None,
+    ) -> None:
+        if len(stores) < 2:
+            raise ValueError("A mirror needs at least two stores")
+        self.stores = list(stores)
+        self._owns_hedged_reader = hedged_reader is None
+        self.hedged_reader = hedged_reader or HedgedReader()
+        self.divergence_store = divergence_store
+        self._keys_divergent: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def read(self, read_store: Callable[[Any], R]) -> R:
+        return self.hedged_reader.read(
+            lambda: read_store(self.stores[0]),
+            [lambda store=store: read_store(store) for store in self.stores[1:]],
+        )
+
+    def write(self, write_store: Callable[[Any], None], keys: Sequence[str]) -> None:
+        futures = [self.hedged_reader.executor.submit(write_store, store) for store in self.stores]
+        errors = [future.exception() for future in futures]
+        errors_raised = [error for error in errors if error is not None]
+        if len(errors_raised) == 0:
+            return
+        if len(errors_raised) < len(self.stores):
+            replicas_failed = [i for i, error in enumerate(errors) if error is not None]
+            logger.error(f"Write of {len(keys)} keys failed on replicas {replicas_failed}, recorded for repair")
+            self._record_divergent(keys, replicas_failed)
+        raise errors_raised[0]
+
+    def _record_divergent(self, keys: Sequence[str], replicas_failed: List[int]) -> None:
+        with self._lock:
+            self._keys_divergent.update(keys)
+        if self.divergence_store is not None:
+            record = {"replicas_failed": replicas_failed, "failed_at": time.time()}
+            self.divergence_store.mset([(key, record) for key in keys])
+
+    @property
+    def keys_divergent(self) -> List[str]:
+        keys = set(self._keys_divergent)
+        if self.divergence_store is not None:
+            keys.update(self.divergence_store.yield_keys())
+        return sorted(keys)
+
+    def repair(self, batch_size: int = 100) -> int:
+        """Make the replicas match the primary for the divergent keys, returns the number repaired."""
+        keys = self.keys_divergent
+        for i in range(0, len(keys), batch_size):
+            keys_batch = keys[i : i + batch_size]
+            values = self.stores[0].mget(keys_batch)
+            key_value_pairs = [(key, value) for key, value in zip(keys_batch, values) if value is not None]
+            keys_absent = [key for key, value in zip(keys_batch, values) if value is None]
+            for store in self.stores[1:]:
+                if len(key_value_pairs) > 0:
+                    store.mset(key_value_pairs)
+                if len(keys_absent) > 0:
+                    keys_present = [key for key, exists in zip(keys_absent, store.mexists(keys_absent)) if exists]
+                    if len(keys_present) > 0:
+                        store.mdelete(keys_present)
+            if self.divergence_store is not None:
+                self.divergence_store.mdelete(keys_batch)
+            with self._lock:
+                self._keys_divergent.difference_update(keys_batch)
+        if len(keys) > 0:
+            logger.info(f"Repaired {len(keys)} divergent keys of {self.stores[0].collection_name}")
+        return len(keys)
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[V]]:
+        return self.read(lambda store: store.mget(keys))
+
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        return self.stores[0].mexists(keys)
+
+    def mset(self, key_value_pairs: Sequence[Tuple[str, V]]) -> None:
+        self.write(lambda store: store.mset(key_value_pairs), [key for key, _ in key_value_pairs])
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        self.write(lambda store: store.mdelete(keys), keys)
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        return self.stores[0].yield_keys(prefix=prefix)
+
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        return self.stores[0].yield_keys_range(key_range, prefix=prefix)
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        return self.stores[0].partition_keys(n, prefix=prefix)
+
+    async def asample(self, count: int) -> List[V]:
+        return await self.stores[0].asample(count)
+
+    def close(self) -> None:
+        if self._owns_hedged_reader:
+            self.hedged_reader.close()
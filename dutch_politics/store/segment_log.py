@@ -0,0 +1,198 @@
+import logging
+from typing import Dict, Generic, Iterator, List, Optional, Sequence, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+
+from dutch_politics.store.bytes_store_base import BytesStoreBase
+
+T = TypeVar("T", bound=BaseModel)
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentManifest(BaseModel):
+    # segment ids in reading order
+    segment_ids: List[str] = []
+    segment_counts: List[int] = []
+    next_segment_number: int = 0
+
+    @property
+    def count_items(self) -> int:
+        return sum(self.segment_counts)
+
+
+class SegmentLog(Generic[T]):
+    """A list of models stored as JSON lines segments plus a small manifest in a bytes store.
+
+    Segments are never modified once written. Writers first store new segments and then the
+    manifest, so a reader that loaded the manifest always finds the segments it lists.
+    Replaced segments are deleted after the new manifest is in place, a reader that is still
+    streaming an old manifest may then miss them. A log should have a single writer.
+    """
+
+    def __init__(self, store: BytesStoreBase, log_id: str, model_class: Type[T]) -> None:
+        self.store = store
+        self.log_id = log_id
+        self.model_class = model_class
+
+    @property
+    def manifest_key(self) -> str:
+        return f"{self.log_id}.manifest.json"
+
+    def _segment_key(self, segment_number: int) -> str:
+        return f"{self.log_id}.segment-{segment_number:06d}.jsonl"
+
+    def load_manifest(self) -> Optional[SegmentManifest]:
+        manifest_bytes = self.store.mget([self.manifest_key])[0]
+        if manifest_bytes is None:
+            return None
+        return SegmentManifest.model_validate_json(manifest_bytes.decode("utf-8"))
+
+    def exists(self) -> bool:
+        return self.load_manifest() is not None
+
+    def _encode_segment(self, items: Sequence[T]) -> bytes:
+        return "".join(item.model_dump_json() + "\n" for item in items).encode("utf-8")
+
+    def _decode_segment(self, segment_bytes: bytes) -> List[T]:
+        return [
+            self.model_class.model_validate_json(line)
+            for line in segment_bytes.decode("utf-8").splitlines()
+            if line
+        ]
+
+    def yield_segments(self, manifest: Optional[SegmentManifest] = None) -> Iterator[Tuple[str, List[T]]]:
+        """Yield (segment id, items) one segment at a time, in manifest order."""
+        if manifest is None:
+            manifest = self.load_manifest()
+        if manifest is None:
+            return
+        for segment_id in manifest.segment_ids:
+            segment_bytes = self.store.mget([segment_id])[0]
+            if segment_bytes is None:
+                raise ValueError(f"Segment {segment_id} of {self.log_id} is missing")
+            yield segment_id, self._decode_segment(segment_bytes)
+
+    def yield_items(self, manifest: Optional[SegmentManifest] = None) -> Iterator[T]:
+        for _, items in self.yield_segments(manifest):
+            yield from items
+
+    def _write_segments(
+        self, manifest: SegmentManifest, segments: Sequence[Sequence[T]]
+    ) -> List[Tuple[str, int]]:
+        key_value_pairs = []
+        segment_ids_counts = []
+        for items in segments:
+            segment_id = self._segment_key(manifest.next_segment_number)
+            manifest.next_segment_number += 1
+            key_value_pairs.append((segment_id, self._encode_segment(items)))
+            segment_ids_counts.append((segment_id, len(items)))
+        if len(key_value_pairs) > 0:
+            self.store.mset(key_value_pairs)
+        return segment_ids_counts
+
+    def _save_manifest(self, manifest: SegmentManifest) -> None:
+        self.store.mset([(self.manifest_key, manifest.model_dump_json().encode("utf-8"))])
+
+    def write(self, segments: Sequence[Sequence[T]]) -> None:
+        """Replace the whole log with the given segments."""
+        manifest = self.load_manifest() or SegmentManifest()
+        segment_ids_old = list(manifest.segment_ids)
+        segment_ids_counts = self._write_segments(manifest, [items for items in segments if len(items) > 0])
+        manifest.segment_ids = [segment_id for segment_id, _ in segment_ids_counts]
+        manifest.segment_counts = [count for _, count in segment_ids_counts]
+        self._save_manifest(manifest)
+        if len(segment_ids_old) > 0:
+            self.store.mdelete(segment_ids_old)
+
+    def insert_segments(self, segments_by_position: Sequence[Tuple[int, Sequence[T]]]) -> None:
+        """Add segments, each before the segment at the given position of the current manifest.
+
+        A position equal to the number of segments appends at the end.
+        """
+        manifest = self.load_manifest() or SegmentManifest()
+        segments_by_position = [(position, items) for position, items in segments_by_position if len(items) > 0]
+        if len(segments_by_position) == 0:
+            return
+        for position, _ in segments_by_position:
+            if not 0 <= position <= len(manifest.segment_ids):
+                raise ValueError(f"Invalid segment position {position} for {self.log_id}")
+        segment_ids_counts = self._write_segments(manifest, [items for _, items in segments_by_position])
+        inserts: Dict[int, List[Tuple[str, int]]] = {}
+        for (position, _), segment_id_count in zip(segments_by_position, segment_ids_counts):
+            inserts.setdefault(position, []).append(segment_id_count)
+        segment_ids: List[str] = []
+        segment_counts: List[int] = []
+        for position in range(len(manifest.segment_ids) + 1):
+            for segment_id, count in inserts.get(position, []):
+                segment_ids.append(segment_id)
+                segment_counts.append(count)
+            if position < len(manifest.segment_ids):
+                segment_ids.append(manifest.segment_ids[position])
+                segment_counts.append(manifest.segment_counts[position])
+        manifest.segment_ids = segment_ids
+        manifest.segment_counts = segment_counts
+        self._save_manifest(manifest)
+
+    def compact(self, segment_size: int, max_segments_small: int = 8) -> int:
+        """Merge runs of adjacent small segments, returns the number of segments removed.
+
+        Every update adds a few small segments and loading reads every segment, so once more
+        than `max_segments_small` segments hold fewer than `segment_size` items, adjacent
+        segments are merged into segments of at most `segment_size` items. Full segments are
+        not rewritten and the order of the items is kept.
+        """
+        manifest = self.load_manifest()
+        if manifest is None:
+            return 0
+        if sum(1 for count in manifest.segment_counts if count < segment_size) <= max_segments_small:
+            return 0
+        runs: List[List[int]] = []
+        count_run = 0
+        for position, count in enumerate(manifest.segment_counts):
+            if len(runs) > 0 and count_run + count <= segment_size:
+                runs[-1].append(position)
+                count_run += count
+            else:
+                runs.append([position])
+                count_run = count
+        runs_merged = [run for run in runs if len(run) > 1]
+        if len(runs_merged) == 0:
+            return 0
+        segments_merged: List[List[T]] = []
+        for run in runs_merged:
+            segment_ids_run = [manifest.segment_ids[position] for position in run]
+            items: List[T] = []
+            for segment_id, segment_bytes in zip(segment_ids_run, self.store.mget(segment_ids_run)):
+                if segment_bytes is None:
+                    raise ValueError(f"Segment {segment_id} of {self.log_id} is missing")
+                items.extend(self._decode_segment(segment_bytes))
+            segments_merged.append(items)
+        segment_ids_counts_merged = iter(self._write_segments(manifest, segments_merged))
+        segment_ids_old: List[str] = []
+        segment_ids: List[str] = []
+        segment_counts: List[int] = []
+        for run in runs:
+            if len(run) == 1:
+                segment_ids.append(manifest.segment_ids[run[0]])
+                segment_counts.append(manifest.segment_counts[run[0]])
+                continue
+            segment_id, count = next(segment_ids_counts_merged)
+            segment_ids.append(segment_id)
+            segment_counts.append(count)
+            segment_ids_old.extend(manifest.segment_ids[position] for position in run)
+        count_removed = len(manifest.segment_ids) - len(segment_ids)
+        manifest.segment_ids = segment_ids
+        manifest.segment_counts = segment_counts
+        self._save_manifest(manifest)
+        self.store.mdelete(segment_ids_old)
+        logger.info(f"Compacted {self.log_id} to {len(segment_ids)} segments")
+        return count_removed
+
+    def delete(self) -> None:
+        manifest = self.load_manifest()
+        if manifest is None:
+            return
+        self.store.mdelete([self.manifest_key])
+        if len(manifest.segment_ids) > 0:
+            self.store.mdelete(manifest.segment_ids)
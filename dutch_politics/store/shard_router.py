@@ -0,0 +1,170 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Generic, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from dutch_politics.store.consistent_hash_ring import ConsistentHashRing
+from dutch_politics.store.key_partition import KeyRange, KeyScanner
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+
+class ShardRouter(Generic[V]):
+    """Routes the keys of one collection to the stores on a consistent hash ring.
+
+    Shared by the sharded bytes and dict stores, which only differ in their value type.
+    While a shard is being added `ring_previous` holds the old ring, reads that miss on the
+    new owner fall back to the old owner until `rebalance` moved the key. One shard is added
+    at a time, `add_shard` raises until the previous one was rebalanced.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        stores: Dict[str, Any],
+        ring: ConsistentHashRing,
+        executor: ThreadPoolExecutor,
+    ) -> None:
+        self.collection_name = collection_name
+        self.stores = stores
+        self.ring = ring
+        self.ring_previous: Optional[ConsistentHashRing] = None
+        self._executor = executor
+
+    def _call_grouped(self, ring: ConsistentHashRing, method_name: str, keys: Sequence[str]) -> List[Any]:
+        """Call a batch method on every shard for its keys in parallel, results in key order."""
+        results: List[Any] = [None] * len(keys)
+        groups = ring.group_keys(keys)
+        futures = {
+            shard_name: self._executor.submit(getattr(self.stores[shard_name], method_name), [keys[i] for i in indices])
+            for shard_name, indices in groups.items()
+        }
+        for shard_name, future in futures.items():
+            for index, result in zip(groups[shard_name], future.result()):
+                results[index] = result
+        return results
+
+    def _indices_moved(self, keys: Sequence[str], found: Sequence[Any]) -> List[int]:
+        ring_previous = self.ring_previous
+        if ring_previous is None:
+            return []
+        return [
+            i
+            for i, key in enumerate(keys)
+            if not found[i] and ring_previous.get_shard_name(key) != self.ring.get_shard_name(key)
+        ]
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[V]]:
+        results = self._call_grouped(self.ring, "mget", keys)
+        ring_previous = self.ring_previous
+        indices_moved = self._indices_moved(keys, [result is not None for result in results])
+        if ring_previous is not None and len(indices_moved) > 0:
+            results_previous = self._call_grouped(ring_previous, "mget", [keys[i] for i in indices_moved])
+            for index, value in zip(indices_moved, results_previous):
+                results[index] = value
+        return results
+
+    def mexists(self, keys: Sequence[str]) -> List[bool]:
+        results = self._call_grouped(self.ring, "mexists", keys)
+        ring_previous = self.ring_previous
+        indices_moved = self._indices_moved(keys, results)
+        if ring_previous is not None and len(indices_moved) > 0:
+            results_previous = self._call_grouped(ring_previous, "mexists", [keys[i] for i in indices_moved])
+            for index, exists in zip(indices_moved, results_previous):
+                results[index] = exists
+        return results
+
+    def mset(self, key_value_pairs: Sequence[Tuple[str, V]]) -> None:
+        groups = self.ring.group_keys([key for key, _ in key_value_pairs])
+        futures = [
+            self._executor.submit(self.stores[shard_name].mset, [key_value_pairs[i] for i in indices])
+            for shard_name, indices in groups.items()
+        ]
+        for future in futures:
+            future.result()
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        rings = [self.ring] if self.ring_previous is None else [self.ring, self.ring_previous]
+        futures = []
+        for ring in rings:
+            for shard_name, indices in ring.group_keys(keys).items():
+                futures.append(self._executor.submit(self.stores[shard_name].mdelete, [keys[i] for i in indices]))
+        for future in futures:
+            future.result()
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        # during a rebalance a key can briefly live on two shards
+        keys_seen = set() if self.ring_previous is not None else None
+        for shard_name in self.ring.shard_names:
+            for key in self.stores[shard_name].yield_keys(prefix=prefix):
+                if keys_seen is not None:
+                    if key in keys_seen:
+                        continue
+                    keys_seen.add(key)
+                yield key
+
+    def partition_keys(self, n: int, *, prefix: Optional[str] = None) -> List[KeyScanner]:
+        # every shard is scanned independently, split the requested partitions over the shards
+        count_per_shard = max(1, n // len(self.ring.shard_names))
+        scanners: List[KeyScanner] = []
+        for shard_name in self.ring.shard_names:
+            scanners.extend(self.stores[shard_name].partition_keys(count_per_shard, prefix=prefix))
+        return scanners
+
+    def yield_keys_range(self, key_range: KeyRange, *, prefix: Optional[str] = None) -> Iterator[str]:
+        for shard_name in self.ring.shard_names:
+            yield from self.stores[shard_name].yield_keys_range(key_range, prefix=prefix)
+
+    async def asample(self, count: int) -> List[V]:
+        # sample every shard in proportion to its share of the ring
+        results: List[V] = []
+        count_per_shard = -(-count // len(self.ring.shard_names))
+        for shard_name in self.ring.shard_names:
+            results.extend(await self.stores[shard_name].asample(count_per_shard))
+        return results[:count]
+
+    def add_shard(self, shard_name: str, store: Any) -> None:
+        """Add a shard, new writes go to it right away, call `rebalance` to move existing keys."""
+        if shard_name in self.stores:
+            raise ValueError(f"Shard {shard_name} already exists")
+        if self.ring_previous is not None:
+            # the keys still on their previous owners would become unreadable
+            raise RuntimeError(f"Rebalance {self.collection_name} before adding another shard")
+        self.stores[shard_name] = store
+        self.ring_previous = self.ring
+        self.ring = self.ring.with_shard(shard_name)
+
+    def _set_if_absent(self, store: Any, key: str, value: V) -> bool:
+        try:
+            return store.compare_and_set(key, None, value)
+        except NotImplementedError:
+            if store.mexists([key])[0]:
+                return False
+            store.mset([(key, value)])
+            return True
+
+    def rebalance(self, batch_size: int = 100) -> int:
+        """Move the keys that the new ring assigns to another shard, returns the number moved.
+
+        A key is only copied to its new owner when it is absent there, with `compare_and_set`,
+        so a value written since the shard was added is never overwritten by the old copy.
+        Stores without `compare_and_set` fall back to a check and a write, writes to them
+        must pause during a rebalance.
+        """
+        if self.ring_previous is None:
+            return 0
+        count_moved = 0
+        for shard_name in self.ring_previous.shard_names:
+            store = self.stores[shard_name]
+            keys_moving = [key for key in store.yield_keys() if self.ring.get_shard_name(key) != shard_name]
+            for i in range(0, len(keys_moving), batch_size):
+                keys_batch = keys_moving[i : i + batch_size]
+                # write the new copy before removing the old one so readers never see a gap
+                for key, value in zip(keys_batch, store.mget(keys_batch)):
+                    if value is not None and self._set_if_absent(self.stores[self.ring.get_shard_name(key)], key, value):
+                        count_moved += 1
+                store.mdelete(keys_batch)
+            logger.info(f"Moved {len(keys_moving)} keys off shard {shard_name} of {self.collection_name}")
+        self.ring_previous = None
+        return count_moved
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Generic, List, Sequence, Tuple, TypeVar
+
+R = TypeVar("R")
+
+
+class SingleFlight(Generic[R]):
+    """Coalesces concurrent fetches of the same keys into one fetch.
+
+    The first caller for a key becomes its leader and fetches it, later callers for the
+    same key wait on the leader's result instead of going to the slow backend themselves.
+    Batches may overlap partially: a caller fetches the keys nobody is fetching yet in one
+    call and waits for the rest. Results are shared through concurrent futures, so callers
+    can be threads or coroutines (`amget`).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+
+    def _claim(self, keys: Sequence[str]) -> Tuple[List[str], Dict[str, Future]]:
+        keys_leader: List[str] = []
+        futures: Dict[str, Future] = {}
+        with self._lock:
+            for key in keys:
+                if key in futures:
+                    continue
+                future = self._in_flight.get(key)
+                if future is None:
+                    future = Future()
+                    self._in_flight[key] = future
+                    keys_leader.append(key)
+                futures[key] = future
+        return keys_leader, futures
+
+    def _fetch(
+        self,
+        keys_leader: List[str],
+        futures: Dict[str, Future],
+        fetch: Callable[[List[str]], List[R]],
+    ) -> None:
+        error: BaseException = RuntimeError("The fetch did not resolve every key")
+        try:
+            values = fetch(keys_leader)
+            if len(values) != len(keys_leader):
+                raise ValueError(f"The fetch returned {len(values)} values for {len(keys_leader)} keys")
+            for key, value in zip(keys_leader, values):
+                futures[key].set_result(value)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            with self._lock:
+                for key in keys_leader:
+                    self._in_flight.pop(key, None)
+            # followers must never wait on a future that nobody resolves
+            for key in keys_leader:
+                if not futures[key].done():
+                    futures[key].set_exception(error)
+
+    def mget(self, keys: Sequence[str], fetch: Callable[[List[str]], List[R]]) -> List[R]:
+        keys_leader, futures = self._claim(keys)
+        if len(keys_leader) > 0:
+            self._fetch(keys_leader, futures, fetch)
+        return [futures[key].result() for key in keys]
+
+    def get(self, key: str, fetch: Callable[[], R]) -> R:
+        return self.mget([key], lambda _: [fetch()])[0]
+
+    async def amget(self, keys: Sequence[str], fetch: Callable[[List[str]], List[R]]) -> List[R]:
+        """Like `mget` for coroutines, the blocking fetch runs in the default executor."""
+        keys_leader, futures = self._claim(keys)
+        if len(keys_leader) > 0:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._fetch, keys_leader, futures, fetch)
+        return [await asyncio.wrap_future(futures[key]) for key in keys]
@@ -5,6 +5,7 @@ from typing import Dict, List, Type, TypeVar
 from pydantic import BaseModel
 
 from dutch_politics.store.bytes_store_base import BytesStoreBase
+from dutch_politics.store.change_journal import ChangeJournal
 from dutch_politics.store.dict_store_base import DictStoreBase
 from dutch_politics.store.object_store_base import ObjectStoreBase
 
@@ -19,6 +20,7 @@ class StoreProviderBase(ABC):
         self._bytes_collection_names = []
         self._dict_collection_names = []
         self._object_collections: Dict[str, ObjectStoreBase] = {}
+        self._change_journals: Dict[str, ChangeJournal] = {}
 
     def get_bytes_store(self, collection_name: str) -> BytesStoreBase:
         self._bytes_collection_names.append(collection_name)
@@ -49,6 +51,17 @@ class StoreProviderBase(ABC):
     ) -> ObjectStoreBase[T]:
         raise NotImplementedError("Not implemented")
 
+    def get_change_journal(self, collection_name: str, max_records: int = 1_000_000) -> ChangeJournal:
+        """Get the change journal of a collection, kept in a dict store next to it.
+
+        Every call returns the same journal, its lock orders the appends of all writers.
+        """
+        change_journal = self._change_journals.get(collection_name)
+        if change_journal is None:
+            change_journal = ChangeJournal(self.get_dict_store(collection_name + "_journal"), max_records=max_records)
+            self._change_journals[collection_name] = change_journal
+        return change_journal
+
     def get_collection_names(self) -> List[str]:
         collection_names = []
         collection_names.extend(self._bytes_collection_names)
@@ -1,6 +1,6 @@
 import collections
 import logging
-from typing import List, Type, TypeVar
+from typing import List, Optional, Type, TypeVar
 
 # fix for collections in boto3 because of moves and six._thread and the old pytz version
 collections.Callable = collections.abc.Callable  # type: ignore
@@ -13,6 +13,7 @@ from dutch_politics.store.bytes_store_base import BytesStoreBase
 from dutch_politics.store.bytes_store_s3 import BytesStoreS3
 from dutch_politics.store.dict_store_base import DictStoreBase
 from dutch_politics.store.dict_store_bytes import DictStoreBytes
+from dutch_politics.store.key_filter_bloom import KeyFilterBloomPersisted
 from dutch_politics.store.object_store_base import ObjectStoreBase
 from dutch_politics.store.object_store_nested import ObjectStoreNested
 from dutch_politics.store.store_provider_base import StoreProviderBase
@@ -28,6 +29,7 @@ class StoreProviderS3(StoreProviderBase):
         database_name: str,
         s3_bucket_connection_string: str,
         initialize: bool = True,
+        key_filter_collection_names: Optional[List[str]] = None,
     ) -> None:
     
         self.is_initialized = False
@@ -48,6 +50,8 @@ class StoreProviderS3(StoreProviderBase):
                 "Invalid S3 bucket connection string: " + s3_bucket_connection_string
             )
         self.region_name = region_name
+        # collections that get a bloom filter to answer definite misses locally
+        self.key_filter_collection_names = key_filter_collection_names or []
         self.client = boto3.client(
             "s3",
             aws_access_key_id=aws_access_key_id,
@@ -104,18 +108,35 @@ class StoreProviderS3(StoreProviderBase):
                 logger.error(f"Error checking S3 bucket: {e}")
                 raise
 
+    def _create_bytes_store_s3(self, collection_name: str) -> BytesStoreS3:
+        bytes_store = BytesStoreS3(collection_name, self.client, self.bucket_name)
+        if collection_name in self.key_filter_collection_names:
+            bytes_store.key_filter = self.get_key_filter(bytes_store)
+        return bytes_store
+
+    def get_key_filter(
+        self, store: BytesStoreBase, false_positive_rate: float = 0.01, sync_interval_seconds: float = 30.0
+    ) -> KeyFilterBloomPersisted:
+        """Load the bloom filter of a collection, building it from its keys if needed.
+
+        The filter writes its keys and reads those of other processes once per
+        `sync_interval_seconds`, so misses and adds cost no S3 request in between.
+        """
+        filter_store = BytesStoreS3("key_filter", self.client, self.bucket_name)
+        return KeyFilterBloomPersisted(
+            store, filter_store, false_positive_rate, sync_interval_seconds=sync_interval_seconds
+        )
+
     def _get_bytes_store(self, collection_name: str) -> BytesStoreBase:
         if not self.is_initialized:
             self.initialize()
         print(f"{self.bucket_name}/{collection_name}")
-        return BytesStoreS3(collection_name, self.client, self.bucket_name)
+        return self._create_bytes_store_s3(collection_name)
 
     def _get_dict_store(self, collection_name: str) -> DictStoreBase:
         if not self.is_initialized:
             self.initialize()
-        return DictStoreBytes(
-            BytesStoreS3(collection_name, self.client, self.bucket_name)
-        )
+        return DictStoreBytes(self._create_bytes_store_s3(collection_name))
 
     def _get_object_store(
         self, collection_name: str, model_class: Type[T]
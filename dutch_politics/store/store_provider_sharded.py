@@ -0,0 +1,84 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Type, TypeVar, Union
+
+from pydantic import BaseModel
+
+from dutch_politics.store.bytes_store_base import BytesStoreBase
+from dutch_politics.store.bytes_store_sharded import BytesStoreSharded
+from dutch_politics.store.consistent_hash_ring import ConsistentHashRing
+from dutch_politics.store.dict_store_base import DictStoreBase
+from dutch_politics.store.dict_store_sharded import DictStoreSharded
+from dutch_politics.store.object_store_base import ObjectStoreBase
+from dutch_politics.store.object_store_nested import ObjectStoreNested
+from dutch_politics.store.store_provider_base import StoreProviderBase
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class StoreProviderSharded(StoreProviderBase):
+    """Spreads every collection over several child providers with consistent hashing.
+
+    The child providers are named, the names place them on the hash ring and must stay the
+    same between runs or keys will be looked up on the wrong shard.
+    """
+
+    def __init__(
+        self,
+        database_name: str,
+        store_providers: Dict[str, StoreProviderBase],
+        virtual_nodes: int = 128,
+        max_workers: int = 16,
+    ) -> None:
+        super().__init__(database_name)
+        self.store_providers = dict(store_providers)
+        self.ring = ConsistentHashRing(self.store_providers.keys(), virtual_nodes)
+        self._executor = ThreadPoolExecutor(max_workers)
+        self._sharded_stores: List[Union[BytesStoreSharded, DictStoreSharded]] = []
+
+    def _get_bytes_store(self, collection_name: str) -> BytesStoreBase:
+        stores = {
+            shard_name: store_provider.get_bytes_store(collection_name)
+            for shard_name, store_provider in self.store_providers.items()
+        }
+        bytes_store = BytesStoreSharded(collection_name, stores, self.ring, self._executor)
+        self._sharded_stores.append(bytes_store)
+        return bytes_store
+
+    def _get_dict_store(self, collection_name: str) -> DictStoreBase:
+        stores = {
+            shard_name: store_provider.get_dict_store(collection_name)
+            for shard_name, store_provider in self.store_providers.items()
+        }
+        dict_store = DictStoreSharded(collection_name, stores, self.ring, self._executor)
+        self._sharded_stores.append(dict_store)
+        return dict_store
+
+    def _get_object_store(
+        self, collection_name: str, model_class: Type[T]
+    ) -> ObjectStoreBase[T]:
+        return ObjectStoreNested(self._get_dict_store(collection_name), model_class)
+
+    def add_shard(self, shard_name: str, store_provider: StoreProviderBase) -> None:
+        """Add a shard to every collection handed out so far, then call `rebalance`."""
+        if shard_name in self.store_providers:
+            raise ValueError(f"Shard {shard_name} already exists")
+        if any(sharded_store.router.ring_previous is not None for sharded_store in self._sharded_stores):
+            raise RuntimeError("Rebalance before adding another shard")
+        self.store_providers[shard_name] = store_provider
+        self.ring = self.ring.with_shard(shard_name)
+        for sharded_store in self._sharded_stores:
+            if isinstance(sharded_store, BytesStoreSharded):
+                sharded_store.add_shard(shard_name, store_provider.get_bytes_store(sharded_store.collection_name))
+            else:
+                sharded_store.add_shard(shard_name, store_provider.get_dict_store(sharded_store.collection_name))
+
+    def rebalance(self, batch_size: int = 100) -> int:
+        """Move only the keys that the new shard took over, collections stay readable meanwhile."""
+        count_moved = 0
+        for sharded_store in self._sharded_stores:
+            logger.info(f"Rebalancing {sharded_store.collection_name}...")
+            count_moved += sharded_store.rebalance(batch_size)
+        return count_moved
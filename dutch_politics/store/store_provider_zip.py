@@ -0,0 +1,35 @@
+import logging
+import os
+from typing import Type, TypeVar
+
+from pydantic import BaseModel
+
+from dutch_politics.store.bytes_store_base import BytesStoreBase
+from dutch_politics.store.bytes_store_zip import BytesStoreZip
+from dutch_politics.store.dict_store_base import DictStoreBase
+from dutch_politics.store.dict_store_bytes import DictStoreBytes
+from dutch_politics.store.object_store_base import ObjectStoreBase
+from dutch_politics.store.object_store_nested import ObjectStoreNested
+from dutch_politics.store.store_provider_base import StoreProviderBase
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class StoreProviderZip(StoreProviderBase):
+    """Read-only collections shipped as zip archives, `{path_dir_database}/{collection_name}.zip`."""
+
+    def __init__(self, database_name: str, path_dir_database: str) -> None:
+        super().__init__(database_name)
+        self.path_dir_database = path_dir_database
+
+    def _get_bytes_store(self, collection_name: str) -> BytesStoreBase:
+        path_file_zip = os.path.join(self.path_dir_database, collection_name + ".zip")
+        return BytesStoreZip(collection_name, path_file_zip)
+
+    def _get_dict_store(self, collection_name: str) -> DictStoreBase:
+        return DictStoreBytes(self._get_bytes_store(collection_name))
+
+    def _get_object_store(self, collection_name: str, model_class: Type[T]) -> ObjectStoreBase[T]:
+        return ObjectStoreNested(self._get_dict_store(collection_name), model_class)
@@ -0,0 +1,54 @@
+import re
+import unicodedata
+from typing import List
+
+# function words that carry no meaning for retrieval
+STOPWORDS_DUTCH = frozenset(
+    """
+    aan al alle als alles ben bij daar dan dat de der deze die dit doch doen door dus een en er
+    ge geen geweest haar had heb hebben heeft hem het hier hij hoe hun iemand iets ik in is ja je
+    kan kon kunnen maar me meer men met mij mijn moet na naar niet niets nog nu of om omdat ook op
+    over reeds te tegen toch toen tot u uit uw van veel voor want waren was wat we wel werd wezen
+    wie wij wil worden wordt zal ze zelf zich zij zijn zo zonder zou
+    """.split()
+)
+
+_PATTERN_TOKEN = re.compile(r"[a-z0-9]+")
+_VOWELS = frozenset("aeiouy")
+
+
+def fold_diacritics(text: str) -> str:
+    """Lowercase and drop accents, so 'geëvalueerd' and 'geevalueerd' become the same token."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(character for character in decomposed if not unicodedata.combining(character))
+
+
+def stem_dutch(token: str) -> str:
+    """Light suffix stripping that conflates the common inflections of Dutch nouns and verbs.
+
+    Strips a plural or genitive 's', then one of 'heden' (to 'heid'), 'ene', 'en' or 'e',
+    and undoubles a final consonant ('mannen' -> 'man', 'moties' -> 'moti'). Stems keep at
+    least three characters.
+    """
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("s") and len(token) > 4 and token[-2] != "s":
+        token = token[:-1]
+    if token.endswith("heden"):
+        return token[:-5] + "heid"
+    for suffix in ("ene", "en", "e"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[: -len(suffix)]
+            break
+    if len(token) > 3 and token[-1] == token[-2] and token[-1].isalpha() and token[-1] not in _VOWELS:
+        token = token[:-1]
+    return token
+
+
+def tokenize_dutch(text: str) -> List[str]:
+    """Fold, split on non alphanumerics, drop stopwords and stem, for indexing and queries alike."""
+    return [
+        stem_dutch(token)
+        for token in _PATTERN_TOKEN.findall(fold_diacritics(text))
+        if token not in STOPWORDS_DUTCH
+    ]
@@ -0,0 +1,124 @@
+import datetime
+import math
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from dutch_politics.bm25_index import B, K1, BM25Index
+from dutch_politics.corpus_columnar import ColumnarCorpus, ColumnarCorpusWriter
+from dutch_politics.model import PoliticalEntry
+from dutch_politics.text_dutch import tokenize_dutch
+
+WORDS = (
+    "stikstof boeren woningbouw huurprijzen asielzoekers opvang gemeenten klimaat energie belasting zorg "
+    "onderwijs defensie begroting motie amendement minister kamer wet pensioen"
+).split()
+SPEAKERS = ["Jimmy Dijk", "Mark Rutte", "Geert Wilders", "Dilan Yeşilgöz-Zegerius", None]
+
+
+def build_corpus(path_dir, count_documents: int, seed: int) -> ColumnarCorpus:
+    rng = random.Random(seed)
+    writer = ColumnarCorpusWriter(str(path_dir))
+    entries = []
+    for i in range(count_documents):
+        elements = []
+        for _ in range(rng.randint(1, 12)):
+            # skewed term frequencies and lengths, so the blocks have different bounds
+            words = rng.choices(WORDS, weights=range(1, len(WORDS) + 1), k=rng.randint(0, 40))
+            elements.append({"type": "speaker", "speaker_name": rng.choice(SPEAKERS), "speaker_name_title": "", "text": " ".join(words)})
+        reference = {
+            "title": f"title {i}",
+            "subtitle": "",
+            "content_url_html": f"https://example.org/{i}",
+            "content_url_pdf": "",
+            "publication_date": f"{1 + i % 28} mei {2020 + i % 4}",
+        }
+        entries.append((f"key-{i}", PoliticalEntry(reference=reference, entry_elements=elements)))
+    writer.append(entries)
+    return ColumnarCorpus(str(path_dir))
+
+
+_tokens_by_corpus: dict = {}
+
+
+def tokens_of_rows(corpus: ColumnarCorpus) -> list:
+    if corpus.path_dir not in _tokens_by_corpus:
+        _tokens_by_corpus[corpus.path_dir] = [tokenize_dutch(corpus.text(row)) for row in range(len(corpus))]
+    return _tokens_by_corpus[corpus.path_dir]
+
+
+def search_exhaustive(index: BM25Index, query: str, k: int, rows_allowed) -> list:
+    terms = set(tokenize_dutch(query))
+    idfs = {term: index._idf(term) for term in terms}
+    average_length = index.average_length
+    tokens_by_row = tokens_of_rows(index.corpus)
+    scores = []
+    for row in rows_allowed:
+        tokens = tokens_by_row[int(row)]
+        tfs = Counter(token for token in tokens if token in terms)
+        if len(tfs) == 0:
+            continue
+        length = len(tokens)
+        score = sum(
+            idfs[term] * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / average_length)) for term, tf in tfs.items()
+        )
+        scores.append((score, int(row)))
+    scores.sort(reverse=True)
+    return scores[:k]
+
+
+def assert_same_ranking(index: BM25Index, query: str, k: int, **filters) -> None:
+    rows_allowed = index.corpus.select(**filters) if filters else np.arange(len(index.corpus))
+    expected = search_exhaustive(index, query, k, rows_allowed)
+    results = index.search(query, k=k, **filters)
+    assert len(results) == len(expected), query
+    for (row, score), (score_expected, _) in zip(results, expected):
+        assert math.isclose(score, score_expected, rel_tol=1e-9), query
+        assert row in rows_allowed
+    scores_by_row = {row: score for score, row in search_exhaustive(index, query, len(rows_allowed), rows_allowed)}
+    for row, score in results:
+        assert math.isclose(scores_by_row[row], score, rel_tol=1e-9), query
+
+
+def random_queries(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [" ".join(rng.sample(WORDS, rng.randint(1, 4))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("k", [1, 3, 10])
+def test_search_matches_exhaustive_single_segment(tmp_path, k):
+    corpus = build_corpus(tmp_path / "corpus", 200, seed=1)
+    index = BM25Index(str(tmp_path / "bm25"), corpus)
+    index.update()
+    for query in random_queries(100, seed=k):
+        assert_same_ranking(index, query, k)
+
+
+@pytest.mark.parametrize("k", [1, 3, 10])
+def test_search_matches_exhaustive_before_and_after_merge(tmp_path, k):
+    corpus = build_corpus(tmp_path / "corpus", 200, seed=2)
+    index = BM25Index(str(tmp_path / "bm25"), corpus)
+    index.update(rows_per_segment=150)
+    assert len(index.segments) > 2
+    queries = random_queries(60, seed=10 + k)
+    for query in queries:
+        assert_same_ranking(index, query, k)
+    index.merge(max_segments=1)
+    assert len(index.segments) == 1
+    for query in queries:
+        assert_same_ranking(index, query, k)
+
+
+def test_search_matches_exhaustive_with_filters(tmp_path):
+    corpus = build_corpus(tmp_path / "corpus", 200, seed=3)
+    index = BM25Index(str(tmp_path / "bm25"), corpus)
+    index.update(rows_per_segment=300)
+    speaker_ids = [corpus.speaker_ids["Mark Rutte"], corpus.speaker_ids["Geert Wilders"]]
+    for query in random_queries(40, seed=4):
+        assert_same_ranking(index, query, 5, speaker_ids=speaker_ids)
+        assert_same_ranking(index, query, 5, date_from=datetime.date(2021, 1, 1), date_to=datetime.date(2022, 6, 30))
+    index.merge(max_segments=1)
+    for query in random_queries(40, seed=5):
+        assert_same_ranking(index, query, 1, speaker_ids=speaker_ids[:1])
@@ -0,0 +1,14 @@
+import os
+
+from dutch_politics.store.bytes_store_disk import BytesStoreDisk
+
+
+def test_stored_files_follow_the_umask(tmp_path):
+    store = BytesStoreDisk("pages", str(tmp_path))
+    umask = os.umask(0o027)
+    try:
+        store.mset([("page", b"content")])
+    finally:
+        os.umask(umask)
+    assert os.stat(tmp_path / "page").st_mode & 0o777 == 0o640
+    assert store.mget(["page"]) == [b"content"]
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from dutch_politics.store.bytes_store_disk import BytesStoreDisk
+from dutch_politics.store.bytes_store_zip import BytesStoreZip, export_store_to_zip
+
+
+def make_disk_store(tmp_path, name, key_value_pairs):
+    store = BytesStoreDisk(name, str(tmp_path / name))
+    store.mset(key_value_pairs)
+    return store
+
+
+def test_exported_archive_reads_back(tmp_path):
+    key_value_pairs = [(f"doc-{i:03d}", f"document {i}".encode() * (i + 1)) for i in range(50)]
+    key_value_pairs += [(f"page-{i:03d}", b"") for i in range(5)]
+    store = make_disk_store(tmp_path, "pages", key_value_pairs)
+    path_file_zip = str(tmp_path / "pages.zip")
+    assert export_store_to_zip(store, path_file_zip, n_partitions=4, batch_size=7) == len(key_value_pairs)
+
+    store_zip = BytesStoreZip("pages", path_file_zip)
+    keys = [key for key, _ in key_value_pairs]
+    assert store_zip.mget([*keys, "missing"]) == [value for _, value in key_value_pairs] + [None]
+    assert store_zip.mexists(["doc-000", "missing"]) == [True, False]
+    assert list(store_zip.yield_keys(prefix="page-")) == [f"page-{i:03d}" for i in range(5)]
+    assert list(store_zip.yield_keys()) == sorted(keys)
+    keys_partitioned = [key for scanner in store_zip.partition_keys(3) for key in scanner]
+    assert sorted(keys_partitioned) == sorted(keys)
+
+
+def test_archive_is_read_only(tmp_path):
+    store = make_disk_store(tmp_path, "pages", [("a", b"1")])
+    export_store_to_zip(store, str(tmp_path / "pages.zip"))
+    store_zip = BytesStoreZip("pages", str(tmp_path / "pages.zip"))
+    with pytest.raises(PermissionError):
+        store_zip.mset([("b", b"2")])
+    with pytest.raises(PermissionError):
+        store_zip.mdelete(["a"])
+
+
+def test_stale_sidecar_index_is_rebuilt(tmp_path):
+    path_file_zip = str(tmp_path / "pages.zip")
+    export_store_to_zip(make_disk_store(tmp_path, "first", [("a", b"1"), ("b", b"2")]), path_file_zip)
+    assert BytesStoreZip("pages", path_file_zip).mget(["a", "c"]) == [b"1", None]
+
+    # the archive is replaced, the sidecar still describes the old one
+    with open(path_file_zip + ".index.json") as f:
+        index_previous = json.load(f)
+    export_store_to_zip(make_disk_store(tmp_path, "second", [("c", b"3" * 100)]), path_file_zip)
+    with open(path_file_zip + ".index.json", "w") as f:
+        json.dump(index_previous, f)
+    store_zip = BytesStoreZip("pages", path_file_zip)
+    assert store_zip.mget(["a", "c"]) == [None, b"3" * 100]
+    assert list(store_zip.yield_keys()) == ["c"]
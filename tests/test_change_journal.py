@@ -0,0 +1,37 @@
+import pytest
+
+from dutch_politics.store.dict_store_disk import DictStoreDisk
+from dutch_politics.store.store_provider_disk import StoreProviderDisk
+
+
+class DictStoreFailing(DictStoreDisk):
+    def mset(self, key_value_pairs):
+        raise OSError("disk full")
+
+
+def test_failed_write_leaves_a_journal_record(tmp_path):
+    store_provider = StoreProviderDisk("test", str(tmp_path))
+    journal = store_provider.get_change_journal("documents")
+    journal.settle_seconds = 0.0
+    store = DictStoreFailing("documents", str(tmp_path / "documents")).with_change_journal(journal)
+    with pytest.raises(OSError):
+        store.mset([("key-1", {"i": 1})])
+    # the record of the failed write replays as a no-op, a lost record would hide a change
+    assert [record.key for record in journal.read_since(0)] == ["key-1"]
+
+
+def test_records_are_held_back_until_settled(tmp_path):
+    store_provider = StoreProviderDisk("test", str(tmp_path))
+    journal = store_provider.get_change_journal("documents")
+    store = store_provider.get_dict_store("documents").with_change_journal(journal)
+    store.mset([("key-1", {"i": 1})])
+    assert journal.read_since(0) == []
+    journal.settle_seconds = 0.0
+    assert [record.key for record in journal.read_since(0)] == ["key-1"]
+
+
+def test_provider_returns_one_journal_per_collection(tmp_path):
+    store_provider = StoreProviderDisk("test", str(tmp_path))
+    journal = store_provider.get_change_journal("documents")
+    assert store_provider.get_change_journal("documents") is journal
+    assert store_provider.get_change_journal("pages") is not journal
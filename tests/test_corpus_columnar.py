@@ -0,0 +1,108 @@
+import datetime
+import os
+
+import numpy as np
+
+from dutch_politics.corpus_columnar import (
+    COLUMN_DTYPES,
+    ColumnarCorpus,
+    ColumnarCorpusWriter,
+    build_columnar_corpus,
+    load_manifest,
+    parse_dutch_date,
+)
+from dutch_politics.model import PoliticalEntry
+from dutch_politics.store.store_provider_disk import StoreProviderDisk
+
+
+def make_entry(i, publication_date, speakers=("Jimmy Dijk", "Mark Rutte")):
+    elements = [
+        {"type": "speaker", "speaker_name": speaker, "speaker_name_title": f"{speaker}:", "text": f"tekst {i} van {speaker}"}
+        for speaker in speakers
+    ]
+    reference = {
+        "title": f"title {i}",
+        "subtitle": "",
+        "content_url_html": f"https://example.org/{i}",
+        "content_url_pdf": "",
+        "publication_date": publication_date,
+    }
+    return PoliticalEntry(reference=reference, entry_elements=elements)
+
+
+def test_parse_dutch_date():
+    assert parse_dutch_date("Dinsdag 12 februari 2025") == datetime.date(2025, 2, 12)
+    assert parse_dutch_date("12-02-2025") == datetime.date(2025, 2, 12)
+    assert parse_dutch_date("2025-02-12") == datetime.date(2025, 2, 12)
+    assert parse_dutch_date("31 februari 2025") is None
+    assert parse_dutch_date("onbekend") is None
+
+
+def test_build_only_adds_new_entries(tmp_path):
+    entry_store = StoreProviderDisk("test", str(tmp_path / "store")).get_object_store("entries", PoliticalEntry)
+    path_dir = str(tmp_path / "columnar")
+    entry_store.mset([(f"key-{i}", make_entry(i, f"{i + 1} mei 2024")) for i in range(3)])
+    assert build_columnar_corpus(entry_store, path_dir, batch_size=2) == 6
+
+    entry_store.mset([(f"key-{i}", make_entry(i, f"{i + 1} mei 2024")) for i in range(3, 5)])
+    assert build_columnar_corpus(entry_store, path_dir) == 4
+    assert build_columnar_corpus(entry_store, path_dir) == 0
+
+    corpus = ColumnarCorpus(path_dir)
+    assert len(corpus) == 10
+    assert sorted(corpus.document_key(document) for document in range(5)) == [f"key-{i}" for i in range(5)]
+    assert corpus.count_by_speaker() == {"Jimmy Dijk": 5, "Mark Rutte": 5}
+    for row in range(len(corpus)):
+        document = int(corpus.columns["element_document"][row])
+        speaker = corpus.speakers[corpus.columns["element_speaker"][row]]
+        assert corpus.text(row) == f"tekst {corpus.document_key(document)[4:]} van {speaker}"
+
+
+def test_interrupted_append_is_rolled_back_to_the_manifest(tmp_path):
+    path_dir = str(tmp_path / "columnar")
+    writer = ColumnarCorpusWriter(path_dir)
+    writer.append([("key-0", make_entry(0, "1 mei 2024"))])
+    manifest = load_manifest(path_dir)
+
+    # an append that died after writing data but before committing the manifest
+    for name in [*(column + ".bin" for column in COLUMN_DTYPES), "text.bin", "documents.jsonl"]:
+        with open(os.path.join(path_dir, name), "ab") as f:
+            f.write(b"\x01partial")
+
+    writer = ColumnarCorpusWriter(path_dir)
+    assert os.path.getsize(os.path.join(path_dir, "text.bin")) == manifest.bytes_text
+    assert os.path.getsize(os.path.join(path_dir, "documents.jsonl")) == manifest.bytes_documents
+    assert writer.document_keys == {"key-0"}
+    writer.append([("key-1", make_entry(1, "2 mei 2024"))])
+
+    corpus = ColumnarCorpus(path_dir)
+    assert len(corpus) == 4
+    assert [corpus.text(row) for row in range(len(corpus))] == [
+        "tekst 0 van Jimmy Dijk",
+        "tekst 0 van Mark Rutte",
+        "tekst 1 van Jimmy Dijk",
+        "tekst 1 van Mark Rutte",
+    ]
+    assert corpus.document_key(1) == "key-1"
+
+
+def test_select_never_matches_unknown_dates_with_a_date_filter(tmp_path):
+    path_dir = str(tmp_path / "columnar")
+    writer = ColumnarCorpusWriter(path_dir)
+    writer.append(
+        [
+            ("key-0", make_entry(0, "1 mei 2024")),
+            ("key-1", make_entry(1, "onbekend")),
+            ("key-2", make_entry(2, "1 januari 1960", speakers=("Mark Rutte",))),
+        ]
+    )
+    corpus = ColumnarCorpus(path_dir)
+    speaker_dijk = corpus.speaker_ids["Jimmy Dijk"]
+    assert list(corpus.select()) == [0, 1, 2, 3, 4]
+    assert list(corpus.select(speaker_ids=[speaker_dijk])) == [0, 2]
+    assert list(corpus.select(date_from=datetime.date(1900, 1, 1))) == [0, 1, 4]
+    assert list(corpus.select(date_to=datetime.date(2100, 1, 1))) == [0, 1, 4]
+    assert list(corpus.select(date_from=datetime.date(2024, 5, 1), date_to=datetime.date(2024, 5, 1))) == [0, 1]
+    assert list(corpus.select(speaker_ids=[speaker_dijk], date_to=datetime.date(2000, 1, 1))) == []
+    assert corpus.count_by_date() == {datetime.date(2024, 5, 1): 2, datetime.date(1960, 1, 1): 1}
+    assert corpus.mask(date_from=datetime.date(1900, 1, 1)).dtype == np.bool_
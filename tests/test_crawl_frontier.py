@@ -0,0 +1,49 @@
+from dutch_politics.crawl_frontier import PRIORITY_LISTING, CrawlFrontier, frontier_key
+from dutch_politics.store.dict_store_disk import DictStoreDisk
+
+
+def make_frontier(tmp_path, **kwargs) -> CrawlFrontier:
+    return CrawlFrontier(DictStoreDisk("crawl_frontier", str(tmp_path / "crawl_frontier")), **kwargs)
+
+
+def test_lease_follows_priority_and_counts_come_from_the_index(tmp_path):
+    frontier = make_frontier(tmp_path, backoff_base_seconds=0.0)
+    frontier.add([f"https://example.org/document/{i}" for i in range(20)])
+    frontier.add(["https://example.org/listing"], PRIORITY_LISTING)
+    entries = frontier.lease(5)
+    assert entries[0].url == "https://example.org/listing"
+    assert frontier.count_by_state() == {"pending": 16, "in_flight": 5, "done": 0, "failed": 0}
+    frontier.complete(entries[0])
+    frontier.fail(entries[1], "timeout")
+    assert frontier.count_by_state() == {"pending": 17, "in_flight": 3, "done": 1, "failed": 0}
+
+    def mget_counting(keys):
+        mget_counting.count += len(keys)
+        return mget(keys)
+
+    mget = frontier.store.mget
+    mget_counting.count = 0
+    frontier.store.mget = mget_counting
+    # the done entry is not read again by the scan
+    assert len(frontier.lease(100)) == 17
+    assert mget_counting.count == 20
+
+
+def test_an_existing_frontier_gets_an_index(tmp_path):
+    frontier = make_frontier(tmp_path)
+    frontier.add(["https://example.org/a", "https://example.org/b"])
+    # a frontier written before the index existed
+    for key in list(frontier.store.yield_keys(prefix="state-")):
+        frontier.store.mdelete([key])
+    frontier_reopened = make_frontier(tmp_path)
+    assert frontier_reopened.count_by_state()["pending"] == 2
+    assert {entry.url for entry in frontier_reopened.lease(2)} == {"https://example.org/a", "https://example.org/b"}
+
+
+def test_expired_lease_is_found_through_a_leftover_index_key(tmp_path):
+    frontier = make_frontier(tmp_path, lease_seconds=-1.0)
+    frontier.add(["https://example.org/a"])
+    entry_dict = frontier.store.mget([frontier_key("https://example.org/a")])[0]
+    # the worker leased the url and died before it moved the index key
+    frontier.store.mset([(frontier_key("https://example.org/a"), {**entry_dict, "state": "in_flight", "lease_expires_at": 0.0})])
+    assert [entry.url for entry in frontier.lease(1)] == ["https://example.org/a"]
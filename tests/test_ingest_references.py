@@ -0,0 +1,78 @@
+from pathlib import Path
+
+import pytest
+
+# the scraper module needs boto3 for its S3 store provider
+pytest.importorskip("boto3")
+
+from dutch_politics.http_scraper_ob import (  # noqa: E402
+    EntryReference,
+    entry_id_from_reference,
+    ingest_references,
+    url_hash_from_url,
+)
+from dutch_politics.store.bytes_store_disk import BytesStoreDisk  # noqa: E402
+from dutch_politics.store.dict_store_disk import DictStoreDisk  # noqa: E402
+
+PATH_DOCUMENT = Path(__file__).parent / "fixtures" / "parse_fast" / "document.html"
+
+
+class FakeCrawlEngine:
+    def __init__(self):
+        self.urls = []
+
+    def fetch(self, url, etag=None, last_modified=None):
+        self.urls.append(url)
+        raise ConnectionError(f"No route to {url}")
+
+
+class EntryStoreList:
+    def __init__(self):
+        self.key_value_pairs = []
+
+    def mset(self, key_value_pairs):
+        self.key_value_pairs.extend(key_value_pairs)
+
+
+def make_reference(i):
+    return EntryReference(
+        title=f"Handelingen {i}",
+        subtitle="",
+        content_url_html=f"https://zoek.officielebekendmakingen.nl/h-tk-20232024-{i}-1.html",
+        content_url_pdf="",
+        publication_date="1 mei 2024",
+    )
+
+
+def test_ingest_writes_parsed_pages_and_records_failures(tmp_path):
+    html_store = BytesStoreDisk("html_cache", str(tmp_path / "html_cache"))
+    failure_store = DictStoreDisk("failures", str(tmp_path / "failures"))
+    references = [make_reference(i) for i in range(6)]
+    # pages 0-2 are cached documents, 3 is cached without a broodtekst and 4-5 are not cached
+    document_bytes = PATH_DOCUMENT.read_bytes()
+    html_store.mset([(url_hash_from_url(reference.content_url_html), document_bytes) for reference in references[:3]])
+    html_store.mset([(url_hash_from_url(references[3].content_url_html), b"<html><body></body></html>")])
+    crawl_engine = FakeCrawlEngine()
+    entry_store = EntryStoreList()
+
+    metrics = ingest_references(
+        html_store,
+        references,
+        entry_store,
+        crawl_engine=crawl_engine,
+        fetch_workers=2,
+        parse_workers=1,
+        batch_size=2,
+        failure_store=failure_store,
+    )
+
+    assert sorted(crawl_engine.urls) == [reference.content_url_html for reference in references[4:]]
+    assert sorted(key for key, _ in entry_store.key_value_pairs) == [entry_id_from_reference(reference) for reference in references[:3]]
+    assert all(entry_content.reference.title for _, entry_content in entry_store.key_value_pairs)
+    failures = dict(zip(failure_store.yield_keys(), failure_store.mget(list(failure_store.yield_keys()))))
+    assert sorted(failures) == [entry_id_from_reference(reference) for reference in references[3:]]
+    assert "parser_version" in failures[entry_id_from_reference(references[3])]
+    assert "ConnectionError" in failures[entry_id_from_reference(references[5])]["error"]
+    assert metrics["fetch"].count_dropped == 2
+    assert metrics["parse"].count_out == 4
+    assert metrics["write"].count_out == 4
@@ -0,0 +1,96 @@
+from dutch_politics.store.bytes_store_disk import BytesStoreDisk
+from dutch_politics.store.key_filter_bloom import KeyFilterBloom, KeyFilterBloomPersisted
+
+
+def make_stores(tmp_path):
+    return BytesStoreDisk("html_cache", str(tmp_path / "html_cache")), BytesStoreDisk("key_filter", str(tmp_path / "key_filter"))
+
+
+def test_bloom_has_no_false_negatives():
+    key_filter = KeyFilterBloom(1000)
+    keys = [f"key-{i}" for i in range(1000)]
+    key_filter.madd(keys)
+    assert all(key_filter.mfilter(keys))
+    assert KeyFilterBloom.from_bytes(key_filter.to_bytes()).mfilter(keys) == [True] * len(keys)
+
+
+class CountingStore:
+    """Wraps a store and counts the calls made to it."""
+
+    def __init__(self, store):
+        self.store = store
+        self.count_calls = 0
+
+    def __getattr__(self, name):
+        attribute = getattr(self.store, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            self.count_calls += 1
+            return attribute(*args, **kwargs)
+
+        return call
+
+
+def test_misses_and_adds_are_answered_from_memory_between_syncs(tmp_path):
+    store, filter_store = make_stores(tmp_path)
+    store.mset([("present", b"1")])
+    filter_store = CountingStore(filter_store)
+    key_filter = KeyFilterBloomPersisted(store, filter_store, sync_interval_seconds=60.0)
+    filter_store.count_calls = 0
+    assert key_filter.mfilter(["present", "absent"]) == [True, False]
+    key_filter.madd(["added"])
+    assert key_filter.mfilter(["added", "absent"]) == [True, False]
+    assert filter_store.count_calls == 0
+
+    # the keys added since the last sync are written as one delta
+    assert key_filter.sync()
+    assert filter_store.count_calls > 0
+    assert KeyFilterBloomPersisted(store, filter_store).mfilter(["added"]) == [True]
+
+
+def test_keys_of_other_processes_are_seen_after_the_interval(tmp_path):
+    store, filter_store = make_stores(tmp_path)
+    filter_first = KeyFilterBloomPersisted(store, filter_store, sync_interval_seconds=60.0)
+    filter_second = KeyFilterBloomPersisted(store, filter_store, sync_interval_seconds=60.0)
+    filter_first.madd(["written-elsewhere"])
+    filter_first.sync()
+    assert filter_second.mfilter(["written-elsewhere"]) == [False]
+    filter_second.sync_interval_seconds = 0.0
+    assert filter_second.mfilter(["written-elsewhere"]) == [True]
+
+
+def test_keys_of_other_processes_are_never_rejected(tmp_path):
+    store, filter_store = make_stores(tmp_path)
+    store.mset([("present", b"1")])
+    filter_first = KeyFilterBloomPersisted(store, filter_store, sync_interval_seconds=0.0)
+    filter_second = KeyFilterBloomPersisted(store, filter_store, sync_interval_seconds=0.0)
+    assert filter_second.mfilter(["present", "absent"]) == [True, False]
+
+    # the first process adds a key and writes it, the second one must not answer a miss
+    filter_first.madd(["written-elsewhere"])
+    store.mset([("written-elsewhere", b"2")])
+    assert filter_second.mfilter(["written-elsewhere"]) == [True]
+
+
+def test_keys_survive_a_crash_before_the_snapshot(tmp_path):
+    store, filter_store = make_stores(tmp_path)
+    key_filter = KeyFilterBloomPersisted(store, filter_store, save_every=1000, sync_interval_seconds=0.0)
+    key_filter.madd(["written-before-crash"])
+    store.mset([("written-before-crash", b"1")])
+    # the process dies without saving the snapshot
+    del key_filter
+    assert KeyFilterBloomPersisted(store, filter_store).mfilter(["written-before-crash"]) == [True]
+
+
+def test_compacted_deltas_are_picked_up_from_the_snapshot(tmp_path):
+    store, filter_store = make_stores(tmp_path)
+    filter_writer = KeyFilterBloomPersisted(store, filter_store, sync_interval_seconds=0.0, delta_retention_seconds=0.0)
+    filter_reader = KeyFilterBloomPersisted(store, filter_store, sync_interval_seconds=0.0, delta_retention_seconds=0.0)
+    keys = [f"key-{i}" for i in range(20)]
+    for key in keys:
+        filter_writer.madd([key])
+    filter_writer.save()
+    assert [key for key in filter_store.yield_keys() if "delta-" in key and not key.endswith("-snapshot")] == []
+    assert filter_reader.mfilter(keys) == [True] * len(keys)
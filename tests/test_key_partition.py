@@ -0,0 +1,114 @@
+import hashlib
+from collections import Counter
+
+import pytest
+
+from dutch_politics.store.bytes_store_disk import BytesStoreDisk
+from dutch_politics.store.dict_store_memory import DictStoreMemory
+from dutch_politics.store.key_partition import KeyRange, boundaries_from_alphabet, key_ranges_from_boundaries
+
+KEYS = [f"doc-{i:04d}" for i in range(300)] + [f"page-{i}" for i in range(40)] + ["a", "z", "0"]
+
+
+def assert_covered_once(scanners, keys_expected):
+    counts = Counter(key for scanner in scanners for key in scanner)
+    assert sorted(counts) == sorted(keys_expected)
+    assert set(counts.values()) == {1}
+
+
+@pytest.mark.parametrize("n", [1, 2, 7, 16, 500])
+def test_disk_partitions_cover_every_key_once(tmp_path, n):
+    store = BytesStoreDisk("pages", str(tmp_path))
+    store.mset([(key, b"") for key in KEYS])
+    assert_covered_once(store.partition_keys(n), KEYS)
+    assert_covered_once(store.partition_keys(n, prefix="page-"), [key for key in KEYS if key.startswith("page-")])
+
+
+@pytest.mark.parametrize("n", [1, 2, 7, 16, 500])
+def test_sqlite_partitions_cover_every_key_once(tmp_path, n):
+    # the sqlite store takes its key error from langchain
+    pytest.importorskip("langchain")
+    from dutch_politics.store.bytes_store_sqlite import BytesStoreSqlite
+
+    store = BytesStoreSqlite("pages", str(tmp_path / "store.db"))
+    store.mset([(key, b"") for key in KEYS])
+    assert_covered_once(store.partition_keys(n), KEYS)
+    assert_covered_once(store.partition_keys(n, prefix="doc-"), [key for key in KEYS if key.startswith("doc-")])
+
+
+@pytest.mark.parametrize("n", [1, 3, 16])
+def test_memory_partitions_cover_every_key_once(n):
+    store = DictStoreMemory("documents")
+    store.mset([(key, {}) for key in KEYS])
+    assert_covered_once(store.partition_keys(n), KEYS)
+
+
+def test_ranges_from_boundaries_cover_the_key_space():
+    key_ranges = key_ranges_from_boundaries(["m", "b", "m", "\x00", "b\x00"])
+    for key in ["", "\x00", "\x00\x00", "a", "b", "b\x00", "b\x00\x00", "c", "m", "\uffff"]:
+        assert sum(key_range.contains(key) for key_range in key_ranges) == 1
+
+
+class FakeS3Paginator:
+    """Pages through a sorted key listing like list_objects_v2, honouring Prefix and StartAfter."""
+
+    def __init__(self, keys, page_size):
+        # S3 lists keys in the order of their utf-8 bytes
+        self.keys = sorted(keys, key=lambda key: key.encode("utf-8"))
+        self.page_size = page_size
+
+    def paginate(self, Bucket, Prefix="", StartAfter=None):
+        keys = [key for key in self.keys if key.startswith(Prefix)]
+        if StartAfter is not None:
+            keys = [key for key in keys if key.encode("utf-8") > StartAfter.encode("utf-8")]
+        for i in range(0, len(keys), self.page_size):
+            yield {"Contents": [{"Key": key} for key in keys[i : i + self.page_size]]}
+
+
+class FakeS3Client:
+    def __init__(self, keys, page_size=50):
+        self.paginator = FakeS3Paginator(keys, page_size)
+
+    def get_paginator(self, name):
+        assert name == "list_objects_v2"
+        return self.paginator
+
+
+@pytest.fixture
+def make_s3_store():
+    # the s3 store needs botocore for its error type
+    pytest.importorskip("botocore")
+    from dutch_politics.store.bytes_store_s3 import BytesStoreS3
+
+    def make(keys, page_size=50):
+        keys_other = ["other/" + key for key in keys[:10]]
+        return BytesStoreS3("pages", FakeS3Client(["pages/" + key for key in keys] + keys_other, page_size), "bucket")
+
+    return make
+
+
+@pytest.mark.parametrize("n", [1, 2, 16, 300])
+def test_s3_partitions_cover_every_key_once(make_s3_store, n):
+    keys = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(500)]
+    store = make_s3_store(keys)
+    assert_covered_once(store.partition_keys(n), keys)
+
+
+def test_s3_ranges_starting_at_edge_characters(make_s3_store):
+    keys = ["a", "a\x00", "a\x00\x00", "a\x00b", "a\x01", "b", "x", "\ud7ff", "\ue000", "\ue000x", "\uffff", "\U0001f600"]
+    store = make_s3_store(keys, page_size=3)
+    for boundaries in [["a\x00"], ["a\x00\x00", "a\x01"], ["\x00"], ["\ue000"], ["\U0001f600"], ["a", "b", "\uffff"]]:
+        key_ranges = key_ranges_from_boundaries(boundaries)
+        counts = Counter(key for key_range in key_ranges for key in store.yield_keys_range(key_range))
+        assert sorted(counts) == sorted(keys)
+        assert set(counts.values()) == {1}
+    assert list(store.yield_keys_range(KeyRange(start="a\x00", end="a\x01"))) == ["a\x00", "a\x00\x00", "a\x00b"]
+
+
+def test_s3_alphabet_boundaries_split_hex_keys(make_s3_store):
+    keys = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(200)]
+    store = make_s3_store(keys)
+    key_ranges = key_ranges_from_boundaries(boundaries_from_alphabet(16))
+    assert [len(list(store.yield_keys_range(key_range))) for key_range in key_ranges] == [
+        sum(key[0] == character for key in keys) for character in "0123456789abcdef"
+    ]
@@ -0,0 +1,56 @@
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+from bs4 import BeautifulSoup
+
+# the scraper module needs boto3 for its S3 store provider
+pytest.importorskip("boto3")
+
+from dutch_politics.http_scraper_ob import (  # noqa: E402
+    EntryReference,
+    parse_page_content_html,
+    parse_page_content_soup,
+    parse_search_results_html,
+    parse_search_results_soup,
+)
+
+PATH_FIXTURES = Path(__file__).parent / "fixtures" / "parse_fast"
+REFERENCE_EMPTY = EntryReference(title="", subtitle="", content_url_html="", content_url_pdf="", publication_date="")
+FEATURES = ["html.parser", pytest.param("lxml", marks=pytest.mark.skipif(not importlib.util.find_spec("lxml"), reason="needs lxml"))]
+
+
+def read_fixture(name):
+    return (PATH_FIXTURES / name).read_text(encoding="utf-8")
+
+
+def dump_listing(result):
+    references, total_entries, has_next = result
+    return [[reference.model_dump() for reference in references], total_entries, has_next]
+
+
+@pytest.mark.parametrize("features", FEATURES)
+@pytest.mark.parametrize("name", ["listing.html", "listing_single_quotes.html"])
+def test_listing_fast_path_matches_golden(name, features):
+    output = dump_listing(parse_search_results_html(read_fixture(name), features))
+    assert output == json.loads(read_fixture("listing.json"))
+
+
+@pytest.mark.parametrize("features", FEATURES)
+def test_document_fast_path_matches_golden(features):
+    entry_content = parse_page_content_html(read_fixture("document.html"), REFERENCE_EMPTY, features)
+    assert entry_content.model_dump() == json.loads(read_fixture("document.json"))
+
+
+@pytest.mark.parametrize("name", ["listing.html", "listing_single_quotes.html"])
+def test_listing_fast_path_matches_full_tree(name):
+    content_str = read_fixture(name)
+    output_full_tree = dump_listing(parse_search_results_soup(BeautifulSoup(content_str, "html.parser")))
+    assert dump_listing(parse_search_results_html(content_str)) == output_full_tree
+
+
+def test_document_fast_path_matches_full_tree():
+    content_str = read_fixture("document.html")
+    entry_content = parse_page_content_soup(BeautifulSoup(content_str, "html.parser"), REFERENCE_EMPTY)
+    assert parse_page_content_html(content_str, REFERENCE_EMPTY) == entry_content
@@ -0,0 +1,34 @@
+from pydantic import BaseModel
+
+from dutch_politics.store.bytes_store_disk import BytesStoreDisk
+from dutch_politics.store.segment_log import SegmentLog
+
+
+class Item(BaseModel):
+    number: int
+
+
+def items(start: int, count: int) -> list:
+    return [Item(number=number) for number in range(start, start + count)]
+
+
+def test_compact_merges_small_segments_and_keeps_the_order(tmp_path):
+    store = BytesStoreDisk("index_store", str(tmp_path))
+    segment_log = SegmentLog(store, "index", Item)
+    segment_log.write([items(0, 10), items(10, 10)])
+    # updates insert a few items at a time at the front
+    for update in range(12):
+        segment_log.insert_segments([(0, items(-3 * (update + 1), 3))])
+    numbers = [item.number for item in segment_log.yield_items()]
+    assert len(segment_log.load_manifest().segment_ids) == 14
+
+    assert segment_log.compact(10, max_segments_small=4) > 0
+    manifest = segment_log.load_manifest()
+    assert [item.number for item in segment_log.yield_items()] == numbers
+    assert manifest.count_items == len(numbers)
+    assert all(count <= 10 for count in manifest.segment_counts)
+    assert len(manifest.segment_ids) <= 6
+    # the replaced segments are gone, the full segments were not rewritten
+    assert sorted(store.yield_keys()) == sorted([*manifest.segment_ids, segment_log.manifest_key])
+    assert "index.segment-000001.jsonl" in manifest.segment_ids
+    assert segment_log.compact(10, max_segments_small=4) == 0
@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from dutch_politics.store.single_flight import SingleFlight
+
+
+def wait_for_followers():
+    # the followers claim their keys while the leader is still blocked
+    time.sleep(0.2)
+
+
+def make_blocking_fetch(keys_fetched, started, release):
+    def fetch(keys):
+        keys_fetched.append(list(keys))
+        started.set()
+        assert release.wait(5)
+        return [f"value-{key}" for key in keys]
+
+    return fetch
+
+
+def test_thread_followers_share_the_leader_fetch():
+    single_flight = SingleFlight()
+    keys_fetched = []
+    started, release = threading.Event(), threading.Event()
+    fetch = make_blocking_fetch(keys_fetched, started, release)
+    with ThreadPoolExecutor(4) as executor:
+        leader = executor.submit(single_flight.mget, ["a", "b"], fetch)
+        assert started.wait(5)
+        followers = [executor.submit(single_flight.mget, ["a", "b"], fetch) for _ in range(3)]
+        wait_for_followers()
+        release.set()
+        assert leader.result(5) == ["value-a", "value-b"]
+        assert [follower.result(5) for follower in followers] == [["value-a", "value-b"]] * 3
+    assert keys_fetched == [["a", "b"]]
+
+
+def test_overlapping_batches_only_fetch_the_new_keys():
+    single_flight = SingleFlight()
+    keys_fetched = []
+    started, release = threading.Event(), threading.Event()
+    fetch = make_blocking_fetch(keys_fetched, started, release)
+    with ThreadPoolExecutor(2) as executor:
+        leader = executor.submit(single_flight.mget, ["a", "b"], fetch)
+        assert started.wait(5)
+        follower = executor.submit(single_flight.mget, ["b", "c", "c"], fetch)
+        wait_for_followers()
+        release.set()
+        assert follower.result(5) == ["value-b", "value-c", "value-c"]
+        assert leader.result(5) == ["value-a", "value-b"]
+    assert keys_fetched[0] == ["a", "b"]
+    assert ["c"] in keys_fetched
+    assert all("a" not in keys for keys in keys_fetched[1:])
+
+
+def test_asyncio_followers_share_the_leader_fetch():
+    single_flight = SingleFlight()
+    keys_fetched = []
+    started, release = threading.Event(), threading.Event()
+    fetch = make_blocking_fetch(keys_fetched, started, release)
+
+    async def run():
+        leader = asyncio.ensure_future(single_flight.amget(["a"], fetch))
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        followers = [asyncio.ensure_future(single_flight.amget(["a"], fetch)) for _ in range(3)]
+        await asyncio.sleep(0.2)
+        release.set()
+        return await asyncio.wait_for(asyncio.gather(leader, *followers), 5)
+
+    assert asyncio.run(run()) == [["value-a"]] * 4
+    assert keys_fetched == [["a"]]
+
+
+def test_leader_exception_reaches_the_followers():
+    single_flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fetch(keys):
+        started.set()
+        assert release.wait(5)
+        raise ConnectionError("backend down")
+
+    with ThreadPoolExecutor(2) as executor:
+        leader = executor.submit(single_flight.mget, ["a"], fetch)
+        assert started.wait(5)
+        follower = executor.submit(single_flight.mget, ["a"], fetch)
+        wait_for_followers()
+        release.set()
+        with pytest.raises(ConnectionError):
+            leader.result(5)
+        with pytest.raises(ConnectionError):
+            follower.result(5)
+    # the failed keys are no longer in flight, the next caller fetches again
+    assert single_flight.mget(["a"], lambda keys: ["value-a"]) == ["value-a"]
+
+
+def test_short_fetch_result_fails_instead_of_hanging():
+    single_flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fetch(keys):
+        started.set()
+        assert release.wait(5)
+        return ["value-a"]
+
+    with ThreadPoolExecutor(2) as executor:
+        leader = executor.submit(single_flight.mget, ["a", "b"], fetch)
+        assert started.wait(5)
+        follower = executor.submit(single_flight.mget, ["b"], fetch)
+        wait_for_followers()
+        release.set()
+        with pytest.raises(ValueError):
+            leader.result(5)
+        with pytest.raises(ValueError):
+            follower.result(5)
@@ -0,0 +1,93 @@
+import pytest
+
+from dutch_politics.corpus_columnar import ColumnarCorpus, ColumnarCorpusWriter
+from dutch_politics.model import PoliticalEntry
+from dutch_politics.speaker_gazetteer import SpeakerGazetteer, SpeakerRecord, normalize_name, parse_speaker_title
+
+YESILGOZ = "Dilan Yeşilgöz-Zegerius"
+
+
+@pytest.mark.parametrize(
+    "speaker_name_title, expected",
+    [
+        ("De heer Dijk (SP):", ("de heer", "Dijk", "SP")),
+        ("Minister-president Rutte:", ("minister-president", "Rutte", None)),
+        ("Mevrouw Yeşilgöz-Zegerius (VVD):", ("mevrouw", "Yeşilgöz-Zegerius", "VVD")),
+        ("De voorzitter:", ("de voorzitter", "", None)),
+        ("Omtzigt (NSC):", (None, "Omtzigt", "NSC")),
+        # folding drops the combining marks, the name must still be cut after the role
+        ("Me\u0301\u0300vrouw Dijk (SP):", ("mevrouw", "Dijk", "SP")),
+        ("MİNİSTER Yılmaz:", ("minister", "Yılmaz", None)),
+        ("Staatssecretaris Ĳsselmuiden:", ("staatssecretaris", "Ĳsselmuiden", None)),
+    ],
+)
+def test_parse_speaker_title(speaker_name_title, expected):
+    assert parse_speaker_title(speaker_name_title) == expected
+
+
+def test_normalize_name_folds_diacritics_roles_and_parties():
+    assert normalize_name("Mevrouw Yeşilgöz-Zegerius (VVD)") == "yesilgoz-zegerius"
+    assert normalize_name("minister Yeşilgöz") == "yesilgoz"
+
+
+def make_corpus(tmp_path):
+    turns = [
+        (YESILGOZ, "Mevrouw Yeşilgöz-Zegerius (VVD):"),
+        (YESILGOZ, "Minister Yeşilgöz-Zegerius:"),
+        ("Jimmy Dijk", "De heer Dijk (SP):"),
+        ("Jimmy Dijk", "De heer Dijk (SP):"),
+        ("Jimmy Dijk", "De heer Dijk (SP):"),
+        ("Inge van Dijk", "Mevrouw Inge van Dijk (CDA):"),
+        ("Mark Rutte", "Minister-president Rutte:"),
+    ]
+    elements = [
+        {"type": "speaker", "speaker_name": speaker_name, "speaker_name_title": speaker_name_title, "text": "tekst"}
+        for speaker_name, speaker_name_title in turns
+    ]
+    reference = {"title": "", "subtitle": "", "content_url_html": "", "content_url_pdf": "", "publication_date": "1 mei 2024"}
+    writer = ColumnarCorpusWriter(str(tmp_path))
+    writer.append([("key-0", PoliticalEntry(reference=reference, entry_elements=elements))])
+    return ColumnarCorpus(str(tmp_path))
+
+
+def test_build_collects_roles_parties_and_aliases(tmp_path):
+    gazetteer = SpeakerGazetteer.build(make_corpus(tmp_path))
+    record = gazetteer.records["dilan-yesilgoz-zegerius"]
+    assert record.name == YESILGOZ
+    assert record.party == "VVD"
+    assert sorted(record.roles) == ["mevrouw", "minister"]
+    assert record.aliases == ["dilan yesilgoz-zegerius", "yesilgoz-zegerius"]
+    assert record.count_turns == 2
+    assert gazetteer.records["jimmy-dijk"].party == "SP"
+
+
+def test_lookup_ignores_diacritics_and_roles(tmp_path):
+    gazetteer = SpeakerGazetteer.build(make_corpus(tmp_path))
+    for name in ["Dilan Yesilgoz-Zegerius", "minister Yeşilgöz-Zegerius", "YESILGOZ-ZEGERIUS (VVD)"]:
+        matches = gazetteer.lookup(name)
+        assert matches[0].speaker_id == "dilan-yesilgoz-zegerius"
+        assert matches[0].score == 1.0
+    # a misspelled name is matched by trigrams and edit distance
+    assert gazetteer.lookup("Dilan Yesilgos")[0].speaker_id == "dilan-yesilgoz-zegerius"
+    assert gazetteer.lookup("Wilders") == []
+
+
+def test_ambiguous_surname_returns_every_speaker_most_turns_first():
+    gazetteer = SpeakerGazetteer(
+        [
+            SpeakerRecord(speaker_id="inge-van-dijk", name="Inge van Dijk", aliases=["inge van dijk", "dijk"], count_turns=3),
+            SpeakerRecord(speaker_id="jimmy-dijk", name="Jimmy Dijk", aliases=["jimmy dijk", "dijk"], count_turns=10),
+        ]
+    )
+    matches = gazetteer.lookup("Dijk")
+    assert [match.speaker_id for match in matches] == ["jimmy-dijk", "inge-van-dijk"]
+    assert [match.score for match in matches] == [1.0, 1.0]
+    assert [match.speaker_id for match in gazetteer.lookup("Inge van Dijk")] == ["inge-van-dijk"]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    gazetteer = SpeakerGazetteer.build(make_corpus(tmp_path / "corpus"))
+    gazetteer.save(str(tmp_path / "gazetteer.json"))
+    loaded = SpeakerGazetteer.load(str(tmp_path / "gazetteer.json"))
+    assert loaded.records == gazetteer.records
+    assert loaded.lookup("Rutte")[0].speaker_id == "mark-rutte"
@@ -0,0 +1,128 @@
+import threading
+import time
+
+import pytest
+
+from dutch_politics.stage_pipeline import PipelineStage, StagePipeline
+
+
+def run_in_thread(pipeline, items):
+    outcome = {}
+
+    def run():
+        try:
+            outcome["metrics"] = pipeline.run(items)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+def test_items_are_written_in_batches_and_counted():
+    batches, updates = [], []
+    pipeline = StagePipeline(
+        [
+            PipelineStage("square", lambda x: x * x, workers=3),
+            PipelineStage("odd", lambda x: x if x % 2 else None, workers=2),
+        ],
+        sink=batches.append,
+        batch_size=10,
+        progress=updates.append,
+    )
+    metrics = pipeline.run(range(100))
+    assert sorted(x for batch in batches for x in batch) == [x * x for x in range(100) if x % 2]
+    assert all(len(batch) <= 10 for batch in batches)
+    # dropped items count toward the progress as well
+    assert sum(updates) == 100
+    assert metrics["square"].count_out == 100
+    assert metrics["odd"].count_dropped == 50
+    assert metrics["write"].count_out == 50
+
+
+def test_slow_sink_holds_back_the_stages_before_it():
+    release = threading.Event()
+    pulled = []
+
+    def items():
+        for i in range(1000):
+            pulled.append(i)
+            yield i
+
+    def sink(batch):
+        assert release.wait(10)
+
+    pipeline = StagePipeline(
+        [PipelineStage("a", lambda x: x, queue_size=2), PipelineStage("b", lambda x: x, queue_size=2)],
+        sink=sink,
+        batch_size=1,
+    )
+    thread, outcome = run_in_thread(pipeline, items())
+    time.sleep(0.5)
+    # one item in the sink, two in the writer queue, one held by each worker, two in each stage
+    # queue and one waiting to be put
+    assert len(pulled) <= 10
+    assert pipeline.metrics["a"].count_in <= 7
+    release.set()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert outcome["metrics"]["write"].count_out == 1000
+    assert len(pulled) == 1000
+
+
+def test_stage_error_is_raised_by_run():
+    def fail_on_seven(x):
+        if x == 7:
+            raise KeyError(x)
+        return x
+
+    pipeline = StagePipeline([PipelineStage("check", fail_on_seven, workers=2)], sink=lambda batch: None)
+    with pytest.raises(KeyError):
+        pipeline.run(range(100))
+
+
+def test_sink_error_is_raised_by_run():
+    def sink(batch):
+        raise OSError("disk full")
+
+    pipeline = StagePipeline([PipelineStage("copy", lambda x: x)], sink=sink, batch_size=5)
+    with pytest.raises(OSError, match="disk full"):
+        pipeline.run(range(100))
+
+
+def test_failed_stage_stops_the_pipeline():
+    pulled = []
+
+    def items():
+        # an endless source, the run only ends because a stage failed
+        i = 0
+        while True:
+            pulled.append(i)
+            yield i
+            i += 1
+
+    def fail_on_fifty(x):
+        if x == 50:
+            raise ValueError("bad item")
+        return x
+
+    def sink(batch):
+        time.sleep(0.01)
+
+    pipeline = StagePipeline(
+        [PipelineStage("slow", lambda x: x, workers=2, queue_size=4), PipelineStage("check", fail_on_fifty, queue_size=4)],
+        sink=sink,
+        batch_size=4,
+    )
+    threads_before = threading.active_count()
+    thread, outcome = run_in_thread(pipeline, items())
+    thread.join(10)
+    assert not thread.is_alive()
+    assert isinstance(outcome["error"], ValueError)
+    # the run joined its workers and the writer before raising
+    assert threading.active_count() == threads_before
+    assert pipeline.metrics["check"].count_out < 100
+    count_pulled = len(pulled)
+    time.sleep(0.3)
+    assert len(pulled) == count_pulled
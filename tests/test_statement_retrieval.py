@@ -0,0 +1,144 @@
+import math
+import random
+from collections import Counter
+
+from dutch_politics.bm25_index import B, K1, BM25Index
+from dutch_politics.corpus_columnar import ColumnarCorpus, ColumnarCorpusWriter
+from dutch_politics.model import PoliticalEntry, StatementQuery
+from dutch_politics.speaker_gazetteer import SpeakerGazetteer
+from dutch_politics.statement_retrieval import StatementRetriever
+from dutch_politics.text_dutch import tokenize_dutch
+
+WORDS = "stikstof boeren woningbouw huurprijzen asielzoekers opvang gemeenten klimaat energie zorg".split()
+SPEAKERS = [
+    ("Mark Rutte", "Minister-president Rutte:"),
+    ("Jimmy Dijk", "De heer Dijk (SP):"),
+    ("Dilan Yeşilgöz-Zegerius", "Mevrouw Yeşilgöz-Zegerius (VVD):"),
+]
+
+
+def append_entries(writer: ColumnarCorpusWriter, key_start: int, count: int, seed: int) -> None:
+    rng = random.Random(seed)
+    entries = []
+    for i in range(key_start, key_start + count):
+        elements = []
+        for _ in range(10):
+            speaker_name, speaker_name_title = rng.choice(SPEAKERS)
+            text = " ".join(rng.choices(WORDS, k=rng.randint(1, 30)))
+            elements.append({"type": "speaker", "speaker_name": speaker_name, "speaker_name_title": speaker_name_title, "text": text})
+        reference = {
+            "title": f"title {i}",
+            "subtitle": "",
+            "content_url_html": f"https://example.org/{i}",
+            "content_url_pdf": "",
+            "publication_date": f"{1 + i % 28} mei 2024",
+        }
+        entries.append((f"key-{i}", PoliticalEntry(reference=reference, entry_elements=elements)))
+    writer.append(entries)
+
+
+def scores_exhaustive(bm25_index: BM25Index, query: str, speaker_name: str) -> list:
+    corpus = bm25_index.corpus
+    terms = set(tokenize_dutch(query))
+    average_length = bm25_index.average_length
+    scores = []
+    for row in corpus.select(speaker_ids=[corpus.speaker_ids[speaker_name]]):
+        tokens = tokenize_dutch(corpus.text(int(row)))
+        tfs = Counter(token for token in tokens if token in terms)
+        score = sum(
+            bm25_index._idf(term) * tf * (K1 + 1) / (tf + K1 * (1 - B + B * len(tokens) / average_length))
+            for term, tf in tfs.items()
+        )
+        if score > 0:
+            scores.append(score)
+    return sorted(scores, reverse=True)
+
+
+def test_retrieve_matches_exhaustive_ranking(tmp_path):
+    writer = ColumnarCorpusWriter(str(tmp_path / "corpus"))
+    append_entries(writer, 0, 200, seed=4)
+    corpus = ColumnarCorpus(str(tmp_path / "corpus"))
+    bm25_index = BM25Index(str(tmp_path / "bm25"), corpus)
+    bm25_index.update()
+    retriever = StatementRetriever(corpus, bm25_index, SpeakerGazetteer.build(corpus))
+    rng = random.Random(5)
+    for _ in range(100):
+        query = " ".join(rng.sample(WORDS, rng.randint(1, 3)))
+        for k in (1, 3):
+            result = retriever.retrieve(StatementQuery(politician_name="Dijk", statement_description=query), k=k)
+            expected = scores_exhaustive(bm25_index, query, "Jimmy Dijk")[:k]
+            assert len(result.passages) == len(expected), query
+            for passage, score in zip(result.passages, expected):
+                assert math.isclose(passage.score, score, rel_tol=1e-9), query
+
+
+def test_retrieve_returns_k_passages_of_the_speaker(tmp_path):
+    writer = ColumnarCorpusWriter(str(tmp_path / "corpus"))
+    append_entries(writer, 0, 100, seed=1)
+    corpus = ColumnarCorpus(str(tmp_path / "corpus"))
+    bm25_index = BM25Index(str(tmp_path / "bm25"), corpus)
+    bm25_index.update(rows_per_segment=300)
+    retriever = StatementRetriever(corpus, bm25_index, SpeakerGazetteer.build(corpus))
+    for query_words in ["stikstof", "boeren stikstof", "huurprijzen woningbouw opvang"]:
+        result = retriever.retrieve(StatementQuery(politician_name="premier Rutte", statement_description=query_words), k=5)
+        assert [speaker.speaker_id for speaker in result.speakers] == ["mark-rutte"]
+        assert len(result.passages) == 5
+        assert all(passage.speaker_name == "Mark Rutte" for passage in result.passages)
+        scores = [passage.score for passage in result.passages]
+        assert scores == sorted(scores, reverse=True)
+        assert result.passages[0].reference.content_url_html.startswith("https://example.org/")
+
+
+def test_retrieve_unknown_politician_has_no_passages(tmp_path):
+    writer = ColumnarCorpusWriter(str(tmp_path / "corpus"))
+    append_entries(writer, 0, 10, seed=2)
+    corpus = ColumnarCorpus(str(tmp_path / "corpus"))
+    bm25_index = BM25Index(str(tmp_path / "bm25"), corpus)
+    bm25_index.update()
+    retriever = StatementRetriever(corpus, bm25_index, SpeakerGazetteer.build(corpus))
+    result = retriever.retrieve(StatementQuery(politician_name="Xyzzy Qwerty", statement_description="stikstof"))
+    assert result.speakers == []
+    assert result.passages == []
+
+
+def test_retrieve_cache_is_cleared_when_the_index_changes(tmp_path):
+    writer = ColumnarCorpusWriter(str(tmp_path / "corpus"))
+    append_entries(writer, 0, 20, seed=3)
+    corpus = ColumnarCorpus(str(tmp_path / "corpus"))
+    bm25_index = BM25Index(str(tmp_path / "bm25"), corpus)
+    bm25_index.update()
+    retriever = StatementRetriever(corpus, bm25_index, SpeakerGazetteer.build(corpus))
+    statement_query = StatementQuery(politician_name="Jimmy Dijk", statement_description="klimaat energie")
+    result_first = retriever.retrieve(statement_query, k=3)
+    assert retriever.retrieve(statement_query, k=3) is result_first
+
+    # the corpus grows with turns that match far better, the index catches up
+    writer.append(
+        [
+            (
+                "key-new",
+                PoliticalEntry(
+                    reference={
+                        "title": "new",
+                        "subtitle": "",
+                        "content_url_html": "https://example.org/new",
+                        "content_url_pdf": "",
+                        "publication_date": "1 juni 2024",
+                    },
+                    entry_elements=[
+                        {"type": "speaker", "speaker_name": "Jimmy Dijk", "speaker_name_title": "De heer Dijk (SP):", "text": "klimaat energie klimaat energie"}
+                    ],
+                ),
+            )
+        ]
+    )
+    corpus_grown = ColumnarCorpus(str(tmp_path / "corpus"))
+    bm25_index.corpus = corpus_grown
+    retriever.corpus = corpus_grown
+    bm25_index.update()
+    result_second = retriever.retrieve(statement_query, k=3)
+    assert result_second is not result_first
+    assert result_second.passages[0].document_key == "key-new"
+
+    bm25_index.merge(max_segments=1)
+    assert retriever.retrieve(statement_query, k=3) is not result_second
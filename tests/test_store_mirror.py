@@ -0,0 +1,47 @@
+import pytest
+
+from dutch_politics.store.bytes_store_disk import BytesStoreDisk
+from dutch_politics.store.bytes_store_mirror import BytesStoreMirror
+from dutch_politics.store.dict_store_disk import DictStoreDisk
+from dutch_politics.store.hedged_read import HedgedReader
+
+
+class BytesStoreFlaky(BytesStoreDisk):
+    failing = False
+
+    def mset(self, key_value_pairs):
+        if self.failing:
+            raise OSError("bucket unavailable")
+        super().mset(key_value_pairs)
+
+
+def test_partial_write_failure_is_recorded_and_repaired(tmp_path):
+    primary = BytesStoreDisk("pages", str(tmp_path / "primary"))
+    backup = BytesStoreFlaky("pages", str(tmp_path / "backup"))
+    divergence_store = DictStoreDisk("pages_divergent", str(tmp_path / "divergent"))
+    with BytesStoreMirror([primary, backup], divergence_store=divergence_store) as store:
+        store.mset([("key-1", b"1")])
+        backup.failing = True
+        with pytest.raises(OSError):
+            store.mset([("key-1", b"2"), ("key-2", b"2")])
+        assert backup.mget(["key-1", "key-2"]) == [b"1", None]
+        backup.failing = False
+
+    # a new mirror finds the divergent keys in the divergence store
+    with BytesStoreMirror([primary, backup], divergence_store=divergence_store) as store:
+        assert store.replica_set.keys_divergent == ["key-1", "key-2"]
+        assert store.repair() == 2
+        assert store.replica_set.keys_divergent == []
+    assert backup.mget(["key-1", "key-2"]) == [b"2", b"2"]
+
+
+def test_mirror_closes_only_its_own_executor(tmp_path):
+    stores = [BytesStoreDisk("pages", str(tmp_path / name)) for name in ["a", "b"]]
+    with HedgedReader() as hedged_reader:
+        with BytesStoreMirror(stores, hedged_reader) as store:
+            store.mset([("key-1", b"1")])
+        # the shared reader outlives the mirror
+        with BytesStoreMirror(stores, hedged_reader) as store:
+            assert store.mget(["key-1"]) == [b"1"]
+    with pytest.raises(RuntimeError):
+        hedged_reader.executor.submit(print)
@@ -0,0 +1,90 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from dutch_politics.store.bytes_store_disk import BytesStoreDisk
+from dutch_politics.store.consistent_hash_ring import ConsistentHashRing
+from dutch_politics.store.dict_store_memory import DictStoreMemory
+from dutch_politics.store.dict_store_sharded import DictStoreSharded
+from dutch_politics.store.store_provider_disk import StoreProviderDisk
+from dutch_politics.store.store_provider_sharded import StoreProviderSharded
+
+
+def make_provider(tmp_path, shard_names):
+    return StoreProviderSharded(
+        "test",
+        {shard_name: StoreProviderDisk("test", str(tmp_path / shard_name)) for shard_name in shard_names},
+    )
+
+
+def test_keys_stay_readable_through_a_rebalance(tmp_path):
+    store_provider = make_provider(tmp_path, ["a", "b"])
+    store = store_provider.get_bytes_store("pages")
+    keys = [f"key-{i}" for i in range(200)]
+    store.mset([(key, key.encode()) for key in keys])
+    store_provider.add_shard("c", StoreProviderDisk("test", str(tmp_path / "c")))
+    assert store.mget(keys) == [key.encode() for key in keys]
+    assert store.mexists([*keys, "missing"]) == [True] * len(keys) + [False]
+    assert sorted(store.yield_keys()) == sorted(keys)
+    count_moved = store_provider.rebalance(batch_size=16)
+    assert count_moved > 0
+    assert store.mget(keys) == [key.encode() for key in keys]
+    assert sorted(store.yield_keys()) == sorted(keys)
+    shard_c = BytesStoreDisk("pages", str(tmp_path / "c" / "test" / "pages"))
+    assert len(list(shard_c.yield_keys())) == count_moved
+
+
+def test_add_shard_before_rebalance_raises(tmp_path):
+    store_provider = make_provider(tmp_path, ["a", "b"])
+    store = store_provider.get_dict_store("documents")
+    store.mset([(f"key-{i}", {"i": i}) for i in range(50)])
+    store_provider.add_shard("c", StoreProviderDisk("test", str(tmp_path / "c")))
+    with pytest.raises(RuntimeError):
+        store_provider.add_shard("d", StoreProviderDisk("test", str(tmp_path / "d")))
+    with pytest.raises(RuntimeError):
+        store.add_shard("d", BytesStoreDisk("documents", str(tmp_path / "d")))
+    store_provider.rebalance()
+    store_provider.add_shard("d", StoreProviderDisk("test", str(tmp_path / "d")))
+    store_provider.rebalance()
+    assert store.mget([f"key-{i}" for i in range(50)]) == [{"i": i} for i in range(50)]
+
+
+def test_rebalance_keeps_writes_made_after_add_shard(tmp_path):
+    store_provider = make_provider(tmp_path, ["a", "b"])
+    store = store_provider.get_dict_store("documents")
+    keys = [f"key-{i}" for i in range(100)]
+    store.mset([(key, {"version": 1}) for key in keys])
+    store_provider.add_shard("c", StoreProviderDisk("test", str(tmp_path / "c")))
+    # a writer updates every key while the old copies still sit on the previous owners
+    store.mset([(key, {"version": 2}) for key in keys])
+    store_provider.rebalance()
+    assert store.mget(keys) == [{"version": 2}] * len(keys)
+
+
+def test_mexists_does_not_read_values(tmp_path, monkeypatch):
+    store_provider = make_provider(tmp_path, ["a", "b"])
+    store = store_provider.get_bytes_store("pages")
+    store.mset([("key-1", b"1")])
+    store_provider.add_shard("c", StoreProviderDisk("test", str(tmp_path / "c")))
+
+    def mget_forbidden(self, keys):
+        raise AssertionError("mexists read the values")
+
+    monkeypatch.setattr(BytesStoreDisk, "mget", mget_forbidden)
+    assert store.mexists(["key-1", "key-2"]) == [True, False]
+
+
+class DictStoreMemoryQuery(DictStoreMemory):
+    """Memory store whose query returns every document, the sharded store does the ordering."""
+
+    def query(self, query, order_by=[], limit=0, offset=0):
+        return [self.mget([key])[0] for key in self.yield_keys()]
+
+
+def test_query_orders_documents_missing_the_field(tmp_path):
+    stores = {shard_name: DictStoreMemoryQuery("documents") for shard_name in ["a", "b"]}
+    with ThreadPoolExecutor(2) as executor:
+        store = DictStoreSharded("documents", stores, ConsistentHashRing(stores.keys()), executor)
+        store.mset([("key-1", {"n": 2}), ("key-2", {"n": None}), ("key-3", {}), ("key-4", {"n": 1})])
+        assert [document.get("n") for document in store.query({}, [("n", True)])] == [None, None, 1, 2]
+        assert [document.get("n") for document in store.query({}, [("n", False)])] == [2, 1, None, None]
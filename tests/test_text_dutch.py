@@ -0,0 +1,11 @@
+from dutch_politics.text_dutch import stem_dutch, tokenize_dutch
+
+
+def test_stem_dutch_undoubles_letters_only():
+    assert stem_dutch("mannen") == "man"
+    assert stem_dutch("woord100") == "woord100"
+    assert stem_dutch("a400") == "a400"
+
+
+def test_tokenize_dutch_folds_and_drops_stopwords():
+    assert tokenize_dutch("De moties zijn geëvalueerd") == tokenize_dutch("de MOTIES geevalueerd")